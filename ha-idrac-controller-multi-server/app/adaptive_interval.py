@@ -0,0 +1,60 @@
+# HA-iDRAC/ha-idrac-controller-multi-server/app/adaptive_interval.py
+import time
+from collections import deque
+
+class AdaptiveInterval:
+    """
+    Picks the next polling interval from the hottest CPU temperature and how fast it is changing.
+    The interval stretches towards `max_interval` while the CPU is stable and well below the low
+    threshold, and drops to `min_interval` on a fast rise/fall or when nearing the critical threshold.
+
+    The rate is measured over at least `trend_seconds`, so one degree of sensor jitter between two
+    close readings does not count as a spike, and changes of `stable_delta` or less count as stable.
+    """
+    def __init__(self, base_interval, min_interval, max_interval, low_threshold, critical_threshold,
+                 fast_rate=3.0, stable_rate=0.5, margin=5.0, growth=1.5, trend_seconds=60, stable_delta=1.0):
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.low_threshold = low_threshold
+        self.critical_threshold = critical_threshold
+        self.fast_rate = fast_rate  # °C per minute considered a heat spike
+        self.stable_rate = stable_rate  # °C per minute considered stable
+        self.margin = margin  # °C distance from a threshold that counts as "near"
+        self.growth = growth
+        self.trend_seconds = trend_seconds
+        self.stable_delta = stable_delta  # °C of movement within the trend window that is still stable
+        self.interval = base_interval
+        self.rate = 0.0
+        self.history = deque()  # (time.monotonic(), °C) of the readings in the trend window
+
+    def update(self, temp):
+        """Feeds a new reading (°C, or None if unavailable) and returns the interval to wait before the next one."""
+        now = time.monotonic()
+        if temp is None:
+            self.interval = self.base_interval
+            self.history.clear()
+            return self.interval
+
+        self.history.append((now, temp))
+        # Keep the readings of the last trend_seconds, plus the newest one before them as the starting point.
+        while len(self.history) > 2 and now - self.history[1][0] >= self.trend_seconds:
+            self.history.popleft()
+        if len(self.history) < 2:
+            # No trend yet; stay at the base interval until there are two readings to compare.
+            self.rate = 0.0
+            self.interval = self.min_interval if temp >= self.critical_threshold - self.margin else self.base_interval
+            return self.interval
+        first_time, first_temp = self.history[0]
+        self.rate = abs(temp - first_temp) / (max(now - first_time, self.trend_seconds) / 60.0)
+        temps = [reading for _, reading in self.history]
+        stable = self.rate <= self.stable_rate or max(temps) - min(temps) <= self.stable_delta
+
+        if self.rate >= self.fast_rate or temp >= self.critical_threshold - self.margin:
+            self.interval = self.min_interval
+        elif temp < self.low_threshold - self.margin and stable:
+            # Stretch gradually so a single quiet reading does not jump straight to the maximum.
+            self.interval = min(self.max_interval, max(self.interval, self.base_interval) * self.growth)
+        else:
+            self.interval = self.base_interval
+        return self.interval
@@ -0,0 +1,198 @@
+# HA-iDRAC/ha-idrac-controller-multi-server/app/async_ipmi.py
+import asyncio
+import contextlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from .ipmi_manager import GET_DEVICE_ID, IpmiRequest, SdrStream
+from .ipmi_shell import line_buffered
+from .redfish_manager import RedfishManager
+from .command_queue import AsyncPrioritySlot, CommandQueueFull, PRIORITY_TELEMETRY
+
+class AsyncIPMIEngine:
+    """
+    Runs IPMI commands for every server from one asyncio event loop.
+    `ipmitool` commands are started with asyncio.create_subprocess_exec, so waiting on them costs no thread.
+    Persistent sessions (ipmitool shell, native RMCP+) do blocking I/O and run on a small executor instead.
+    A global semaphore caps commands in flight across all iDRACs. Per iDRAC, a priority slot caps them and
+    lets fan writes and user commands in ahead of queued reads; identical reads in flight are shared.
+    """
+    def __init__(self, max_concurrency=16, per_host_concurrency=1):
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_host_concurrency = max(1, per_host_concurrency)
+        self.global_slots = None
+        self.host_slots = {}
+        self.pending_reads = {}
+        self.coalesced = 0
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="ipmi")
+
+    @contextlib.asynccontextmanager
+    async def slot(self, host, priority=PRIORITY_TELEMETRY):
+        """Holds one of this host's command slots. Raises CommandQueueFull if a read finds too many waiting."""
+        # Semaphores are created lazily so they bind to the loop that actually runs the engine.
+        if self.global_slots is None:
+            self.global_slots = asyncio.Semaphore(self.max_concurrency)
+        host_slot = self.host_slots.setdefault(host, AsyncPrioritySlot(self.per_host_concurrency))
+        await host_slot.acquire(priority)
+        try:
+            async with self.global_slots:
+                yield
+        finally:
+            host_slot.release()
+
+    async def coalesce(self, key, coroutine_factory):
+        """Awaits coroutine_factory() unless an identical read is already queued or running, and shares its result."""
+        task = self.pending_reads.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coroutine_factory())
+            self.pending_reads[key] = task
+            task.add_done_callback(lambda done: self.pending_reads.pop(key) if self.pending_reads.get(key) is done else None)
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def run_subprocess(self, command, timeout):
+        """asyncio equivalent of subprocess.run(command, capture_output=True, text=True, timeout=timeout)."""
+        process = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise subprocess.TimeoutExpired(command, timeout)
+        return subprocess.CompletedProcess(command, process.returncode,
+                                           stdout.decode("utf-8", errors="replace"), stderr.decode("utf-8", errors="replace"))
+
+    async def run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class AsyncIPMIManager:
+    """
+    Async front-end for an IPMIManager. It runs the wrapped manager's command plans, awaiting each command
+    through the shared AsyncIPMIEngine; admission (cycle budget, circuit breaker), parsing and fan-state
+    bookkeeping all stay in the manager. Any attribute not defined here (parse_temperatures,
+    get_power_status, ...) is delegated to it.
+    """
+    def __init__(self, manager, engine):
+        self.manager = manager
+        self.engine = engine
+
+    def __getattr__(self, name):
+        return getattr(self.manager, name)
+
+    async def _run_plan(self, plan):
+        """Async IPMIManager._run_plan: awaits each IpmiRequest, and pauses with asyncio.sleep."""
+        output = None
+        try:
+            while True:
+                step = plan.send(output)
+                if isinstance(step, IpmiRequest):
+                    output = await self._run_ipmi_command(*step)
+                else:
+                    await asyncio.sleep(step)
+                    output = None
+        except StopIteration as done:
+            return done.value
+
+    async def _run_ipmi_command(self, args_list, is_raw_command=True, timeout=15, deadline=None, priority=PRIORITY_TELEMETRY, watch=None):
+        manager = self.manager
+        if not manager.base_args:
+            manager._log("error", "IPMI not configured.")
+            return None
+        if priority == PRIORITY_TELEMETRY:
+            return await self.engine.coalesce((manager.ip, tuple(args_list), is_raw_command),
+                                              lambda: self._run_in_slot(args_list, is_raw_command, timeout, deadline, priority, watch))
+        return await self._run_in_slot(args_list, is_raw_command, timeout, deadline, priority, watch)
+
+    async def _run_in_slot(self, args_list, is_raw_command, timeout, deadline, priority, watch=None):
+        manager = self.manager
+        try:
+            async with self.engine.slot(manager.ip, priority):
+                admitted = manager._admit(args_list, timeout, deadline)
+                if admitted is None:
+                    return None
+                timeout, probe = admitted
+                if probe and await self._execute(GET_DEVICE_ID, True, min(5, timeout)) is None:
+                    return None
+                return await self._execute(args_list, is_raw_command, timeout, watch)
+        except CommandQueueFull:
+            manager._log("warning", f"Command queue is full; dropping: {' '.join(args_list)}")
+            return None
+
+    async def _execute(self, args_list, is_raw_command, timeout, watch=None):
+        """Async IPMIManager._execute: the same transports, awaited instead of blocking."""
+        manager = self.manager
+        ipmi_args, command_to_run = manager._build_command(args_list, is_raw_command)
+        try:
+            if manager.session:
+                result = await self.engine.run_blocking(manager.session.run, ipmi_args, timeout)
+            elif watch:
+                result = await self._stream_subprocess(command_to_run, timeout, watch)
+            else:
+                result = await self.engine.run_subprocess(command_to_run, timeout)
+        except Exception as e:
+            return manager._handle_error(command_to_run, e)
+        return manager._handle_result(command_to_run, result)
+
+    async def _stream_subprocess(self, command_to_run, timeout, watch):
+        """asyncio version of IPMIManager._stream_subprocess."""
+        process = await asyncio.create_subprocess_exec(*line_buffered(command_to_run), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        stream = SdrStream(watch)
+
+        async def consume():
+            async for raw_line in process.stdout:
+                if stream.add(raw_line.decode("utf-8", errors="replace")):
+                    return
+
+        try:
+            await asyncio.wait_for(consume(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise subprocess.TimeoutExpired(command_to_run, timeout)
+        if watch.complete and process.returncode is None:
+            process.terminate()
+        stderr = await process.stderr.read()
+        await process.wait()
+        return stream.result(command_to_run, process.returncode, stderr.decode("utf-8", errors="replace"))
+
+    async def _run_blocking(self, func, *args):
+        """Runs a rarely used synchronous IPMIManager method (FRU-sized work) inside this host's slot."""
+        try:
+            async with self.engine.slot(self.manager.ip):
+                return await self.engine.run_blocking(func, *args)
+        except CommandQueueFull:
+            self.manager._log("warning", "Command queue is full; deferring sensor map work.")
+            return None
+
+    async def retrieve_sdr_snapshot(self, sensor_class=None, deadline=None):
+        if isinstance(self.manager, RedfishManager):
+            # Redfish reads are HTTP requests, not IPMI commands; they don't take the iDRAC's IPMI slot.
+            return await self.engine.run_blocking(self.manager.retrieve_sdr_snapshot, sensor_class, deadline)
+        return await self._run_plan(self.manager._sdr_snapshot_plan(sensor_class, deadline))
+
+    async def read_mapped_sensors(self, sensor_class=None, deadline=None):
+        return await self._run_plan(self.manager._mapped_sensors_plan(sensor_class, deadline))
+
+    async def apply_dell_fan_control_profile(self):
+        return await self._run_plan(self.manager._dell_fan_plan())
+
+    async def apply_user_fan_control_profile(self, decimal_fan_speed):
+        return await self._run_plan(self.manager._user_fan_plan(decimal_fan_speed))
+
+    async def get_server_model_info(self, deadline=None):
+        if isinstance(self.manager, RedfishManager):
+            return await self.engine.run_blocking(self.manager.get_server_model_info, deadline)
+        return await self._run_plan(self.manager._model_info_plan(deadline))
+
+    async def get_device_fingerprint(self):
+        return await self._run_plan(self.manager._fingerprint_plan())
+
+    async def discover_sensor_map(self):
+        return await self._run_blocking(self.manager.discover_sensor_map)
+
+    async def chassis_shutdown(self):
+        return await self._run_plan(self.manager._shutdown_plan())
@@ -0,0 +1,257 @@
+# HA-iDRAC/ha-idrac-controller-multi-server/app/bmc_simulator.py
+"""
+Local stand-in for an iDRAC's IPMI-over-LAN interface, used to exercise the native
+transport without real hardware. It speaks RMCP+ (cipher suites 3 and 17) on UDP and
+serves an R720-like sensor set, FRU data and the Dell OEM fan commands.
+
+    python3 -m app.bmc_simulator --port 6230 --user root --password calvin
+
+Then set "idrac_ip": "127.0.0.1", "ipmi_transport": "native" and "ipmi_port": 6230
+on a server in servers_config.json.
+"""
+import argparse
+import hmac
+import os
+import random
+import socket
+import struct
+import time
+from .ipmi_lan import (
+    CIPHER_SUITES, PAYLOAD_IPMI, PAYLOAD_OPEN_SESSION_REQUEST, PAYLOAD_OPEN_SESSION_RESPONSE,
+    PAYLOAD_RAKP1, PAYLOAD_RAKP2, PAYLOAD_RAKP3, PAYLOAD_RAKP4, BMC_ADDRESS,
+    CipherContext, IpmiLanError, build_ipmi_message, decode_session_packet, encode_session_packet, ipmi_checksum,
+)
+
+SESSION_IDLE_TIMEOUT = 60
+
+# Threshold sensors: reading = raw * m * 10^r_exp. Discrete sensors report a state bitmask.
+DEFAULT_SENSORS = [
+    {"number": 0x04, "name": "Inlet Temp", "sensor_type": 0x01, "event_type": 0x01, "entity": (64, 1), "unit": 1, "m": 1, "r_exp": 0, "value": 22},
+    {"number": 0x01, "name": "Exhaust Temp", "sensor_type": 0x01, "event_type": 0x01, "entity": (64, 1), "unit": 1, "m": 1, "r_exp": 0, "value": 31},
+    {"number": 0x0E, "name": "Temp", "sensor_type": 0x01, "event_type": 0x01, "entity": (3, 1), "unit": 1, "m": 1, "r_exp": 0, "value": 44},
+    {"number": 0x0F, "name": "Temp", "sensor_type": 0x01, "event_type": 0x01, "entity": (3, 2), "unit": 1, "m": 1, "r_exp": 0, "value": 41},
+] + [
+    {"number": 0x30 + i, "name": f"Fan{i + 1}", "sensor_type": 0x04, "event_type": 0x01, "entity": (7, 1), "unit": 18, "m": 120, "r_exp": 0, "value": 3600}
+    for i in range(6)
+] + [
+    {"number": 0x77, "name": "Pwr Consumption", "sensor_type": 0x03, "event_type": 0x01, "entity": (7, 1), "unit": 6, "m": 14, "r_exp": 0, "value": 196},
+    {"number": 0x6A, "name": "Current 1", "sensor_type": 0x03, "event_type": 0x01, "entity": (10, 1), "unit": 5, "m": 2, "r_exp": -1, "value": 0.6},
+    {"number": 0x6B, "name": "Current 2", "sensor_type": 0x03, "event_type": 0x01, "entity": (10, 2), "unit": 5, "m": 2, "r_exp": -1, "value": 0.4},
+    {"number": 0x6C, "name": "Voltage 1", "sensor_type": 0x02, "event_type": 0x01, "entity": (10, 1), "unit": 4, "m": 2, "r_exp": 0, "value": 230},
+    {"number": 0x6D, "name": "Voltage 2", "sensor_type": 0x02, "event_type": 0x01, "entity": (10, 2), "unit": 4, "m": 2, "r_exp": 0, "value": 230},
+    {"number": 0x62, "name": "Status", "sensor_type": 0x08, "event_type": 0x6F, "entity": (10, 1), "state": 0x01},
+    {"number": 0x63, "name": "Status", "sensor_type": 0x08, "event_type": 0x6F, "entity": (10, 2), "state": 0x01},
+    {"number": 0x64, "name": "PS1 PG Fail", "sensor_type": 0x08, "event_type": 0x03, "entity": (10, 1), "state": 0x01},
+    {"number": 0x65, "name": "PS2 PG Fail", "sensor_type": 0x08, "event_type": 0x03, "entity": (10, 2), "state": 0x01},
+]
+
+def build_sdr_record(record_id, sensor):
+    name = sensor["name"].encode()[:16]
+    key = bytes([BMC_ADDRESS, 0x00, sensor["number"]])
+    entity_id, entity_instance = sensor["entity"]
+    common = bytes([entity_id, entity_instance, 0x7F, 0x68, sensor["sensor_type"], sensor["event_type"]]) + b"\x00" * 6
+    if sensor["event_type"] == 0x01:
+        r_exp = sensor["r_exp"] & 0x0F
+        body = common + bytes([0x00, sensor["unit"], 0x00, 0x00, sensor["m"] & 0xFF, (sensor["m"] >> 2) & 0xC0, 0, 0, 0, r_exp << 4]) + b"\x00" * 17 + bytes([0xC0 | len(name)]) + name
+        record_type = 0x01
+    else:
+        body = common + bytes([0x00, 0x00, 0x00]) + b"\x00" * 8 + bytes([0xC0 | len(name)]) + name
+        record_type = 0x02
+    payload = key + body
+    return struct.pack("<HBBB", record_id, 0x51, record_type, len(payload)) + payload
+
+def _fru_area(fields, preamble):
+    area = bytearray(preamble)
+    for field in fields:
+        encoded = field.encode()
+        area += bytes([0xC0 | len(encoded)]) + encoded
+    area.append(0xC1)
+    while (len(area) + 1) % 8: area.append(0)
+    area[1] = (len(area) + 1) // 8
+    area.append(ipmi_checksum(area))
+    return bytes(area)
+
+def build_fru_image(manufacturer, product, serial):
+    board = _fru_area([manufacturer, product, serial, "0ABCDE"], [0x01, 0, 0x00, 0, 0, 0])
+    product_area = _fru_area([manufacturer, product, "", "", serial, ""], [0x01, 0, 0x00])
+    header = bytearray([0x01, 0, 0, 1, 1 + len(board) // 8, 0, 0])
+    header.append(ipmi_checksum(header))
+    return bytes(header) + board + product_area
+
+class SimulatedSession:
+    def __init__(self, console_session_id, bmc_session_id, cipher):
+        self.console_session_id = console_session_id
+        self.bmc_session_id = bmc_session_id
+        self.cipher = cipher
+        self.sequence = 0
+        self.last_seen = time.monotonic()
+        self.rakp = {}
+
+class SimulatedBmc:
+    def __init__(self, user="root", password="calvin", sensors=None, model="PowerEdge R720"):
+        self.user = user.encode()
+        self.password = password
+        self.sensors = [dict(s) for s in (sensors or DEFAULT_SENSORS)]
+        self.guid = os.urandom(16)
+        self.sessions = {}
+        self.sdr = {i + 1: build_sdr_record(i + 1, s) for i, s in enumerate(self.sensors)}
+        self.fru = build_fru_image("DELL", model, "SIM0001")
+        self.reservation = 1
+        self.fan_manual = False
+        self.fan_speed = None
+        self.chassis_on = True
+        self.commands_seen = []
+
+    def _reading(self, sensor):
+        if sensor["event_type"] != 0x01:
+            return [0x00, 0xC0, sensor["state"] & 0xFF, 0x80]
+        value = sensor["value"]
+        if sensor["sensor_type"] == 0x04:
+            value = 2000 + self.fan_speed * 100 if self.fan_manual and self.fan_speed is not None else value
+        elif sensor["sensor_type"] == 0x01 and sensor["entity"][0] == 3:
+            value += random.uniform(-1, 1)
+        raw = max(0, min(255, round(value / (sensor["m"] * 10 ** sensor["r_exp"]))))
+        return [raw, 0xC0, 0x00, 0x80]
+
+    def handle_command(self, session, netfn, cmd, data):
+        """Returns (completion_code, response_data) for one IPMI request."""
+        self.commands_seen.append((netfn, cmd, bytes(data)))
+        if (netfn, cmd) == (0x06, 0x01):  # Get Device ID
+            return 0, [0x20, 0x01, 0x02, 0x10, 0x02, 0xBF, 0xA2, 0x02, 0x00, 0x00, 0x01]
+        if (netfn, cmd) == (0x06, 0x3B):  # Set Session Privilege Level
+            return 0, [data[0] if data else 0x04]
+        if (netfn, cmd) == (0x06, 0x3C):  # Close Session
+            self.sessions.pop(session.bmc_session_id, None)
+            return 0, []
+        if (netfn, cmd) == (0x0A, 0x22):  # Reserve SDR Repository
+            self.reservation = self.reservation % 0xFFFF + 1
+            return 0, list(struct.pack("<H", self.reservation))
+        if (netfn, cmd) == (0x0A, 0x23):  # Get SDR
+            reservation, record_id, offset, count = struct.unpack("<HHBB", bytes(data[:6]))
+            if offset and reservation != self.reservation:
+                return 0xC5, []
+            ids = sorted(self.sdr)
+            record_id = ids[0] if record_id == 0 else record_id
+            if record_id not in self.sdr:
+                return 0xCB, []
+            position = ids.index(record_id)
+            next_id = ids[position + 1] if position + 1 < len(ids) else 0xFFFF
+            record = self.sdr[record_id]
+            return 0, list(struct.pack("<H", next_id)) + list(record[offset:offset + (len(record) if count == 0xFF else count)])
+        if (netfn, cmd) == (0x04, 0x2D):  # Get Sensor Reading
+            sensor = next((s for s in self.sensors if s["number"] == data[0]), None)
+            return (0, self._reading(sensor)) if sensor else (0xCB, [])
+        if (netfn, cmd) == (0x0A, 0x10):  # Get FRU Inventory Area Info
+            return 0, list(struct.pack("<H", len(self.fru))) + [0x00]
+        if (netfn, cmd) == (0x0A, 0x11):  # Read FRU Data
+            offset, count = struct.unpack("<H", bytes(data[1:3]))[0], data[3]
+            chunk = self.fru[offset:offset + count]
+            return 0, [len(chunk)] + list(chunk)
+        if (netfn, cmd) == (0x30, 0x30) and data:  # Dell OEM fan control
+            if data[0] == 0x01 and len(data) > 1:
+                self.fan_manual = data[1] == 0x00
+                return 0, []
+            if data[0] == 0x02 and len(data) > 2:
+                self.fan_speed = data[2]
+                return 0, []
+        if (netfn, cmd) == (0x00, 0x01):  # Get Chassis Status
+            return 0, [0x01 if self.chassis_on else 0x00, 0x00, 0x00]
+        if (netfn, cmd) == (0x00, 0x02):  # Chassis Control
+            self.chassis_on = data[0] not in (0x00, 0x05)
+            return 0, []
+        return 0xC1, []
+
+    def _session_reply(self, payload_type, payload):
+        return encode_session_packet(payload_type, 0, 0, payload)
+
+    def handle_packet(self, packet):
+        now = time.monotonic()
+        for sid in [sid for sid, s in self.sessions.items() if now - s.last_seen > SESSION_IDLE_TIMEOUT]:
+            del self.sessions[sid]
+        if len(packet) < 16:
+            return None
+        payload_type = packet[5] & 0x3F
+        session_id = struct.unpack("<I", packet[6:10])[0]
+        session = self.sessions.get(session_id)
+        try:
+            _, _, _, payload = decode_session_packet(packet, session.cipher if session else None)
+        except IpmiLanError:
+            return None
+
+        if payload_type == PAYLOAD_OPEN_SESSION_REQUEST:
+            tag, console_session_id = payload[0], struct.unpack("<I", payload[4:8])[0]
+            algorithms = (payload[12], payload[20], payload[28])
+            suite = next((sid for sid, spec in CIPHER_SUITES.items() if spec[:3] == algorithms), None)
+            if suite is None:
+                return self._session_reply(PAYLOAD_OPEN_SESSION_RESPONSE, bytes([tag, 0x11, 0, 0]) + payload[4:8] + b"\x00" * 4)
+            bmc_session_id = struct.unpack("<I", os.urandom(4))[0] | 1
+            self.sessions[bmc_session_id] = SimulatedSession(console_session_id, bmc_session_id, CipherContext(suite, self.password))
+            return self._session_reply(PAYLOAD_OPEN_SESSION_RESPONSE, bytes([tag, 0, 0x04, 0]) + payload[4:8] + struct.pack("<I", bmc_session_id) + payload[8:32])
+
+        if payload_type == PAYLOAD_RAKP1:
+            session = self.sessions.get(struct.unpack("<I", payload[4:8])[0])
+            if session is None:
+                return None
+            tag, role, user = payload[0], payload[24], payload[28:28 + payload[27]]
+            console_id = struct.pack("<I", session.console_session_id)
+            if user != self.user:
+                return self._session_reply(PAYLOAD_RAKP2, bytes([tag, 0x0D, 0, 0]) + console_id)
+            console_random, bmc_random = payload[8:24], os.urandom(16)
+            name_fields = bytes([role, len(user)]) + user
+            auth = session.cipher.hmac_kuid(console_id + struct.pack("<I", session.bmc_session_id) + console_random + bmc_random + self.guid + name_fields)
+            session.rakp = {"console_random": console_random, "bmc_random": bmc_random, "name_fields": name_fields}
+            session.cipher.sik = session.cipher.hmac_kuid(console_random + bmc_random + name_fields)
+            return self._session_reply(PAYLOAD_RAKP2, bytes([tag, 0, 0, 0]) + console_id + bmc_random + self.guid + auth)
+
+        if payload_type == PAYLOAD_RAKP3:
+            session = self.sessions.get(struct.unpack("<I", payload[4:8])[0])
+            if session is None or not session.rakp:
+                return None
+            tag, console_id, rakp = payload[0], struct.pack("<I", session.console_session_id), session.rakp
+            expected = session.cipher.hmac_kuid(rakp["bmc_random"] + console_id + rakp["name_fields"])
+            if not hmac.compare_digest(payload[8:], expected):
+                self.sessions.pop(session.bmc_session_id, None)
+                return self._session_reply(PAYLOAD_RAKP4, bytes([tag, 0x0F, 0, 0]) + console_id)
+            icv = session.cipher.hmac_sik(rakp["console_random"] + struct.pack("<I", session.bmc_session_id) + self.guid)[:session.cipher.icv_length]
+            session.cipher.derive_session_keys(session.cipher.sik)
+            return self._session_reply(PAYLOAD_RAKP4, bytes([tag, 0, 0, 0]) + console_id + icv)
+
+        if payload_type == PAYLOAD_IPMI and session and session.cipher.established and len(payload) >= 7:
+            session.last_seen = now
+            netfn, seq_lun, cmd, data = payload[1] >> 2, payload[4], payload[5], list(payload[6:-1])
+            cc, response = self.handle_command(session, netfn, cmd, data)
+            message = build_ipmi_message(payload[3], (netfn + 1) << 2, BMC_ADDRESS, seq_lun, cmd, [cc] + list(response))
+            session.sequence += 1
+            return encode_session_packet(PAYLOAD_IPMI, session.console_session_id, session.sequence, message, session.cipher)
+        return None
+
+    def serve(self, host="127.0.0.1", port=6230, stop_event=None):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((host, port))
+        sock.settimeout(0.5)
+        self.address = sock.getsockname()
+        print(f"[INFO] BMC simulator listening on {self.address[0]}:{self.address[1]}", flush=True)
+        try:
+            while not (stop_event and stop_event.is_set()):
+                try:
+                    packet, peer = sock.recvfrom(4096)
+                except socket.timeout:
+                    continue
+                reply = self.handle_packet(packet)
+                if reply:
+                    sock.sendto(reply, peer)
+        finally:
+            sock.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulated iDRAC IPMI-over-LAN endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6230)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="calvin")
+    parser.add_argument("--model", default="PowerEdge R720")
+    args = parser.parse_args()
+    try:
+        SimulatedBmc(args.user, args.password, model=args.model).serve(args.host, args.port)
+    except KeyboardInterrupt:
+        pass
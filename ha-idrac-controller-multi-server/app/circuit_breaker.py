@@ -0,0 +1,88 @@
+# HA-iDRAC/ha-idrac-controller-multi-server/app/circuit_breaker.py
+import random
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    Tracks whether an iDRAC is answering IPMI commands. The breaker opens after `failure_threshold`
+    consecutive failures, or once `failure_rate` of the last `window` commands failed. While it is open every
+    command is short-circuited. When the backoff expires a single probe is let through: success closes the
+    breaker, failure reopens it with the backoff doubled (jittered, capped at `max_backoff`).
+    """
+    def __init__(self, failure_threshold=3, window=10, failure_rate=0.5, base_backoff=5, max_backoff=300, log_callback=None):
+        self.failure_threshold = failure_threshold
+        self.failure_rate = failure_rate
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = CLOSED
+        self.results = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.consecutive_trips = 0  # drives the backoff; reset when the breaker closes
+        self.retry_at = 0
+        self.trips = 0
+        self.short_circuited = 0
+        self._lock = threading.Lock()
+        self._log_callback = log_callback
+
+    def _log(self, level, message):
+        if self._log_callback:
+            self._log_callback(level, message)
+
+    def before_call(self):
+        """Returns CLOSED to run the command, HALF_OPEN to run one probe first, or OPEN to skip it."""
+        with self._lock:
+            if self.state == CLOSED:
+                return CLOSED
+            if self.state == OPEN and time.monotonic() >= self.retry_at:
+                self.state = HALF_OPEN
+                return HALF_OPEN
+            self.short_circuited += 1
+            return OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.results.append(True)
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                self._log("info", "iDRAC is answering again. Circuit breaker closed.")
+                self.state = CLOSED
+                self.consecutive_trips = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.results.append(False)
+            self.consecutive_failures += 1
+            failures = self.results.count(False)
+            rate_exceeded = len(self.results) == self.results.maxlen and failures >= self.failure_rate * len(self.results)
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold or rate_exceeded:
+                self._trip()
+
+    def _trip(self):
+        self.consecutive_trips += 1
+        self.trips += 1
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** (self.consecutive_trips - 1))
+        # Jitter spreads probes from many workers so they don't hit their iDRACs in lockstep.
+        backoff = random.uniform(backoff / 2, backoff)
+        self.retry_at = time.monotonic() + backoff
+        if self.state == HALF_OPEN:
+            self._log("debug", f"Probe failed; probing again in {backoff:.0f}s.")
+        else:
+            self._log("warning", f"iDRAC is not answering. Circuit breaker open; probing again in {backoff:.0f}s.")
+        self.state = OPEN
+        self.results.clear()
+        self.consecutive_failures = 0
+
+    def seconds_until_retry(self):
+        """Seconds until the next probe is allowed, or 0 when commands are not being short-circuited."""
+        if self.state == CLOSED:
+            return 0
+        return max(0, self.retry_at - time.monotonic())
+
+    def get_stats(self):
+        return {"state": self.state, "trips": self.trips, "short_circuited": self.short_circuited, "retry_in": round(self.seconds_until_retry(), 1)}
@@ -0,0 +1,172 @@
+# HA-iDRAC/ha-idrac-controller-multi-server/app/command_queue.py
+import asyncio
+import heapq
+import itertools
+import threading
+
+# Lower runs first.
+PRIORITY_FAN = 0        # fan writes, including the hand-back to Dell automatic control
+PRIORITY_USER = 1       # commands a user asked for, e.g. the MQTT shutdown button
+PRIORITY_TELEMETRY = 2  # sensor, FRU and Device ID reads
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+class CommandQueueFull(Exception):
+    pass
+
+
+class _Request:
+    __slots__ = ("func", "priority", "key", "done", "result", "error")
+
+    def __init__(self, func, priority, key):
+        self.func = func
+        self.priority = priority
+        self.key = key
+        self.done = False
+        self.result = None
+        self.error = None
+
+
+class HostCommandQueue:
+    """
+    Serializes the IPMI commands sent to one iDRAC and runs them in priority order.
+
+    There is no dispatcher thread: a caller that finds the iDRAC idle runs the most urgent pending
+    request (its own or another caller's) and hands the results back. Telemetry reads with the same
+    key that are still waiting share a single run. At most `max_pending` requests wait; when the
+    queue is full a new read is refused, while fan writes and user commands push out the newest
+    waiting read.
+    """
+    def __init__(self, host, max_pending=16, log_callback=None):
+        self.host = host
+        self.max_pending = max_pending
+        self._heap = []
+        self._pending_reads = {}
+        self._sequence = itertools.count()
+        self._busy = False
+        self._cond = threading.Condition()
+        self._log_callback = log_callback
+        self.coalesced = 0
+        self.dropped = 0
+
+    @classmethod
+    def for_host(cls, host, log_callback=None):
+        """Returns the queue shared by every IPMIManager that talks to `host` in this process."""
+        with _queues_lock:
+            if host not in _queues:
+                _queues[host] = cls(host, log_callback=log_callback)
+            return _queues[host]
+
+    def _log(self, level, message):
+        if self._log_callback:
+            self._log_callback(level, message)
+
+    def _make_room(self, priority):
+        """Returns False if a request of this priority has to be refused because the queue is full."""
+        if len(self._heap) < self.max_pending:
+            return True
+        reads = [entry for entry in self._heap if entry[2].priority == PRIORITY_TELEMETRY]
+        if priority == PRIORITY_TELEMETRY or not reads:
+            return False
+        victim = max(reads)  # the newest waiting read
+        self._heap.remove(victim)
+        heapq.heapify(self._heap)
+        self._finish(victim[2], None, None)
+        self.dropped += 1
+        self._log("warning", f"Command queue for {self.host} is full; pushing out a waiting telemetry read.")
+        return True
+
+    def _finish(self, request, result, error):
+        request.result, request.error, request.done = result, error, True
+        if request.key is not None and self._pending_reads.get(request.key) is request:
+            del self._pending_reads[request.key]
+
+    def call(self, func, priority=PRIORITY_TELEMETRY, key=None):
+        """
+        Runs func() once the iDRAC is free and nothing more urgent is waiting, and returns its result.
+        `key` identifies a telemetry read that may be shared with an identical one still waiting.
+        Returns None if the request was refused or pushed out because the queue was full.
+        """
+        with self._cond:
+            request = self._pending_reads.get(key) if key is not None else None
+            if request is not None:
+                self.coalesced += 1
+            else:
+                if not self._make_room(priority):
+                    self.dropped += 1
+                    self._log("warning", f"Command queue for {self.host} is full; dropping a telemetry read.")
+                    return None
+                request = _Request(func, priority, key)
+                heapq.heappush(self._heap, (priority, next(self._sequence), request))
+                if key is not None:
+                    self._pending_reads[key] = request
+
+            while not request.done:
+                if self._busy or not self._heap:
+                    self._cond.wait()
+                    continue
+                _, _, head = heapq.heappop(self._heap)
+                if head.key is not None:
+                    self._pending_reads.pop(head.key, None)
+                self._busy = True
+                self._cond.release()
+                result, error = None, None
+                try:
+                    result = head.func()
+                except Exception as e:
+                    error = e
+                finally:
+                    self._cond.acquire()
+                    self._busy = False
+                    self._finish(head, result, error)
+                    self._cond.notify_all()
+
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def get_stats(self):
+        return {"pending": len(self._heap), "coalesced": self.coalesced, "dropped": self.dropped}
+
+
+class AsyncPrioritySlot:
+    """
+    asyncio counterpart of HostCommandQueue for the shared event loop: up to `limit` commands run at
+    once against one iDRAC, and waiters are let in by priority rather than arrival order. A read is
+    refused with CommandQueueFull when `max_waiters` requests are already waiting.
+    """
+    def __init__(self, limit=1, max_waiters=16):
+        self.free = limit
+        self.max_waiters = max_waiters
+        self._waiters = []
+        self._sequence = itertools.count()
+        self.dropped = 0
+
+    async def acquire(self, priority=PRIORITY_TELEMETRY):
+        if self.free > 0 and not self._waiters:
+            self.free -= 1
+            return
+        if priority == PRIORITY_TELEMETRY and len(self._waiters) >= self.max_waiters:
+            self.dropped += 1
+            raise CommandQueueFull()
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._sequence), waiter)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was handed over just as we were cancelled
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)  # hand the slot straight to the most urgent waiter
+                return
+        self.free += 1
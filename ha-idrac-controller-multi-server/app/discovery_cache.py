@@ -0,0 +1,127 @@
+# HA-iDRAC/ha-idrac-controller-multi-server/app/discovery_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+
+DISCOVERY_CACHE_FILE = "/data/discovery_cache.json"
+# How long a config that matches the cache waits for the broker to return it before it is sent anyway.
+CONFIRM_SECONDS = 10
+
+def _digest(payload):
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    return hashlib.sha1(payload or b"").hexdigest()
+
+class DiscoveryCache:
+    """
+    Remembers a hash of every retained discovery config published, in `path`, so a restart only sends the
+    configs that changed or that the broker lost instead of all of them.
+
+    On every connect, call connected() and subscribe to topics(): the broker returns the retained configs it
+    still has, which go to on_retained(). Ask offer() before publishing a config. A config that matches the
+    cache is held back until the broker returns the same payload, and due() hands it back for publishing if
+    that has not happened CONFIRM_SECONDS after the connection came up. The configs already published are
+    held back again on a reconnect, so a broker that lost its retained messages gets them again. Once
+    listening() turns false the subscriptions are no longer needed.
+    """
+    def __init__(self, path=DISCOVERY_CACHE_FILE, confirm_seconds=CONFIRM_SECONDS, log_callback=None):
+        self.path = path
+        self.confirm_seconds = confirm_seconds
+        self.hashes = {}      # config topic -> hash of the payload last published
+        self.confirmed = set()  # topics the broker returned with that payload
+        self.stale = set()      # topics the broker returned with something else (or nothing)
+        self.waiting = {}     # topic -> payload held back until the broker confirms it
+        self.payloads = {}    # topic -> payload offered in this run, to hold back again after a reconnect
+        self.deadline = None  # end of the confirm window of the current connection
+        self.dirty = False
+        self._lock = threading.Lock()
+        self._log_callback = log_callback
+        self._load()
+
+    def _log(self, level, message):
+        if self._log_callback:
+            self._log_callback(level, message)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                self.hashes = json.load(f)
+        except (IOError, json.JSONDecodeError) as e:
+            self._log("warning", f"Could not read discovery cache {self.path}: {e}")
+
+    def save(self):
+        with self._lock:
+            if not self.dirty:
+                return
+            hashes, self.dirty = dict(self.hashes), False
+        try:
+            with open(self.path, 'w') as f:
+                json.dump(hashes, f)
+        except IOError as e:
+            self._log("warning", f"Could not write discovery cache {self.path}: {e}")
+
+    def topics(self):
+        with self._lock:
+            return list(self.hashes)
+
+    def connected(self, now=None):
+        """Starts the confirm window of a new connection; the broker must confirm every config again."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.deadline = now + self.confirm_seconds
+            self.confirmed.clear()
+            self.stale.clear()
+            self.waiting.update(self.payloads)
+
+    def listening(self, now=None):
+        """True while retained configs from the broker are still expected (or no connection came up yet)."""
+        now = time.monotonic() if now is None else now
+        return self.deadline is None or now < self.deadline
+
+    def offer(self, topic, payload):
+        """Returns True if the config must be published now; it is then recorded as published."""
+        digest = _digest(payload)
+        with self._lock:
+            self.payloads[topic] = payload
+            if self.hashes.get(topic) == digest and topic not in self.stale:
+                if topic in self.confirmed:
+                    return False
+                if self.listening():
+                    self.waiting[topic] = payload
+                    return False
+            self.hashes[topic] = digest
+            self.stale.discard(topic)
+            self.confirmed.add(topic)
+            self.waiting.pop(topic, None)
+            self.dirty = True
+            return True
+
+    def on_retained(self, topic, payload):
+        """Handles a config the broker returned. Returns a held-back payload that must be published now, or None."""
+        with self._lock:
+            if self.hashes.get(topic) == _digest(payload):
+                self.confirmed.add(topic)
+                self.waiting.pop(topic, None)
+                return None
+            self.confirmed.discard(topic)
+            if topic in self.waiting:
+                return self.waiting.pop(topic)
+            self.stale.add(topic)
+            return None
+
+    def due(self, now=None):
+        """Returns [(topic, payload)] of held-back configs the broker has not confirmed in time. Call while connected."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.deadline is None:
+                self.deadline = now + self.confirm_seconds
+            if self.listening(now) or not self.waiting:
+                return []
+            due, self.waiting = list(self.waiting.items()), {}
+            self.confirmed.update(topic for topic, _ in due)
+        self._log("info", f"Re-sending {len(due)} discovery config(s) the broker no longer has.")
+        return due
@@ -0,0 +1,637 @@
+# HA-iDRAC/ha-idrac-controller-multi-server/app/ipmi_lan.py
+import hashlib
+import hmac
+import math
+import os
+import random
+import socket
+import struct
+import subprocess
+import threading
+import time
+
+RMCP_HEADER = b"\x06\x00\xff\x07"
+AUTH_TYPE_RMCP_PLUS = 0x06
+
+PAYLOAD_IPMI = 0x00
+PAYLOAD_OPEN_SESSION_REQUEST = 0x10
+PAYLOAD_OPEN_SESSION_RESPONSE = 0x11
+PAYLOAD_RAKP1 = 0x12
+PAYLOAD_RAKP2 = 0x13
+PAYLOAD_RAKP3 = 0x14
+PAYLOAD_RAKP4 = 0x15
+
+# iDRAC expires idle IPMI sessions after about a minute; re-login before that instead of timing out on a dead one.
+SESSION_REFRESH_IDLE_SECONDS = 45
+
+BMC_ADDRESS = 0x20
+CONSOLE_ADDRESS = 0x81
+PRIVILEGE_ADMINISTRATOR = 0x04
+NAME_ONLY_LOOKUP = 0x10
+
+# Cipher suite ID -> (authentication alg, integrity alg, confidentiality alg, hash, integrity check length)
+CIPHER_SUITES = {
+    3: (0x01, 0x01, 0x01, hashlib.sha1, 12),     # RAKP-HMAC-SHA1, HMAC-SHA1-96, AES-CBC-128
+    17: (0x03, 0x04, 0x01, hashlib.sha256, 16),  # RAKP-HMAC-SHA256, HMAC-SHA256-128, AES-CBC-128
+}
+
+RAKP_STATUS_MESSAGES = {
+    0x01: "insufficient resources to create a session",
+    0x02: "invalid session ID",
+    0x09: "invalid role",
+    0x0A: "unauthorized role or privilege level requested",
+    0x0D: "unauthorized name (check the iDRAC username)",
+    0x0F: "invalid integrity check value",
+    0x11: "no matching cipher suite",
+}
+
+class IpmiLanError(Exception):
+    pass
+
+# --- AES-128 ---
+# The add-on image ships no crypto library, and only a handful of 16-byte blocks are
+# processed per command, so a small table-driven implementation is fast enough.
+def _xtime(value):
+    return ((value << 1) ^ 0x1B) & 0xFF if value & 0x80 else value << 1
+
+def _gf_mul(a, b):
+    result = 0
+    while b:
+        if b & 1: result ^= a
+        a = _xtime(a)
+        b >>= 1
+    return result
+
+def _build_sbox():
+    sbox = [0] * 256
+    p = q = 1
+    while True:
+        p = p ^ _xtime(p)  # multiply p by 3
+        q ^= q << 1; q ^= q << 2; q ^= q << 4; q &= 0xFF  # divide q by 3
+        if q & 0x80: q ^= 0x09
+        rotl = lambda x, shift: ((x << shift) | (x >> (8 - shift))) & 0xFF
+        sbox[p] = q ^ rotl(q, 1) ^ rotl(q, 2) ^ rotl(q, 3) ^ rotl(q, 4) ^ 0x63
+        if p == 1: break
+    sbox[0] = 0x63
+    return sbox
+
+_SBOX = _build_sbox()
+_INV_SBOX = [0] * 256
+for _i, _v in enumerate(_SBOX): _INV_SBOX[_v] = _i
+_MUL = {n: [_gf_mul(x, n) for x in range(256)] for n in (2, 3, 9, 11, 13, 14)}
+_RCON = [0x01, 0x02, 0x04, 0x08, 0x10, 0x20, 0x40, 0x80, 0x1B, 0x36]
+
+class AES128:
+    def __init__(self, key):
+        words = [list(key[i:i + 4]) for i in range(0, 16, 4)]
+        for i in range(4, 44):
+            temp = list(words[i - 1])
+            if i % 4 == 0:
+                temp = [_SBOX[b] for b in temp[1:] + temp[:1]]
+                temp[0] ^= _RCON[i // 4 - 1]
+            words.append([a ^ b for a, b in zip(words[i - 4], temp)])
+        self.round_keys = [sum(words[r * 4:r * 4 + 4], []) for r in range(11)]
+
+    def encrypt_block(self, block):
+        s = [b ^ k for b, k in zip(block, self.round_keys[0])]
+        m2, m3 = _MUL[2], _MUL[3]
+        for rnd in range(1, 11):
+            s = [_SBOX[s[(i + 4 * (i % 4)) % 16]] for i in range(16)]  # SubBytes + ShiftRows
+            if rnd != 10:
+                mixed = []
+                for c in range(0, 16, 4):
+                    a0, a1, a2, a3 = s[c:c + 4]
+                    mixed += [m2[a0] ^ m3[a1] ^ a2 ^ a3, a0 ^ m2[a1] ^ m3[a2] ^ a3,
+                              a0 ^ a1 ^ m2[a2] ^ m3[a3], m3[a0] ^ a1 ^ a2 ^ m2[a3]]
+                s = mixed
+            s = [b ^ k for b, k in zip(s, self.round_keys[rnd])]
+        return bytes(s)
+
+    def decrypt_block(self, block):
+        s = [b ^ k for b, k in zip(block, self.round_keys[10])]
+        m9, m11, m13, m14 = _MUL[9], _MUL[11], _MUL[13], _MUL[14]
+        for rnd in range(9, -1, -1):
+            s = [_INV_SBOX[s[(i - 4 * (i % 4)) % 16]] for i in range(16)]  # InvShiftRows + InvSubBytes
+            s = [b ^ k for b, k in zip(s, self.round_keys[rnd])]
+            if rnd != 0:
+                mixed = []
+                for c in range(0, 16, 4):
+                    a0, a1, a2, a3 = s[c:c + 4]
+                    mixed += [m14[a0] ^ m11[a1] ^ m13[a2] ^ m9[a3], m9[a0] ^ m14[a1] ^ m11[a2] ^ m13[a3],
+                              m13[a0] ^ m9[a1] ^ m14[a2] ^ m11[a3], m11[a0] ^ m13[a1] ^ m9[a2] ^ m14[a3]]
+                s = mixed
+        return bytes(s)
+
+    def cbc_encrypt(self, iv, data):
+        out, previous = [], iv
+        for i in range(0, len(data), 16):
+            previous = self.encrypt_block(bytes(a ^ b for a, b in zip(data[i:i + 16], previous)))
+            out.append(previous)
+        return b"".join(out)
+
+    def cbc_decrypt(self, iv, data):
+        out, previous = [], iv
+        for i in range(0, len(data), 16):
+            block = data[i:i + 16]
+            out.append(bytes(a ^ b for a, b in zip(self.decrypt_block(block), previous)))
+            previous = block
+        return b"".join(out)
+
+# --- RMCP+ packet framing (shared with the BMC simulator) ---
+class CipherContext:
+    """Key material for one RMCP+ session (IPMI 2.0 spec, section 13.31-13.32)."""
+    def __init__(self, suite_id, password):
+        if suite_id not in CIPHER_SUITES:
+            raise IpmiLanError(f"Unsupported cipher suite {suite_id}. Supported: {sorted(CIPHER_SUITES)}")
+        self.suite_id = suite_id
+        self.auth_alg, self.integrity_alg, self.confidentiality_alg, self.digest, self.icv_length = CIPHER_SUITES[suite_id]
+        self.kuid = (password or "").encode()[:20]
+        self.sik = None
+        self.k1 = None
+        self.aes = None
+
+    def hmac_kuid(self, data):
+        return hmac.new(self.kuid, data, self.digest).digest()
+
+    def hmac_sik(self, data):
+        return hmac.new(self.sik, data, self.digest).digest()
+
+    def derive_session_keys(self, sik):
+        self.sik = sik
+        size = self.digest().digest_size
+        self.k1 = hmac.new(sik, b"\x01" * size, self.digest).digest()
+        self.aes = AES128(hmac.new(sik, b"\x02" * size, self.digest).digest()[:16])
+
+    @property
+    def established(self):
+        return self.k1 is not None
+
+def ipmi_checksum(data):
+    return (-sum(data)) & 0xFF
+
+def build_ipmi_message(rs_addr, netfn_lun, rq_addr, seq_lun, cmd, data):
+    header = bytes([rs_addr, netfn_lun])
+    body = bytes([rq_addr, seq_lun, cmd]) + bytes(data)
+    return header + bytes([ipmi_checksum(header)]) + body + bytes([ipmi_checksum(body)])
+
+def encode_session_packet(payload_type, session_id, sequence, payload, cipher=None):
+    secure = cipher is not None and cipher.established
+    if secure:
+        iv = os.urandom(16)
+        pad_length = (16 - (len(payload) + 1) % 16) % 16
+        padded = payload + bytes(range(1, pad_length + 1)) + bytes([pad_length])
+        payload = iv + cipher.aes.cbc_encrypt(iv, padded)
+        payload_type |= 0xC0
+    message = bytes([AUTH_TYPE_RMCP_PLUS, payload_type]) + struct.pack("<IIH", session_id, sequence, len(payload)) + payload
+    if secure:
+        pad_length = (4 - (len(message) + 2) % 4) % 4
+        message += b"\xff" * pad_length + bytes([pad_length, 0x07])
+        message += hmac.new(cipher.k1, message, cipher.digest).digest()[:cipher.icv_length]
+    return RMCP_HEADER + message
+
+def decode_session_packet(packet, cipher=None):
+    """Returns (payload_type, session_id, sequence, payload) or raises IpmiLanError."""
+    if len(packet) < 16 or packet[:4] != RMCP_HEADER or packet[4] != AUTH_TYPE_RMCP_PLUS:
+        raise IpmiLanError("Not an RMCP+ packet")
+    payload_type = packet[5]
+    session_id, sequence, length = struct.unpack("<IIH", packet[6:16])
+    payload = packet[16:16 + length]
+    if payload_type & 0x40:
+        if cipher is None or not cipher.established:
+            raise IpmiLanError("Authenticated packet received outside a session")
+        message, auth_code = packet[4:-cipher.icv_length], packet[-cipher.icv_length:]
+        expected = hmac.new(cipher.k1, message, cipher.digest).digest()[:cipher.icv_length]
+        if not hmac.compare_digest(auth_code, expected):
+            raise IpmiLanError("Integrity check failed")
+    if payload_type & 0x80:
+        if len(payload) < 32 or len(payload) % 16:
+            raise IpmiLanError("Malformed encrypted payload")
+        decrypted = cipher.aes.cbc_decrypt(payload[:16], payload[16:])
+        payload = decrypted[:len(decrypted) - 1 - decrypted[-1]]
+    return payload_type & 0x3F, session_id, sequence, payload
+
+# --- Client session ---
+class IpmiLanSession:
+    """
+    One authenticated IPMI 2.0 (lanplus) session to a BMC over UDP. The session is
+    opened lazily, kept alive between commands, and re-established once if the BMC
+    stops answering on it.
+    """
+    def __init__(self, host, user, password, port=623, cipher_suite=3, log_callback=None):
+        self.host = host
+        self.port = int(port)
+        self.user = (user or "").encode()
+        self.password = password
+        self.cipher_suite = int(cipher_suite)
+        self._log_callback = log_callback
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _log(self, level, message):
+        if self._log_callback:
+            self._log_callback(level, f"[lan] {message}")
+
+    def _reset(self):
+        self.sock = None
+        self.cipher = None
+        self.console_session_id = 0
+        self.bmc_session_id = 0
+        self.sequence = 0
+        self.rq_seq = 0
+        self.last_activity = 0
+
+    @property
+    def is_open(self):
+        return self.cipher is not None and self.cipher.established
+
+    def _exchange(self, build_packet, parse_reply, deadline, attempts=3):
+        """Sends a packet (rebuilt for each retransmit) until parse_reply accepts a reply."""
+        for attempt in range(attempts):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: break
+            self.sock.send(build_packet())
+            wait_until = time.monotonic() + remaining / (attempts - attempt)
+            while True:
+                remaining = wait_until - time.monotonic()
+                if remaining <= 0: break
+                self.sock.settimeout(remaining)
+                try:
+                    packet = self.sock.recv(4096)
+                except socket.timeout:
+                    break
+                except ConnectionRefusedError:
+                    raise IpmiLanError(f"Connection refused by {self.host}:{self.port}")
+                try:
+                    decoded = decode_session_packet(packet, self.cipher)
+                except IpmiLanError as e:
+                    self._log("trace", f"Ignoring packet: {e}")
+                    continue
+                reply = parse_reply(decoded)
+                if reply is not None:
+                    self.last_activity = time.monotonic()
+                    return reply
+        raise socket.timeout(f"No response from {self.host}:{self.port}")
+
+    def _open(self, deadline):
+        self._reset()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.connect((self.host, self.port))
+        self.cipher = CipherContext(self.cipher_suite, self.password)
+        self.console_session_id = struct.unpack("<I", os.urandom(4))[0] | 1
+        tag = os.urandom(1)[0]
+        role = PRIVILEGE_ADMINISTRATOR | NAME_ONLY_LOOKUP
+
+        def session_less(payload_type, payload):
+            return lambda: encode_session_packet(payload_type, 0, 0, payload)
+
+        def expect(payload_type):
+            def parse(decoded):
+                reply_type, _, _, payload = decoded
+                if reply_type != payload_type or len(payload) < 8 or payload[0] != tag: return None
+                if payload[1] != 0:
+                    reason = RAKP_STATUS_MESSAGES.get(payload[1], f"status 0x{payload[1]:02x}")
+                    raise IpmiLanError(f"Session setup rejected by BMC: {reason}")
+                if struct.unpack("<I", payload[4:8])[0] != self.console_session_id: return None
+                return payload
+            return parse
+
+        algorithms = b"".join(bytes([kind, 0, 0, 8, alg, 0, 0, 0]) for kind, alg in
+                              ((0, self.cipher.auth_alg), (1, self.cipher.integrity_alg), (2, self.cipher.confidentiality_alg)))
+        open_request = bytes([tag, PRIVILEGE_ADMINISTRATOR, 0, 0]) + struct.pack("<I", self.console_session_id) + algorithms
+        response = self._exchange(session_less(PAYLOAD_OPEN_SESSION_REQUEST, open_request), expect(PAYLOAD_OPEN_SESSION_RESPONSE), deadline)
+        self.bmc_session_id = struct.unpack("<I", response[8:12])[0]
+
+        console_random = os.urandom(16)
+        name_fields = bytes([role, len(self.user)]) + self.user
+        rakp1 = bytes([tag, 0, 0, 0]) + struct.pack("<I", self.bmc_session_id) + console_random + bytes([role, 0, 0, len(self.user)]) + self.user
+        rakp2 = self._exchange(session_less(PAYLOAD_RAKP1, rakp1), expect(PAYLOAD_RAKP2), deadline)
+        bmc_random, bmc_guid, key_auth_code = rakp2[8:24], rakp2[24:40], rakp2[40:]
+        session_ids = struct.pack("<II", self.console_session_id, self.bmc_session_id)
+        expected = self.cipher.hmac_kuid(session_ids + console_random + bmc_random + bmc_guid + name_fields)
+        if not hmac.compare_digest(key_auth_code, expected):
+            raise IpmiLanError("RAKP2 authentication failed (check the iDRAC password)")
+        self.cipher.sik = self.cipher.hmac_kuid(console_random + bmc_random + name_fields)
+
+        rakp3_auth = self.cipher.hmac_kuid(bmc_random + struct.pack("<I", self.console_session_id) + name_fields)
+        rakp3 = bytes([tag, 0, 0, 0]) + struct.pack("<I", self.bmc_session_id) + rakp3_auth
+        rakp4 = self._exchange(session_less(PAYLOAD_RAKP3, rakp3), expect(PAYLOAD_RAKP4), deadline)
+        expected = self.cipher.hmac_sik(console_random + struct.pack("<I", self.bmc_session_id) + bmc_guid)[:self.cipher.icv_length]
+        if not hmac.compare_digest(rakp4[8:8 + self.cipher.icv_length], expected):
+            raise IpmiLanError("RAKP4 integrity check failed")
+        self.cipher.derive_session_keys(self.cipher.sik)
+
+        cc, _ = self._send(0x06, 0x3B, [PRIVILEGE_ADMINISTRATOR], deadline)  # Set Session Privilege Level
+        if cc != 0:
+            raise IpmiLanError(f"Could not raise session privilege to Administrator (cc=0x{cc:02x})")
+        self._log("debug", f"RMCP+ session established with {self.host}:{self.port} (cipher suite {self.cipher_suite}).")
+
+    def _send(self, netfn, cmd, data, deadline):
+        self.rq_seq = (self.rq_seq + 1) % 64
+        rq_seq = self.rq_seq
+        message = build_ipmi_message(BMC_ADDRESS, netfn << 2, CONSOLE_ADDRESS, rq_seq << 2, cmd, data)
+
+        def build():
+            self.sequence = self.sequence % 0xFFFFFFFF + 1
+            return encode_session_packet(PAYLOAD_IPMI, self.bmc_session_id, self.sequence, message, self.cipher)
+
+        def parse(decoded):
+            payload_type, session_id, _, payload = decoded
+            if payload_type != PAYLOAD_IPMI or session_id != self.console_session_id or len(payload) < 8: return None
+            if payload[1] >> 2 != netfn + 1 or payload[4] >> 2 != rq_seq or payload[5] != cmd: return None
+            return payload[6], bytes(payload[7:-1])
+
+        return self._exchange(build, parse, deadline)
+
+    def send_message(self, netfn, cmd, data=b"", timeout=5):
+        """Sends one IPMI request. Returns (completion_code, response_data)."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            if self.is_open and time.monotonic() - self.last_activity > SESSION_REFRESH_IDLE_SECONDS:
+                self._log("debug", f"Session to {self.host} idle for too long. Re-establishing.")
+                self._close_session()
+            was_open = self.is_open
+            try:
+                if not was_open: self._open(deadline)
+                # A BMC silently drops requests on a session it has expired, so leave time to rebuild it.
+                attempt_deadline = time.monotonic() + (deadline - time.monotonic()) / 2 if was_open else deadline
+                return self._send(netfn, cmd, data, attempt_deadline)
+            except (socket.timeout, IpmiLanError, OSError) as e:
+                self._close_socket()
+                if not was_open or deadline - time.monotonic() <= 0:
+                    raise
+                self._log("info", f"Session to {self.host} went stale ({e}). Re-establishing.")
+            self._open(deadline)
+            return self._send(netfn, cmd, data, deadline)
+
+    def _close_socket(self):
+        if self.sock:
+            try: self.sock.close()
+            except OSError: pass
+        self._reset()
+
+    def _close_session(self):
+        if self.is_open:
+            try:
+                self._send(0x06, 0x3C, struct.pack("<I", self.bmc_session_id), time.monotonic() + 1)  # Close Session
+            except (socket.timeout, IpmiLanError, OSError):
+                pass
+        self._close_socket()
+
+    def close(self):
+        with self._lock:
+            self._close_session()
+
+# --- SDR records and sensor readings ---
+UNIT_NAMES = {1: "degrees C", 2: "degrees F", 3: "degrees K", 4: "Volts", 5: "Amps", 6: "Watts", 7: "Joules", 18: "RPM", 19: "Hz"}
+SENSOR_TYPE_NAMES = {"temperature": 0x01, "voltage": 0x02, "current": 0x03, "fan": 0x04, "power supply": 0x08}
+DISCRETE_STATE_NAMES = {
+    (0x6F, 0x08): ["Presence detected", "Failure detected", "Predictive failure", "Power Supply AC lost",
+                   "AC lost or out-of-range", "AC out-of-range, but present", "Config Error"],
+    (0x03, None): ["State Deasserted", "State Asserted"],
+    (0x08, None): ["Device Absent", "Device Present"],
+}
+LINEARIZATION = {1: math.log, 2: math.log10, 3: math.log2, 4: math.exp, 5: lambda x: 10 ** x, 6: lambda x: 2 ** x,
+                 7: lambda x: 1 / x, 8: lambda x: x ** 2, 9: lambda x: x ** 3, 10: math.sqrt, 11: lambda x: x ** (1 / 3)}
+
+def _signed(value, bits):
+    return value - (1 << bits) if value & (1 << (bits - 1)) else value
+
+def parse_sdr_record(record):
+    """Decodes a Full (0x01) or Compact (0x02) sensor record into a plain dict, or None."""
+    if len(record) < 6 or record[3] not in (0x01, 0x02):
+        return None
+    is_full = record[3] == 0x01
+    string_at = 47 if is_full else 31
+    if len(record) <= string_at:
+        return None
+    name_length = record[string_at] & 0x1F
+    sensor = {
+        "record_id": struct.unpack("<H", record[0:2])[0],
+        "owner": record[5],
+        "number": record[7],
+        "name": record[string_at + 1:string_at + 1 + name_length].decode("latin-1").strip(),
+        "entity_id": record[8],
+        "entity_instance": record[9] & 0x7F,
+        "sensor_type": record[12],
+        "event_type": record[13],
+        "analog_format": record[20] >> 6,
+        "unit": "percent" if record[20] & 0x01 else UNIT_NAMES.get(record[21], "unspecified"),
+        "threshold": record[13] == 0x01,
+    }
+    if is_full and sensor["threshold"] and sensor["analog_format"] != 3:
+        sensor.update({
+            "linearization": record[23] & 0x7F,
+            "m": _signed(record[24] | ((record[25] & 0xC0) << 2), 10),
+            "b": _signed(record[26] | ((record[27] & 0xC0) << 2), 10),
+            "r_exp": _signed(record[29] >> 4, 4),
+            "b_exp": _signed(record[29] & 0x0F, 4),
+        })
+    return sensor
+
+def convert_reading(sensor, raw):
+    """Applies the SDR linearization factors: y = L[(M*x + B*10^K1) * 10^K2]."""
+    if "m" not in sensor:
+        return None
+    if sensor["analog_format"] == 1: raw = raw - 255 if raw & 0x80 else raw
+    elif sensor["analog_format"] == 2: raw = _signed(raw, 8)
+    value = (sensor["m"] * raw + sensor["b"] * 10 ** sensor["b_exp"]) * 10 ** sensor["r_exp"]
+    function = LINEARIZATION.get(sensor.get("linearization", 0))
+    if function:
+        try: value = function(value)
+        except (ValueError, ZeroDivisionError, OverflowError): return None
+    return round(value, 3)
+
+def threshold_status(state):
+    if state & 0x24: return "nr"
+    if state & 0x12: return "cr"
+    if state & 0x09: return "nc"
+    return "ok"
+
+def discrete_states(sensor, state_bits):
+    names = DISCRETE_STATE_NAMES.get((sensor["event_type"], sensor["sensor_type"])) or DISCRETE_STATE_NAMES.get((sensor["event_type"], None), [])
+    asserted = [names[i] if i < len(names) else f"State {i}" for i in range(15) if state_bits & (1 << i)]
+    return ", ".join(asserted)
+
+def format_sdr_line(sensor, reading):
+    """Renders one sensor the way `ipmitool sdr elist` does, so the existing parsers apply unchanged."""
+    prefix = f"{sensor['name']:<16} | {sensor['number']:02X}h"
+    entity = f"{sensor['entity_id']:2d}.{sensor['entity_instance']:d}"
+    if reading is None or reading.get("unavailable"):
+        return f"{prefix} | ns  | {entity} | No Reading"
+    if sensor["threshold"]:
+        value = convert_reading(sensor, reading["raw"])
+        if value is None:
+            return f"{prefix} | ns  | {entity} | No Reading"
+        text = f"{int(value)}" if value == int(value) else f"{value:.2f}"
+        return f"{prefix} | {threshold_status(reading['state']):<3} | {entity} | {text} {sensor['unit']}"
+    return f"{prefix} | ok  | {entity} | {discrete_states(sensor, reading['state'])}"
+
+def _parse_fru_fields(area, start):
+    fields, position = [], start
+    while position < len(area) and area[position] != 0xC1:
+        type_length = area[position]
+        kind, length = type_length >> 6, type_length & 0x3F
+        raw = area[position + 1:position + 1 + length]
+        if kind == 3:
+            fields.append(raw.decode("latin-1").strip())
+        elif kind == 2:  # 6-bit packed ASCII
+            bits = int.from_bytes(raw, "little")
+            fields.append("".join(chr(((bits >> (6 * i)) & 0x3F) + 0x20) for i in range(length * 8 // 6)).strip())
+        else:
+            fields.append(raw.hex())
+        position += 1 + length
+    return fields
+
+def format_fru(data):
+    """Renders the board and product areas of a FRU image like `ipmitool fru print`."""
+    lines = [" FRU Device Description : Builtin FRU Device (ID 0)"]
+    if len(data) < 8 or ipmi_checksum(data[:7]) != data[7]:
+        return "\n".join(lines)
+    board_offset, product_offset = data[3] * 8, data[4] * 8
+    if board_offset:
+        board = _parse_fru_fields(data[board_offset:board_offset + data[board_offset + 1] * 8], 6)
+        for label, value in zip(["Board Mfg", "Board Product", "Board Serial", "Board Part Number"], board):
+            lines.append(f" {label:<22}: {value}")
+    if product_offset:
+        product = _parse_fru_fields(data[product_offset:product_offset + data[product_offset + 1] * 8], 3)
+        for label, value in zip(["Product Manufacturer", "Product Name", "Product Part Number", "Product Version", "Product Serial", "Product Asset Tag"], product):
+            lines.append(f" {label:<22}: {value}")
+    return "\n".join(lines)
+
+# --- ipmitool-compatible command layer ---
+class NativeIpmiTransport:
+    """
+    Answers the ipmitool command lines IPMIManager issues (raw, sdr, fru, chassis power)
+    over a native RMCP+ session, formatting results like ipmitool so the existing
+    parsers keep working. SDR records are read once per session and reused.
+    """
+    def __init__(self, host, user, password, port=623, cipher_suite=3, log_callback=None):
+        self.session = IpmiLanSession(host, user, password, port=port, cipher_suite=cipher_suite, log_callback=log_callback)
+        self._log_callback = log_callback
+        self.sdr_cache = None
+
+    def _log(self, level, message):
+        if self._log_callback:
+            self._log_callback(level, f"[lan] {message}")
+
+    def send(self, netfn, cmd, data, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise socket.timeout("Command deadline exceeded")
+        return self.session.send_message(netfn, cmd, bytes(data), timeout=remaining)
+
+    def _reserve_sdr(self, deadline):
+        cc, data = self.send(0x0A, 0x22, [], deadline)  # Reserve SDR Repository
+        if cc != 0 or len(data) < 2:
+            raise IpmiLanError(f"Reserve SDR Repository failed (cc=0x{cc:02x})")
+        return data[:2]
+
+    def read_sdr_repository(self, deadline):
+        records = []
+        reservation = self._reserve_sdr(deadline)
+        record_id, cancelled = 0, 0
+        while record_id != 0xFFFF:
+            request = lambda offset, count: reservation + struct.pack("<HBB", record_id, offset, count)
+            cc, data = self.send(0x0A, 0x23, request(0, 5), deadline)  # Get SDR (header only)
+            if cc == 0:
+                if len(data) < 7:
+                    raise IpmiLanError(f"Get SDR returned a short header for record 0x{record_id:04x} (cc=0x{cc:02x})")
+                next_id, record = struct.unpack("<H", data[:2])[0], bytearray(data[2:7])
+                while cc == 0 and len(record) < 5 + record[4]:
+                    cc, data = self.send(0x0A, 0x23, request(len(record), min(16, 5 + record[4] - len(record))), deadline)
+                    if cc == 0 and len(data) <= 2:
+                        raise IpmiLanError(f"Get SDR returned no data for record 0x{record_id:04x} (cc=0x{cc:02x})")
+                    record += data[2:] if cc == 0 else b""
+            if cc == 0xC5 and cancelled < 5:
+                # Another client reserved the repository (e.g. a second session on the same BMC); reserve again and redo this record.
+                cancelled += 1
+                time.sleep(min(random.uniform(0.05, 0.25 * cancelled), max(0, deadline - time.monotonic())))  # Break lock-step with the other reader
+                reservation = self._reserve_sdr(deadline)
+                continue
+            if cc != 0 or len(data) < 2:
+                raise IpmiLanError(f"Get SDR failed for record 0x{record_id:04x} (cc=0x{cc:02x})")
+            sensor = parse_sdr_record(bytes(record))
+            if sensor and sensor["owner"] == BMC_ADDRESS:
+                records.append(sensor)
+            record_id = next_id
+        self._log("debug", f"Read {len(records)} sensor records from the SDR repository.")
+        return records
+
+    def get_sdr(self, deadline):
+        if self.sdr_cache is None or not self.session.is_open:
+            self.sdr_cache = self.read_sdr_repository(deadline)
+        return self.sdr_cache
+
+    def read_sensor(self, sensor, deadline):
+        """Get Sensor Reading (NetFn 0x04, cmd 0x2D). Returns a reading dict, or None on failure."""
+        cc, data = self.send(0x04, 0x2D, [sensor["number"]], deadline)
+        if cc != 0 or len(data) < 2:
+            return None
+        state = data[2] if len(data) > 2 else 0
+        if not sensor["threshold"] and len(data) > 3:
+            state |= (data[3] & 0x7F) << 8
+        return {"raw": data[0], "state": state, "unavailable": bool(data[1] & 0x20)}
+
+    def _sdr_output(self, sensor_type, deadline):
+        lines = []
+        for sensor in self.get_sdr(deadline):
+            if sensor_type is None or sensor["sensor_type"] == sensor_type:
+                lines.append(format_sdr_line(sensor, self.read_sensor(sensor, deadline)))
+        return "\n".join(lines)
+
+    def _fru_output(self, deadline):
+        cc, data = self.send(0x0A, 0x10, [0], deadline)  # Get FRU Inventory Area Info
+        if cc != 0 or len(data) < 2:
+            raise IpmiLanError(f"Get FRU Inventory Area Info failed (cc=0x{cc:02x})")
+        size, fru = struct.unpack("<H", data[:2])[0], bytearray()
+        while len(fru) < size:
+            cc, data = self.send(0x0A, 0x11, [0] + list(struct.pack("<H", len(fru))) + [min(32, size - len(fru))], deadline)
+            if cc != 0 or len(data) < 2:
+                raise IpmiLanError(f"Read FRU Data failed at offset {len(fru)} (cc=0x{cc:02x})")
+            fru += data[1:1 + data[0]]
+        return format_fru(bytes(fru))
+
+    def _dispatch(self, args, deadline):
+        words = [a.lower() for a in args]
+        if words[:1] == ["raw"] and len(args) >= 3:
+            netfn, cmd, *data = [int(a, 16) if a.lower().startswith("0x") else int(a) for a in args[1:]]
+            cc, response = self.send(netfn, cmd, data, deadline)
+            if cc != 0:
+                return 1, "", f"Unable to send RAW command (channel=0x0 netfn=0x{netfn:x} lun=0x0 cmd=0x{cmd:x} rsp=0x{cc:x})"
+            return 0, "\n".join("".join(f" {b:02x}" for b in response[i:i + 16]) for i in range(0, len(response), 16)), ""
+        if words[:2] in (["sdr", "elist"], ["sdr", "list"]) or words == ["sdr"]:
+            return 0, self._sdr_output(None, deadline), ""
+        if words[:2] == ["sdr", "type"] and len(words) > 2:
+            sensor_type = SENSOR_TYPE_NAMES.get(" ".join(words[2:]))
+            if sensor_type is None:
+                return 1, "", f"Invalid SDR type: {' '.join(args[2:])}"
+            return 0, self._sdr_output(sensor_type, deadline), ""
+        if words[:1] == ["fru"]:
+            return 0, self._fru_output(deadline), ""
+        if words[:2] == ["chassis", "power"] and len(words) == 3:
+            if words[2] == "status":
+                cc, data = self.send(0x00, 0x01, [], deadline)
+                if cc != 0 or not data:
+                    return 1, "", f"Unable to get Chassis Power Status (rsp=0x{cc:x})"
+                return 0, f"Chassis Power is {'on' if data[0] & 0x01 else 'off'}", ""
+            controls = {"off": 0x00, "on": 0x01, "cycle": 0x02, "reset": 0x03, "soft": 0x05}
+            if words[2] in controls:
+                cc, _ = self.send(0x00, 0x02, [controls[words[2]]], deadline)
+                if cc != 0:
+                    return 1, "", f"Unable to set Chassis Power Control to {words[2]} (rsp=0x{cc:x})"
+                return 0, f"Chassis Power Control: {args[2].capitalize()}", ""
+        return 1, "", f"Command not supported by the native transport: {' '.join(args)}"
+
+    def run(self, args_list, timeout=15):
+        """Runs one ipmitool-style command natively. Returns a CompletedProcess like subprocess.run."""
+        command = ["native"] + list(args_list)
+        try:
+            returncode, stdout, stderr = self._dispatch(list(args_list), time.monotonic() + timeout)
+        except socket.timeout:
+            raise subprocess.TimeoutExpired(command, timeout)
+        except (IpmiLanError, OSError, ValueError) as e:
+            returncode, stdout, stderr = 1, "", str(e)
+        return subprocess.CompletedProcess(command, returncode, stdout, stderr)
+
+    def close(self):
+        self.session.close()
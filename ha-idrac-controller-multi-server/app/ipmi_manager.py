@@ -2,15 +2,101 @@
 import subprocess
 import time
 import re
+import os
+import json
+import tempfile
+import threading
+import functools
+import socket
+import selectors
+from collections import namedtuple
+from .ipmi_shell import IpmitoolShell, bmc_answered, line_buffered
+from .ipmi_lan import IpmiLanError, NativeIpmiTransport, parse_sdr_record, format_sdr_line
+from .circuit_breaker import CircuitBreaker, CLOSED, HALF_OPEN
+from .command_queue import HostCommandQueue, PRIORITY_FAN, PRIORITY_USER, PRIORITY_TELEMETRY
+from .sdr_parser import SensorWatch, SnapshotBuilder, get_parser
+
+SENSOR_MAP_FILE = "/data/sensor_maps.json"
+MODEL_CACHE_FILE = "/data/model_cache.json"
+GET_DEVICE_ID = ["0x06", "0x01"]
+FAN_MODE_AUTO = ["0x30", "0x30", "0x01", "0x01"]
+FAN_MODE_MANUAL = ["0x30", "0x30", "0x01", "0x00"]
+FAN_SPEED_PREFIX = ["0x30", "0x30", "0x02", "0xff"]
+# Commands are not started with less than this left of the cycle budget; they would only time out.
+MIN_COMMAND_SECONDS = 1
+# SDR reads that stop once the known sensors are in are followed by one read to the end, to pick up new sensors.
+FULL_SDR_READ_EVERY = 10
+# The SDR read for each sensor class when no sensor map is used: (ipmitool arguments, timeout).
+SDR_READS = {"temperature": (["sdr", "type", "temperature"], 15), "fan": (["sdr", "type", "fan"], 10)}
+FULL_SDR_READ = (["sdr", "elist"], 20)
+sensor_map_lock = threading.Lock()
+model_cache_lock = threading.Lock()
+
+# One command of a command plan; the fields are _run_ipmi_command's arguments.
+IpmiRequest = namedtuple("IpmiRequest", "args_list is_raw_command timeout deadline priority watch",
+                         defaults=(True, 15, None, PRIORITY_TELEMETRY, None))
+
+class SdrStream:
+    """
+    Parses an SDR read line by line while ipmitool is still printing it. add() returns True once `watch`
+    has seen every sensor it expects, so the caller can stop ipmitool; result() then builds the CompletedProcess
+    and hands the snapshot to the parser so parsing the output again costs nothing.
+    """
+    def __init__(self, watch):
+        self.watch = watch
+        self.builder = SnapshotBuilder(get_parser())
+        self.lines = []
+
+    def add(self, line):
+        line = line.rstrip("\n")
+        self.lines.append(line)
+        row = self.builder.add(line)
+        return row is not None and self.watch(row)
+
+    def result(self, command_to_run, returncode, stderr):
+        stdout = "\n".join(self.lines)
+        get_parser().remember(stdout.strip(), self.builder.finish())
+        return subprocess.CompletedProcess(command_to_run, 0 if self.watch.complete else returncode, stdout, stderr)
 
 class IPMIManager:
-    def __init__(self, ip, user, password, conn_type="lanplus", log_level="info"):
+    """
+    IPMI access to one iDRAC. Multi-command operations (fan writes, SDR and FRU reads) are written once as
+    command plans: generators that yield an IpmiRequest (or a pause in seconds), are sent its output and
+    return the result. _run_plan() runs them with blocking calls; AsyncIPMIManager awaits the same plans.
+    """
+    def __init__(self, ip, user, password, conn_type="lanplus", log_level="info", transport="ipmitool", port=623, cipher_suite=3, fast_path=True, fan_refresh_seconds=300):
         self.ip = ip
         self.user = user
         self.password = password
         self.log_level = log_level.lower()
         self.base_args = self._build_base_args(conn_type)
-        self._log("info", f"IPMI Manager initialized for host: {self.ip}")
+        self.transport = (transport or "ipmitool").lower()
+        self.session = self._build_session(port, cipher_suite)
+        # Targeted Get Sensor Reading only pays off when commands share one session.
+        self.fast_path_enabled = fast_path and self.session is not None
+        self.sensor_map = None
+        self.sensor_map_key = None
+        self.next_discovery_time = 0
+        # Last fan state the iDRAC acknowledged, so unchanged settings are not re-sent every cycle.
+        self.fan_refresh_seconds = fan_refresh_seconds
+        self.applied_fan_mode = None  # "auto", "manual" or None when unknown
+        self.applied_fan_speed = None
+        self.last_fan_write_time = 0
+        self.device_fingerprint = None
+        # Per sensor class: the (name, sensor id) rows a complete SDR read returned, and streamed reads since.
+        self.sdr_expected = {}
+        self.sdr_partial_reads = {}
+        self.breaker = CircuitBreaker(log_callback=self._log)
+        self.command_queue = HostCommandQueue.for_host(self.ip, log_callback=self._log)
+        self._log("info", f"IPMI Manager initialized for host: {self.ip} (transport: {self.transport})")
+
+    def _build_session(self, port, cipher_suite):
+        """Returns the long-lived command channel for the configured transport, or None to spawn ipmitool per command."""
+        if self.transport == "ipmitool_shell":
+            return IpmitoolShell(self.base_args, self._log)
+        if self.transport == "native":
+            return NativeIpmiTransport(self.ip, self.user, self.password, port=port, cipher_suite=cipher_suite, log_callback=self._log)
+        return None
 
     def _build_base_args(self, conn_type):
         if conn_type.lower() in ["local", "open"]:
@@ -23,35 +109,182 @@ class IPMIManager:
         if levels.get(self.log_level, levels["info"]) <= levels.get(level.lower(), levels["info"]):
             print(f"[{level.upper()}] IPMI ({self.ip}): {message}", flush=True)
 
-    def _run_ipmi_command(self, args_list, is_raw_command=True, timeout=15):
+    def _build_command(self, args_list, is_raw_command):
+        """Returns (ipmitool arguments, full command line) for a command."""
+        ipmi_args = ["raw"] + args_list if is_raw_command else args_list
+        command_to_run = ["ipmitool"] + self.base_args + ipmi_args
+        self._log("debug", f"Executing command: {' '.join(command_to_run)}")
+        return ipmi_args, command_to_run
+
+    def _run_plan(self, plan):
+        """Runs a command plan, sending each IpmiRequest's output back into it. Returns the plan's result."""
+        output = None
+        try:
+            while True:
+                step = plan.send(output)
+                if isinstance(step, IpmiRequest):
+                    output = self._run_ipmi_command(*step)
+                else:
+                    time.sleep(step)
+                    output = None
+        except StopIteration as done:
+            return done.value
+
+    def _handle_result(self, command_to_run, result):
+        if bmc_answered(result):
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        if result.returncode != 0:
+            self._log("error", f"Command failed: {' '.join(command_to_run)}")
+            self._log("error", f"STDOUT: {result.stdout.strip()}")
+            self._log("error", f"STDERR: {result.stderr.strip()}")
+            return None
+        
+        self._log("debug", f"Command STDOUT: {result.stdout.strip()}")
+        return result.stdout.strip()
+
+    def _handle_error(self, command_to_run, error):
+        self.breaker.record_failure()
+        if isinstance(error, FileNotFoundError):
+            self._log("error", "ipmitool command not found. Is it installed and in the system PATH?")
+        elif isinstance(error, subprocess.TimeoutExpired):
+            self._log("error", f"Command timed out: {' '.join(command_to_run)}")
+        else:
+            self._log("error", f"An unexpected error occurred with command: {error}")
+        return None
+
+    def _command_timeout(self, args_list, timeout, deadline):
+        """
+        Caps a command's timeout at what is left before `deadline` (time.monotonic()), so one slow
+        command cannot push the cycle past its budget. Returns None when too little time is left to try.
+        """
+        if deadline is None:
+            return timeout
+        remaining = deadline - time.monotonic()
+        if remaining < MIN_COMMAND_SECONDS:
+            self._log("debug", f"Cycle budget spent; skipping: {' '.join(args_list)}")
+            return None
+        return min(timeout, remaining)
+
+    def _run_ipmi_command(self, args_list, is_raw_command=True, timeout=15, deadline=None, priority=PRIORITY_TELEMETRY, watch=None):
+        """
+        Queues a command for this iDRAC. Fan writes run before user commands, which run before telemetry
+        reads; identical reads still waiting in the queue are run once. An SDR read given a SensorWatch
+        stops as soon as the watch has seen every sensor it expects.
+        """
         if not self.base_args:
             self._log("error", "IPMI not configured.")
             return None
+        key = (tuple(args_list), is_raw_command) if priority == PRIORITY_TELEMETRY else None
+        return self.command_queue.call(functools.partial(self._run_now, args_list, is_raw_command, timeout, deadline, watch), priority, key)
 
-        base_command = ["ipmitool"] + self.base_args
-        command_to_run = base_command + (["raw"] + args_list if is_raw_command else args_list)
-        
-        self._log("debug", f"Executing command: {' '.join(command_to_run)}")
+    def _admit(self, args_list, timeout, deadline):
+        """
+        Decides whether a command may run now, given the cycle budget and the circuit breaker. Returns
+        (timeout, probe): the timeout capped at what is left of the budget, and whether a Get Device ID
+        probe must succeed first because the breaker is half-open. Returns None to skip the command.
+        """
+        # Time spent waiting in the queue counts against the cycle budget.
+        timeout = self._command_timeout(args_list, timeout, deadline)
+        if timeout is None:
+            return None
+        state = self.breaker.before_call()
+        if state == HALF_OPEN:
+            # Only a cheap Get Device ID is risked against an iDRAC that stopped answering.
+            return timeout, True
+        if state != CLOSED:
+            self._log("debug", f"Circuit breaker open; skipping: {' '.join(args_list)}")
+            return None
+        return timeout, False
+
+    def _run_admitted(self, args_list, timeout, deadline, execute):
+        """Runs execute(timeout) if _admit() lets the command through, probing the iDRAC first when needed."""
+        admitted = self._admit(args_list, timeout, deadline)
+        if admitted is None:
+            return None
+        timeout, probe = admitted
+        if probe and self._execute(GET_DEVICE_ID, True, min(5, timeout)) is None:
+            return None
+        return execute(timeout)
+
+    def _run_now(self, args_list, is_raw_command, timeout, deadline, watch=None):
+        return self._run_admitted(args_list, timeout, deadline, lambda timeout: self._execute(args_list, is_raw_command, timeout, watch))
 
+    def _execute(self, args_list, is_raw_command, timeout, watch=None):
+        ipmi_args, command_to_run = self._build_command(args_list, is_raw_command)
         try:
-            result = subprocess.run(command_to_run, capture_output=True, text=True, check=False, timeout=timeout)
-            
-            if result.returncode != 0:
-                self._log("error", f"Command failed: {' '.join(command_to_run)}")
-                self._log("error", f"STDOUT: {result.stdout.strip()}")
-                self._log("error", f"STDERR: {result.stderr.strip()}")
-                return None
-            
-            self._log("debug", f"Command STDOUT: {result.stdout.strip()}")
-            return result.stdout.strip()
-            
-        except FileNotFoundError:
-            self._log("error", "ipmitool command not found. Is it installed and in the system PATH?")
-        except subprocess.TimeoutExpired:
-            self._log("error", f"Command timed out: {' '.join(command_to_run)}")
+            if self.session:
+                result = self.session.run(ipmi_args, timeout=timeout)
+            elif watch:
+                result = self._stream_subprocess(command_to_run, timeout, watch)
+            else:
+                result = subprocess.run(command_to_run, capture_output=True, text=True, check=False, timeout=timeout)
         except Exception as e:
-            self._log("error", f"An unexpected error occurred with command: {e}")
-        return None
+            return self._handle_error(command_to_run, e)
+        return self._handle_result(command_to_run, result)
+
+    def _stream_subprocess(self, command_to_run, timeout, watch):
+        """
+        subprocess.run() for SDR reads: ipmitool's stdout is fed to the SDR parser line by line as it
+        arrives, and ipmitool is stopped as soon as `watch` has seen every sensor it expects.
+        """
+        process = subprocess.Popen(line_buffered(command_to_run), stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+        deadline = time.monotonic() + timeout
+        stream, buffer = SdrStream(watch), b""
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(process.stdout, selectors.EVENT_READ)
+                while not watch.complete:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise subprocess.TimeoutExpired(command_to_run, timeout)
+                    if not selector.select(remaining):
+                        continue
+                    chunk = os.read(process.stdout.fileno(), 65536)
+                    lines = (buffer + chunk).split(b"\n")
+                    buffer = lines.pop() if chunk else b""
+                    for line in lines:
+                        if stream.add(line.decode("utf-8", errors="replace")):
+                            break
+                    if not chunk:
+                        break
+            if watch.complete and process.poll() is None:
+                process.terminate()
+            _, stderr = process.communicate(timeout=max(MIN_COMMAND_SECONDS, deadline - time.monotonic()))
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.communicate()
+        return stream.result(command_to_run, process.returncode, stderr.decode("utf-8", errors="replace"))
+
+    def _sdr_watch(self, sensor_class):
+        """Returns the stop condition for an SDR read of `sensor_class`, or None when it has to be read in full."""
+        if sensor_class is None or self.session is not None:
+            return None  # persistent sessions return a command's output in one piece
+        expected = self.sdr_expected.get(sensor_class)
+        if self.sdr_partial_reads.get(sensor_class, 0) >= FULL_SDR_READ_EVERY:
+            expected = None
+        return SensorWatch(sensor_class, expected)
+
+    def _learn_sdr_watch(self, watch, output):
+        """Remembers which sensors a complete read returned, so later reads of the class can stop once they are in."""
+        if watch is None or output is None or not watch.seen:
+            return
+        if watch.complete:
+            self.sdr_partial_reads[watch.sensor_class] = self.sdr_partial_reads.get(watch.sensor_class, 0) + 1
+        else:
+            self.sdr_expected[watch.sensor_class] = watch.seen
+            self.sdr_partial_reads[watch.sensor_class] = 0
+
+    def _sdr_read_plan(self, sensor_class, deadline):
+        """Command plan: one SDR read of `sensor_class` (None or "power" for a full `sdr elist`)."""
+        args_list, timeout = SDR_READS.get(sensor_class, FULL_SDR_READ)
+        self._log("debug", f"Retrieving SDR data ({' '.join(args_list)})...")
+        watch = self._sdr_watch(sensor_class)
+        output = yield IpmiRequest(args_list, False, timeout, deadline, watch=watch)
+        self._learn_sdr_watch(watch, output)
+        return output
 
     def _decimal_to_hex_for_ipmi(self, decimal_value):
         try:
@@ -64,29 +297,119 @@ class IPMIManager:
             self._log("warning", f"Invalid decimal value '{decimal_value}'. Using 0x00.")
             return "0x00"
 
-    def apply_dell_fan_control_profile(self):
+    def _fan_refresh_due(self):
+        """True when the fan state should be re-sent even if unchanged, in case the iDRAC reverted it on its own."""
+        return bool(self.fan_refresh_seconds) and time.time() - self.last_fan_write_time >= self.fan_refresh_seconds
+
+    def reset_fan_state(self):
+        """Forgets the applied fan state so the next profile call always writes."""
+        self.applied_fan_mode = None
+        self.applied_fan_speed = None
+
+    def _dell_fan_plan(self):
+        if self.applied_fan_mode == "auto" and not self._fan_refresh_due():
+            self._log("debug", "Dell dynamic fan control already active. Skipping write.")
+            return ""
         self._log("info", "Applying Dell default dynamic fan control.")
-        return self._run_ipmi_command(["0x30", "0x30", "0x01", "0x01"])
+        result = yield IpmiRequest(FAN_MODE_AUTO, priority=PRIORITY_FAN)
+        if result is None:
+            self.reset_fan_state()
+        else:
+            self.applied_fan_mode, self.applied_fan_speed = "auto", None
+            self.last_fan_write_time = time.time()
+        return result
 
-    def apply_user_fan_control_profile(self, decimal_fan_speed):
+    def _user_fan_plan(self, decimal_fan_speed):
         hex_fan_speed = self._decimal_to_hex_for_ipmi(decimal_fan_speed)
+        refresh = self._fan_refresh_due()
+        if self.applied_fan_mode == "manual" and self.applied_fan_speed == hex_fan_speed and not refresh:
+            self._log("debug", f"Fan speed already at {decimal_fan_speed}% ({hex_fan_speed}). Skipping write.")
+            return ""
         self._log("info", f"Applying user static fan control: {decimal_fan_speed}% ({hex_fan_speed})")
-        
-        if self._run_ipmi_command(["0x30", "0x30", "0x01", "0x00"]) is None:
-            self._log("error", "Failed to enable manual fan control mode.")
-            return None
-        time.sleep(0.5)
-        
-        result = self._run_ipmi_command(["0x30", "0x30", "0x02", "0xff", hex_fan_speed])
+
+        if self.applied_fan_mode != "manual" or refresh:
+            if (yield IpmiRequest(FAN_MODE_MANUAL, priority=PRIORITY_FAN)) is None:
+                self._log("error", "Failed to enable manual fan control mode.")
+                self.reset_fan_state()
+                return None
+            self.applied_fan_mode, self.applied_fan_speed = "manual", None
+            yield 0.5
+
+        result = yield IpmiRequest(FAN_SPEED_PREFIX + [hex_fan_speed], priority=PRIORITY_FAN)
         if result is None:
             self._log("error", f"Failed to set fan speed to {hex_fan_speed}.")
+            self.reset_fan_state()
         else:
             self._log("info", f"Successfully applied user fan control: {decimal_fan_speed}%")
+            self.applied_fan_speed = hex_fan_speed
+            self.last_fan_write_time = time.time()
         return result
 
-    def get_server_model_info(self):
+    def apply_dell_fan_control_profile(self):
+        return self._run_plan(self._dell_fan_plan())
+
+    def apply_user_fan_control_profile(self, decimal_fan_speed):
+        return self._run_plan(self._user_fan_plan(decimal_fan_speed))
+
+    def _model_info_plan(self, deadline):
         self._log("info", "Retrieving server model information...")
-        fru_data = self._run_ipmi_command(["fru"], is_raw_command=False, timeout=20)
+        fru_data = yield IpmiRequest(["fru"], False, 20, deadline)
+        return self._cache_model_info(self.parse_model_info(fru_data))
+
+    def get_server_model_info(self, deadline=None):
+        return self._run_plan(self._model_info_plan(deadline))
+
+    def _fingerprint_plan(self):
+        output = yield IpmiRequest(GET_DEVICE_ID, timeout=5)
+        self.device_fingerprint = " ".join(output.split()) if output else None
+        return self.device_fingerprint
+
+    def get_device_fingerprint(self):
+        """
+        Reads Get Device ID (device/firmware revision, manufacturer and product IDs). It is a single short
+        command, so it is used to check that cached FRU data still describes the server behind this iDRAC.
+        """
+        return self._run_plan(self._fingerprint_plan())
+
+    def _load_model_cache(self):
+        if not os.path.exists(MODEL_CACHE_FILE):
+            return {}
+        try:
+            with open(MODEL_CACHE_FILE, 'r') as f:
+                return json.load(f)
+        except (IOError, json.JSONDecodeError):
+            self._log("warning", "Could not decode model cache file. Re-reading FRU.")
+            return {}
+
+    def load_cached_model_info(self, fingerprint):
+        """
+        Returns the model info cached for this iDRAC, or None if there is none or the Device ID no longer matches.
+        With no fingerprint (iDRAC unreachable) the cached copy is still used; it is checked on the next FRU read.
+        """
+        with model_cache_lock:
+            cached = self._load_model_cache().get(self.ip)
+        if not cached or not cached.get("model_info"):
+            return None
+        if fingerprint is not None and cached.get("fingerprint") != fingerprint:
+            self._log("info", "Device ID changed since the model info was cached. Re-reading FRU.")
+            return None
+        self._log("info", f"Using cached server info: Manufacturer='{cached['model_info'].get('manufacturer')}', Model='{cached['model_info'].get('model')}'")
+        return cached["model_info"]
+
+    def _cache_model_info(self, model_info):
+        if not model_info:
+            return model_info
+        with model_cache_lock:
+            all_models = self._load_model_cache()
+            all_models[self.ip] = {"fingerprint": self.device_fingerprint, "model_info": model_info}
+            try:
+                with open(MODEL_CACHE_FILE, 'w') as f:
+                    json.dump(all_models, f, indent=4)
+            except IOError as e:
+                self._log("warning", f"Could not save model cache: {e}")
+        return model_info
+
+    def parse_model_info(self, fru_data):
         if not fru_data:
             self._log("warning", "Could not retrieve FRU data.")
             return None
@@ -119,110 +442,200 @@ class IPMIManager:
         self._log("info", f"Server Info: Manufacturer='{model_info['manufacturer']}', Model='{model_info['model']}'")
         return model_info
 
-    def retrieve_temperatures_raw(self):
-        self._log("debug", "Retrieving raw temperature SDR data...")
-        return self._run_ipmi_command(["sdr", "type", "temperature"], is_raw_command=False)
+    def retrieve_sdr_snapshot(self, sensor_class=None, deadline=None):
+        """
+        Fetches the SDR list once. Temperatures, fans, power and PSU status can all be parsed from it.
+        With a cached sensor map only the mapped sensors are read; otherwise a full `sdr elist` walk is done.
+        `sensor_class` ("temperature", "fan" or "power") limits the read to one class of sensors; with the
+        ipmitool transport such a read stops ipmitool once every sensor of the class has come in.
+        """
+        return self._run_plan(self._sdr_snapshot_plan(sensor_class, deadline))
 
-    def parse_temperatures(self, sdr_data, cpu_pattern_str, inlet_pattern_str, exhaust_pattern_str):
-        temps = {"cpu_temps": [], "inlet_temp": None, "exhaust_temp": None}
-        if not sdr_data:
-            return temps
+    def _sdr_snapshot_plan(self, sensor_class, deadline):
+        if self.sensor_map:
+            snapshot = yield from self._mapped_sensors_plan(sensor_class, deadline)
+            if snapshot is not None:
+                return snapshot
+        return (yield from self._sdr_read_plan(sensor_class, deadline))
 
-        temp_line_regex = re.compile(r"^(.*?)\s*\|\s*[\da-fA-F]+h\s*\|\s*ok\s*.*?\|\s*([-+]?\d*\.?\d+)\s*degrees C", re.IGNORECASE)
-        
-        for line in sdr_data.splitlines():
-            match = temp_line_regex.match(line.strip())
-            if not match: continue
-            sensor_name, temp_val_str = match.groups()
-            try:
-                temp_value = int(float(temp_val_str))
-                if re.search(inlet_pattern_str, sensor_name, re.IGNORECASE): temps["inlet_temp"] = temp_value
-                elif re.search(exhaust_pattern_str, sensor_name, re.IGNORECASE): temps["exhaust_temp"] = temp_value
-                elif re.search(cpu_pattern_str, sensor_name, re.IGNORECASE): temps["cpu_temps"].append(temp_value)
-            except ValueError:
-                continue
-        return temps
+    def sensor_map_rediscovery_due(self):
+        """True when a missing or dropped sensor map should be (re)built (rate-limited by next_discovery_time)."""
+        return self.fast_path_enabled and self.sensor_map_key and not self.sensor_map and time.time() >= self.next_discovery_time
 
-    def retrieve_fan_rpms_raw(self):
-        self._log("debug", "Retrieving raw fan SDR data...")
-        return self._run_ipmi_command(["sdr", "type", "fan"], is_raw_command=False, timeout=10)
+    # --- Sensor map (cached SDR records for targeted Get Sensor Reading) ---
+    def _sensor_class(self, sensor):
+        """Returns "temperature", "fan" or "power" for sensors worth polling, or None."""
+        if sensor["sensor_type"] == 0x01:
+            return "temperature"
+        if sensor["sensor_type"] == 0x04:
+            return "fan"
+        if sensor["sensor_type"] == 0x08 or re.match(r"Pwr Consumption", sensor["name"], re.IGNORECASE):
+            return "power"
+        if sensor["sensor_type"] == 0x02 and re.match(r"Voltage \d", sensor["name"]):
+            return "power"
+        return None
 
-    def parse_fan_rpms(self, sdr_data):
-        fans = []
-        if not sdr_data:
-            return fans
+    def _is_mapped_sensor(self, sensor):
+        return self._sensor_class(sensor) is not None
+
+    def _read_native_sdr(self, timeout):
+        """Walks the SDR repository over the native session, with the same breaker bookkeeping as a command."""
+        command = ["native", "sdr", "dump"]
+        try:
+            records = self.session.read_sdr_repository(time.monotonic() + timeout)
+        except socket.timeout:
+            return self._handle_error(command, subprocess.TimeoutExpired(command, timeout))
+        except (IpmiLanError, OSError) as e:
+            # Counted as a failure unless the BMC answered with a completion code.
+            return self._handle_result(command, subprocess.CompletedProcess(command, 1, "", str(e)))
+        self.breaker.record_success()
+        return records
+
+    def _read_sdr_records(self):
+        if isinstance(self.session, NativeIpmiTransport):
+            return self.command_queue.call(functools.partial(self._run_admitted, ["sdr", "dump"], 60, None, self._read_native_sdr))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dump_file = os.path.join(tmp_dir, "sdr.bin")
+            if self._run_ipmi_command(["sdr", "dump", dump_file], is_raw_command=False, timeout=60) is None:
+                return None
+            with open(dump_file, 'rb') as f:
+                data = f.read()
+        records, offset = [], 0
+        while offset + 5 <= len(data):
+            length = 5 + data[offset + 4]
+            sensor = parse_sdr_record(data[offset:offset + length])
+            if sensor and sensor["owner"] == 0x20:
+                records.append(sensor)
+            offset += length
+        return records
 
-        fan_line_regex = re.compile(r"^(.*?)\s*\|\s*[\da-fA-F]+h\s*\|\s*ok\s*.*?\|\s*([\d\.]+)\s*RPM", re.IGNORECASE)
-        for line in sdr_data.splitlines():
-            match = fan_line_regex.match(line.strip())
-            if not match: continue
-            fan_name, rpm_str = match.groups()
+    def _load_sensor_maps(self):
+        if not os.path.exists(SENSOR_MAP_FILE):
+            return {}
+        try:
+            with open(SENSOR_MAP_FILE, 'r') as f:
+                return json.load(f)
+        except (IOError, json.JSONDecodeError):
+            self._log("warning", "Could not decode sensor map file. Rediscovering.")
+            return {}
+
+    def _save_sensor_map(self, sensor_map):
+        with sensor_map_lock:
+            all_maps = self._load_sensor_maps()
+            if sensor_map is None: all_maps.pop(self.sensor_map_key, None)
+            else: all_maps[self.sensor_map_key] = sensor_map
             try:
-                fans.append({"name": fan_name.strip(), "rpm": int(float(rpm_str))})
-            except ValueError:
+                with open(SENSOR_MAP_FILE, 'w') as f:
+                    json.dump(all_maps, f, indent=4)
+            except IOError as e:
+                self._log("warning", f"Could not save sensor map: {e}")
+
+    def load_sensor_map(self, model):
+        """
+        Loads the cached sensor map for this iDRAC and model. Without one, returns False and leaves the
+        (slow) discovery to discover_sensor_map(), which sensor_map_rediscovery_due() then asks for.
+        """
+        if not self.fast_path_enabled:
+            return False
+        self.sensor_map_key = f"{self.ip}|{model or 'Unknown'}"
+        with sensor_map_lock:
+            cached = self._load_sensor_maps().get(self.sensor_map_key)
+        if cached and cached.get("sensors"):
+            self.sensor_map = cached
+            self._log("info", f"Loaded cached sensor map with {len(cached['sensors'])} sensors.")
+            return True
+        self.sensor_map = None
+        self.next_discovery_time = 0
+        return False
+
+    def discover_sensor_map(self):
+        self._log("info", "Discovering sensor numbers from the SDR repository...")
+        self.next_discovery_time = time.time() + 300
+        try:
+            records = self._read_sdr_records()
+        except Exception as e:
+            self._log("warning", f"Sensor discovery failed: {e}")
+            records = None
+        sensors = [r for r in records or [] if self._is_mapped_sensor(r)]
+        if not sensors:
+            self._log("warning", "Sensor discovery found no usable sensors. Using full SDR walks.")
+            return False
+        self.sensor_map = {"discovered": time.strftime("%Y-%m-%d %H:%M:%S %Z"), "sensors": sensors}
+        self._save_sensor_map(self.sensor_map)
+        self._log("info", f"Discovered {len(sensors)} sensors for targeted reads.")
+        return True
+
+    def invalidate_sensor_map(self, reason):
+        self._log("warning", f"Invalidating sensor map: {reason}")
+        self.sensor_map = None
+        self._save_sensor_map(None)
+
+    def read_mapped_sensors(self, sensor_class=None, deadline=None):
+        """Reads every mapped sensor with Get Sensor Reading (NetFn 0x04, cmd 0x2D) and renders it like `sdr elist`."""
+        return self._run_plan(self._mapped_sensors_plan(sensor_class, deadline))
+
+    def _mapped_sensors_plan(self, sensor_class, deadline):
+        lines = []
+        for sensor in self.sensor_map["sensors"]:
+            if sensor_class and self._sensor_class(sensor) != sensor_class:
                 continue
-        return fans
+            line = self._format_mapped_reading(sensor, (yield IpmiRequest(self._sensor_reading_args(sensor), timeout=5, deadline=deadline)))
+            if line is None:
+                return None
+            lines.append(line)
+        return "\n".join(lines)
+
+    def _sensor_reading_args(self, sensor):
+        return ["0x04", "0x2d", f"0x{sensor['number']:02x}"]
+
+    def _format_mapped_reading(self, sensor, output):
+        """Turns a raw Get Sensor Reading response into an `sdr elist` line. Invalidates the map and returns None on failure."""
+        data = bytes.fromhex("".join(output.split())) if output is not None else b""
+        if len(data) < 2:
+            self.invalidate_sensor_map(f"reading sensor '{sensor['name']}' (0x{sensor['number']:02x}) failed")
+            return None
+        state = data[2] if len(data) > 2 else 0
+        if not sensor["threshold"] and len(data) > 3:
+            state |= (data[3] & 0x7F) << 8
+        return format_sdr_line(sensor, {"raw": data[0], "state": state, "unavailable": bool(data[1] & 0x20)})
+
+    def retrieve_temperatures_raw(self, deadline=None):
+        return self._run_plan(self._sdr_read_plan("temperature", deadline))
+
+    def parse_temperatures(self, sdr_data, cpu_pattern_str, inlet_pattern_str, exhaust_pattern_str):
+        return get_parser(cpu_pattern_str, inlet_pattern_str, exhaust_pattern_str).parse(sdr_data)["temps"]
+
+    def retrieve_fan_rpms_raw(self, deadline=None):
+        return self._run_plan(self._sdr_read_plan("fan", deadline))
+
+    def parse_fan_rpms(self, sdr_data):
+        return get_parser().parse(sdr_data)["fans"]
 
     def retrieve_power_sdr_raw(self):
-        self._log("debug", "Retrieving raw power SDR data...")
-        return self._run_ipmi_command(["sdr", "elist"], is_raw_command=False, timeout=20)
+        return self.retrieve_sdr_snapshot()
 
     def parse_power_consumption(self, sdr_data):
-        if not sdr_data:
-            return None
-        
-        power_line_regex = re.compile(r"^(Pwr Consumption.*?)\s*\|.*?\s*([\d\.]+)\s*Watts", re.IGNORECASE)
-        for line in sdr_data.splitlines():
-            match = power_line_regex.search(line)
-            if match:
-                try:
-                    return int(float(match.group(2)))
-                except (ValueError, IndexError):
-                    continue
-        return None
+        return get_parser().parse(sdr_data)["power"]
 
     def get_power_status(self, sdr_data):
         if not sdr_data:
             self._log("warning", "SDR data is empty for power status parsing.")
             return []
+        snapshot = get_parser().parse(sdr_data)
+        for psu in snapshot["psus"]:
+            data = snapshot["psu_readings"][psu["name"]]
+            self._log("debug", f"PSU Status for {psu['name']}: Present={data.get('present', False)}, Voltage={data.get('voltage', 0)}, Fault={data.get('fault', True)} -> Final OK={psu['ok']}")
+        return snapshot["psus"]
 
-        psus = {}
-        # Regex for Presence, Voltage, and Faults
-        presence_regex = re.compile(r"Status\s*\|\s*[\da-fA-F]+h\s*\|\s*ok\s*\|\s*10\.(\d)\s*\|\s*Presence detected")
-        voltage_regex = re.compile(r"Voltage (\d)\s*\|\s*[\da-fA-F]+h\s*\|\s*ok\s*.*?\|\s*([\d\.]+)\s*Volts")
-        fail_regex = re.compile(r"PS(\d) PG Fail\s*\|\s*[\da-fA-F]+h\s*\|\s*(ok|nr)")
-
-        for line in sdr_data.splitlines():
-            # Use a temporary match variable
-            m = presence_regex.search(line)
-            if m:
-                psu_index = m.group(1)
-                psus.setdefault(psu_index, {})["present"] = True
-                continue
-            
-            m = voltage_regex.search(line)
-            if m:
-                psu_index, voltage_str = m.groups()
-                psus.setdefault(psu_index, {})["voltage"] = float(voltage_str) if voltage_str else 0
-                continue
-            
-            m = fail_regex.search(line)
-            if m:
-                psu_index, status = m.groups()
-                psus.setdefault(psu_index, {})["fault"] = status not in ['ok', 'nr']
-                continue
-
-        # Consolidate results into a final status list
-        final_status = []
-        for index, data in sorted(psus.items()):
-            name = f"PSU{index}"
-            is_ok = data.get("present", False) and data.get("voltage", 0) > 100 and not data.get("fault", True)
-            final_status.append({"name": name, "ok": is_ok})
-            self._log("debug", f"PSU Status for {name}: Present={data.get('present', False)}, Voltage={data.get('voltage', 0)}, Fault={data.get('fault', True)} -> Final OK={is_ok}")
-        
-        return final_status
+    def _shutdown_plan(self):
+        self._log("info", "Sending graceful shutdown command to server...")
+        return (yield IpmiRequest(["chassis", "power", "soft"], False, priority=PRIORITY_USER))
 
     def chassis_shutdown(self):
         """Sends a graceful ACPI shutdown command to the server."""
-        self._log("info", "Sending graceful shutdown command to server...")
-        return self._run_ipmi_command(["chassis", "power", "soft"], is_raw_command=False)
\ No newline at end of file
+        return self._run_plan(self._shutdown_plan())
+
+    def close(self):
+        """Releases the persistent session (ipmitool shell or native RMCP+), if one is in use."""
+        if self.session:
+            self.session.close()
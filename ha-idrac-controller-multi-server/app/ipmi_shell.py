@@ -0,0 +1,167 @@
+# HA-iDRAC/ha-idrac-controller-multi-server/app/ipmi_shell.py
+import os
+import selectors
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+
+SHELL_PROMPT = "ipmitool> "
+
+# ipmitool errors that mean the BMC did not answer at all, rather than rejecting the command.
+NO_ANSWER_ERRORS = ("session", "rakp", "no response", "timeout", "unable to send raw command")
+
+def bmc_answered(result):
+    """True if the BMC responded, even with an error completion code (e.g. an unsupported raw command)."""
+    return result.returncode == 0 or "rsp=0x" in result.stderr or "cc=0x" in result.stderr
+
+def line_buffered(command):
+    """
+    Prefixes `command` with stdbuf when it is available. ipmitool block-buffers stdout on a pipe, so
+    without it a reader gets nothing until ipmitool flushes at exit.
+    """
+    if shutil.which("stdbuf"):
+        return ["stdbuf", "-oL", "-eL"] + command
+    return command
+
+def session_lost(result):
+    """True if a failed command got no answer from the BMC, so the session behind it may be gone."""
+    if bmc_answered(result):
+        return False
+    stderr = result.stderr.lower()
+    return any(text in stderr for text in NO_ANSWER_ERRORS)
+
+class IpmitoolShell:
+    """
+    Keeps one long-lived `ipmitool shell` process per iDRAC so every command reuses
+    the same RMCP+ session instead of paying process startup and a RAKP handshake.
+    Each command is followed by `echo <marker>`, and everything printed on stdout
+    before the marker is that command's output.
+    """
+    def __init__(self, base_args, log_callback=None):
+        self.base_args = base_args
+        self._log_callback = log_callback
+        self.process = None
+        self.spawn_count = 0
+        self._lock = threading.Lock()
+        self._stdout_buffer = b""
+
+    def _log(self, level, message):
+        if self._log_callback:
+            self._log_callback(level, f"[shell] {message}")
+
+    def _spawn(self):
+        # Line buffering makes each marker arrive as soon as it is echoed.
+        command = line_buffered(["ipmitool"] + self.base_args + ["shell"])
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+        os.set_blocking(self.process.stderr.fileno(), False)
+        self._stdout_buffer = b""
+        self.spawn_count += 1
+        self._log("debug", f"Spawned ipmitool shell (pid={self.process.pid}, spawn #{self.spawn_count}).")
+
+    def _is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def _kill(self):
+        if self.process is None:
+            return
+        try:
+            self.process.kill()
+            self.process.wait(timeout=2)
+        except Exception:
+            pass
+        for stream in (self.process.stdin, self.process.stdout, self.process.stderr):
+            try: stream.close()
+            except Exception: pass
+        self.process = None
+
+    def _drain_stderr(self):
+        chunks = []
+        while True:
+            try:
+                chunk = os.read(self.process.stderr.fileno(), 65536)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks).decode("utf-8", errors="replace")
+
+    def _read_until_marker(self, marker, sent_lines, deadline):
+        lines = []
+        marker_bytes = marker.encode()
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.process.stdout, selectors.EVENT_READ)
+            while True:
+                while b"\n" in self._stdout_buffer:
+                    raw_line, self._stdout_buffer = self._stdout_buffer.split(b"\n", 1)
+                    line = raw_line.rstrip(b"\r")
+                    # The prompt has no trailing newline, so it ends up glued to the next line.
+                    while line.startswith(SHELL_PROMPT.encode()):
+                        line = line[len(SHELL_PROMPT):]
+                    if line == marker_bytes:
+                        return "\n".join(lines)
+                    decoded = line.decode("utf-8", errors="replace")
+                    if decoded in sent_lines:
+                        continue  # Input echoed back by readline
+                    lines.append(decoded)
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(sent_lines[0], 0)
+                if not selector.select(remaining):
+                    continue
+                chunk = os.read(self.process.stdout.fileno(), 65536)
+                if not chunk:
+                    raise EOFError("ipmitool shell closed its output")
+                self._stdout_buffer += chunk
+
+    def _exchange(self, args_list, timeout):
+        marker = f"__HA_IDRAC_{uuid.uuid4().hex}__"
+        command_line = " ".join(args_list)
+        sent_lines = [command_line, f"echo {marker}"]
+        self._drain_stderr()  # Discard anything left over from a previous command
+        self.process.stdin.write(("\n".join(sent_lines) + "\n").encode())
+        self.process.stdin.flush()
+        stdout = self._read_until_marker(marker, sent_lines, time.monotonic() + timeout)
+        stderr = self._drain_stderr()
+        # The shell has no exit status per command; a command that printed only errors failed.
+        returncode = 1 if stderr.strip() and not stdout.strip() else 0
+        return subprocess.CompletedProcess(["ipmitool", "shell", command_line], returncode, stdout, stderr)
+
+    def run(self, args_list, timeout=15):
+        """Runs one ipmitool command in the shell. Returns a CompletedProcess like subprocess.run."""
+        with self._lock:
+            for attempt in range(2):
+                if not self._is_alive():
+                    self._kill()
+                    self._spawn()
+                try:
+                    result = self._exchange(args_list, timeout)
+                except (EOFError, OSError) as e:
+                    self._log("warning", f"ipmitool shell died ({e}). Respawning.")
+                    self._kill()
+                    if attempt == 0:
+                        continue
+                    raise
+                except subprocess.TimeoutExpired:
+                    # The shell is now out of sync with our markers; start over next time.
+                    self._kill()
+                    raise
+                if session_lost(result):
+                    # The next command starts from a fresh handshake. Commands the BMC rejected (a completion
+                    # code, a missing sensor) or ipmitool refused keep the session.
+                    self._kill()
+                return result
+
+    def close(self):
+        with self._lock:
+            if self._is_alive():
+                try:
+                    self.process.stdin.write(b"exit\n")
+                    self.process.stdin.flush()
+                    self.process.wait(timeout=2)
+                except Exception:
+                    pass
+            self._kill()
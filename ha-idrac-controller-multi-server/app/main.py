@@ -1,23 +1,42 @@
 # HA-iDRAC/ha-idrac-controller-dev/app/main.py
 import os
 import time
+import asyncio
+import functools
+import multiprocessing
 import sys
 import signal
 import threading
-import re
 import json
-from .ipmi_manager import IPMIManager
-from .mqtt_client import MqttClient
+from .ipmi_manager import IPMIManager, MIN_COMMAND_SECONDS
+from .redfish_manager import RedfishManager
+from .async_ipmi import AsyncIPMIEngine, AsyncIPMIManager
+from .worker_pool import WorkerPool
+from .mqtt_client import MqttClient, MqttConnection
+from .discovery_cache import DiscoveryCache
+from .sensor_registry import SensorRegistry
 from .pid_controller import PIDController # Import the new PID class
+from .poll_scheduler import PollScheduler
+from .adaptive_interval import AdaptiveInterval
 from . import web_server
 
 # --- Global Variables ---
 running = True
 threads = []
+mqtt_connections = []  # the MQTT connection the workers of this process share
+ipmi_engines = []  # the asyncio IPMI engine of this process, in asyncio mode
 status_lock = threading.Lock()
 ALL_SERVERS_STATUS = {}
 STATUS_FILE = "/data/current_status.json"
+DISCOVERY_CACHE_FILE = "/data/discovery_cache.json"
 PID_STATE_FILE = "/data/pid_states.json"
+CACHED_FRU_REFRESH_SECONDS = 60
+# Fan, power and FRU reads wait this long at startup so the first temperature read (and fan control) goes first.
+STARTUP_STAGGER_SECONDS = 2
+# How often a worker without a sensor map checks whether it is time to discover one.
+SENSOR_MAP_CHECK_SECONDS = 60
+# Polling tiers that read the SDR, in priority order; "power" reads the full SDR.
+SENSOR_CLASSES = ("temperature", "fan", "power")
 
 # --- Graceful Shutdown ---
 def graceful_shutdown(signum, frame):
@@ -30,32 +49,66 @@ signal.signal(signal.SIGINT, graceful_shutdown)
 
 # --- Server Worker Class ---
 class ServerWorker:
-    def __init__(self, server_config, global_opts):
+    def __init__(self, server_config, global_opts, engine=None, mqtt_connection=None):
         self.config = server_config
         self.global_opts = global_opts
         self.alias = self.config['alias']
         self.log_level = self.global_opts['log_level']
         self.running = True
         
-        self.ipmi = IPMIManager(ip=self.config['idrac_ip'], user=self.config['idrac_username'], password=self.config['idrac_password'], log_level=self.log_level)
-        self.mqtt = MqttClient(client_id=f"ha_idrac_{self.alias}")
+        ipmi_options = dict(log_level=self.log_level, transport=self.config.get('ipmi_transport', 'ipmitool'), port=self.config.get('ipmi_port', 623), cipher_suite=self.config.get('ipmi_cipher_suite', 3), fast_path=self.config.get('sensor_fast_path', True), fan_refresh_seconds=self.config.get('fan_refresh_seconds', 300))
+        if self.config.get('sensor_source', 'ipmi') == 'redfish':
+            # Sensors are read over Redfish; fan writes and shutdown still use the IPMI transport.
+            self.ipmi = RedfishManager(self.config['idrac_ip'], self.config['idrac_username'], self.config['idrac_password'], redfish_port=self.config.get('redfish_port', 443), redfish_tls=self.config.get('redfish_tls', True), **ipmi_options)
+        else:
+            self.ipmi = IPMIManager(ip=self.config['idrac_ip'], user=self.config['idrac_username'], password=self.config['idrac_password'], **ipmi_options)
+        # With the asyncio engine, IPMI commands for this server go through the shared event loop.
+        self.aipmi = AsyncIPMIManager(self.ipmi, engine) if engine else None
+        # All workers of a process publish through one shared MQTT connection when one is given.
+        self.mqtt = MqttClient(client_id=f"ha_idrac_{self.alias}", connection=mqtt_connection)
+        self.mqtt.aggregate_state = global_opts.get("mqtt_aggregate_state", False)
+        self.mqtt.compact_discovery = global_opts.get("mqtt_compact_discovery", False)
         self.pid = PIDController()
 
         self.server_info = {}
-        self.discovered_sensors = set()
+        self.model_info_cached = False
+        deadbands = {"temperature": global_opts.get("mqtt_deadband_temperature", 0), "fan": global_opts.get("mqtt_deadband_fan_rpm", 0), "power": global_opts.get("mqtt_deadband_power", 0)}
+        self.sensors = SensorRegistry(self.mqtt, deadbands, global_opts.get("mqtt_max_age_seconds", 0))
+        self.readings = {"temps": {"cpu_temps": [], "inlet_temp": None, "exhaust_temp": None}, "fans": [], "power": None, "psus": []}
+        self.scheduler = None
+        self.adaptive_interval = None
+        self.target_fan_speed = "Dell Auto"
+        self.deadline_misses = 0
+        # Time budget (time.monotonic()) for the IPMI commands of the cycle in progress, and a summary of the last one.
+        self.cycle_deadline = None
+        self.last_cycle = None
+        self.loop = None  # event loop running this worker in asyncio mode
+        # Set when pushed Redfish readings make a polling task due, to cut the loop's sleep short.
+        self.wakeup = threading.Event()
+        self.async_wakeup = None
+        # Sensor classes pushed since the last tick; the worker thread applies them to its scheduler.
+        self.pushed_classes = set()
+        self.pushed_lock = threading.Lock()
+        self.on_wakeup = None  # set by the worker pool: on_wakeup(worker) brings this worker's next step forward
 
     def _log(self, level, message):
-        print(f"[{level.upper()}] [{self.alias}] {message}", flush=True)
+        levels = {"trace": -1, "debug": 0, "info": 1, "warning": 2, "error": 3, "fatal": 4}
+        if levels.get(self.log_level, levels["info"]) <= levels.get(level.lower(), levels["info"]):
+            print(f"[{level.upper()}] [{self.alias}] {message}", flush=True)
 
     def _on_mqtt_message(self, topic, payload):
         command_topic = f"{self.mqtt.base_topic}/command/shutdown"
         if topic == command_topic and payload == "PRESS":
             self._log("info", "Shutdown command received via MQTT.")
-            self.ipmi.chassis_shutdown()
+            if self.loop:
+                # Queue it on the event loop so it takes the iDRAC's next free slot ahead of any reads.
+                asyncio.run_coroutine_threadsafe(self.aipmi.chassis_shutdown(), self.loop)
+            else:
+                # This runs on the MQTT network thread every server shares; the command can wait behind a
+                # long SDR read in the iDRAC's queue, so it gets a thread of its own.
+                threading.Thread(target=self.ipmi.chassis_shutdown, name=f"shutdown-{self.alias}", daemon=True).start()
 
-    def _initialize(self):
-        self._log("info", "Initializing server worker...")
-        
+    def _load_pid_state(self):
         pid_config = self.config.get('pid_config', {})
         self.pid.setpoint = pid_config.get('target_temp', 55)
         self.pid.set_gains(pid_config.get('kp', 4.0), pid_config.get('ki', 0.2), pid_config.get('kd', 0.1))
@@ -70,131 +123,360 @@ class ServerWorker:
                 except json.JSONDecodeError:
                     self._log("warning", "Could not decode PID state file.")
 
-        model_data = self.ipmi.get_server_model_info()
-        if model_data: self.server_info.update(model_data)
-        
+    def _connect_mqtt(self):
         self.mqtt.configure_broker(self.global_opts["mqtt_host"], self.global_opts["mqtt_port"], self.global_opts["mqtt_username"], self.global_opts["mqtt_password"], self.log_level)
         self.mqtt.set_device_info(server_alias=self.alias, manufacturer=self.server_info.get("manufacturer"), model=self.server_info.get("model"), ip_address=self.config.get("idrac_ip"))
         self.mqtt.connect()
         self.mqtt.message_callback = self._on_mqtt_message
         self.mqtt.subscribe(f"{self.mqtt.base_topic}/command/shutdown")
 
-        for _ in range(10):
-            if self.mqtt.is_connected: return True
-            time.sleep(1)
-        return False
+    def _use_cached_model_info(self, model_data):
+        self.model_info_cached = model_data is not None
+        if model_data:
+            self.server_info.update(model_data)
+            self.mqtt.set_device_info(server_alias=self.alias, manufacturer=model_data.get("manufacturer"), model=model_data.get("model"), ip_address=self.config.get("idrac_ip"))
+        return self.model_info_cached
 
-    def run(self):
-        if not self._initialize():
-            self._log("error", "Initialization failed. Stopping worker.")
+    def _initialize(self):
+        """
+        Starts the worker without waiting on anything slow. MQTT connects in the background and buffers
+        output until the broker is up; a cached FRU read is reused when the iDRAC's Device ID still matches,
+        otherwise the FRU task reads it right after the first temperature poll. Only a cached sensor map is
+        loaded here: discovering one walks the whole SDR, so the low-priority sensor map task does it while
+        temperatures are read with `sdr type temperature`.
+        """
+        self._log("info", "Initializing server worker...")
+        self._load_pid_state()
+        self._connect_mqtt()
+        if self._use_cached_model_info(self.ipmi.load_cached_model_info(self.ipmi.get_device_fingerprint())):
+            self.ipmi.load_sensor_map(self.server_info.get("model"))
+        self._start_push_updates()
+
+    async def _initialize_async(self):
+        self._log("info", "Initializing server worker...")
+        self._load_pid_state()
+        self._connect_mqtt()
+        if self._use_cached_model_info(self.ipmi.load_cached_model_info(await self.aipmi.get_device_fingerprint())):
+            self.ipmi.load_sensor_map(self.server_info.get("model"))
+        self._start_push_updates()
+
+    def _start_push_updates(self):
+        if self.config.get('redfish_push', False) and isinstance(self.ipmi, RedfishManager):
+            self._log("info", "Subscribing to Redfish telemetry; polling temperatures and fans only while the stream is stalled.")
+            self.ipmi.start_event_stream(self._on_pushed_readings)
+
+    def _on_pushed_readings(self, sensor_classes):
+        """
+        Called from the event stream thread: runs the pushed classes' polling tasks now, from the pushed readings.
+        The scheduler is only touched from the worker's own thread (or event loop), so the request is handed over.
+        """
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._wake_for, sensor_classes)
             return
+        with self.pushed_lock:
+            self.pushed_classes.update(sensor_classes)
+        self.wakeup.set()
+        if self.on_wakeup:
+            self.on_wakeup(self)
 
-        while self.running and running:
-            start_time = time.time()
-            
-            raw_temp_data = self.ipmi.retrieve_temperatures_raw()
-            if raw_temp_data is None:
-                self.mqtt.publish(self.mqtt.availability_topic, "offline", retain=True)
-                time.sleep(60)
-                continue
+    def _wake_for(self, sensor_classes):
+        self._run_pushed(sensor_classes)
+        if self.async_wakeup:
+            self.async_wakeup.set()
 
-            self.mqtt.publish(self.mqtt.availability_topic, "online", retain=True)
-            
-            temps = self.ipmi.parse_temperatures(raw_temp_data, r"Temp", r"Inlet Temp", r"Exhaust Temp")
-            fans = self.ipmi.parse_fan_rpms(self.ipmi.retrieve_fan_rpms_raw())
-            power_sdr_data = self.ipmi.retrieve_power_sdr_raw()
-            power = self.ipmi.parse_power_consumption(power_sdr_data)
-            psu_statuses = self.ipmi.get_power_status(power_sdr_data)
-
-            hottest_cpu = max(temps['cpu_temps']) if temps['cpu_temps'] else None
-            target_fan_speed = "Dell Auto"
+    def _run_pushed(self, sensor_classes):
+        if self.scheduler is None:
+            return
+        for name in sensor_classes:
+            if name in self.scheduler.tasks:
+                self.scheduler.delay(name, 0)
+
+    def _store_readings(self, sensor_class, data):
+        if data is None:
+            return False
+        if sensor_class == "temperature":
+            self.readings["temps"] = self.ipmi.parse_temperatures(data, r"Temp", r"Inlet Temp", r"Exhaust Temp")
+            self.sensors.set_cpu_temps(self.readings["temps"].get("cpu_temps", []))
+        elif sensor_class == "fan":
+            self.readings["fans"] = self.ipmi.parse_fan_rpms(data)
+            self.sensors.set_fans(self.readings["fans"])
+        else:
+            self.readings["power"] = self.ipmi.parse_power_consumption(data)
+            self.readings["psus"] = self.ipmi.get_power_status(data)
+            self.sensors.set_psus(self.readings["psus"])
+        return True
+
+    def _store_model_info(self, model_data):
+        """Updates server_info; returns True when the model changed and the sensor map must be reloaded."""
+        changed = model_data.get("model") != self.server_info.get("model")
+        if changed:
+            self._log("info", f"Server model changed to '{model_data.get('model')}'. Reloading sensor map.")
+            # Re-announce the entities so Home Assistant picks up the new device model.
+            self.mqtt.set_device_info(server_alias=self.alias, manufacturer=model_data.get("manufacturer"), model=model_data.get("model"), ip_address=self.config.get("idrac_ip"))
+            self.sensors.reset_discovery()
+        self.server_info.update(model_data)
+        return changed
+
+    def _classes_to_read(self, sensor_class):
+        """
+        The sensor classes one read for `sensor_class` should cover. The power tier reads the full SDR, which
+        holds every temperature and fan row too, so while it is due one full read serves all the due tiers.
+        """
+        # Only lower-priority tiers are covered: the temperature tier must run itself to drive the fans.
+        later = SENSOR_CLASSES[SENSOR_CLASSES.index(sensor_class) + 1:]
+        due = [sensor_class] + [name for name in later if self.scheduler and self.scheduler.is_due(name)]
+        return due if "power" in due else [sensor_class]
+
+    def _store_sdr_read(self, sensor_classes, data):
+        if data is None:
+            return False
+        for sensor_class in sensor_classes:
+            self._store_readings(sensor_class, data)
+            if self.scheduler and sensor_class != self.scheduler.running:
+                self.scheduler.mark_run(sensor_class)
+        return True
+
+    def _poll_sensor_class(self, sensor_class):
+        sensor_classes = self._classes_to_read(sensor_class)
+        data = self.ipmi.retrieve_sdr_snapshot(sensor_class if len(sensor_classes) == 1 else None, self.cycle_deadline)
+        return self._store_sdr_read(sensor_classes, data)
+
+    async def _poll_sensor_class_async(self, sensor_class):
+        sensor_classes = self._classes_to_read(sensor_class)
+        data = await self.aipmi.retrieve_sdr_snapshot(sensor_class if len(sensor_classes) == 1 else None, self.cycle_deadline)
+        return self._store_sdr_read(sensor_classes, data)
+
+    def _poll_temperature(self):
+        """
+        Reads CPU temperatures and applies fan control straight away, ahead of the lower-priority reads.
+        Fan writes are what the cycle is for, so they are not cut short by the cycle budget.
+        """
+        if not self._poll_sensor_class("temperature"):
+            return False
+        hottest_cpu = self._hottest_cpu()
+        self.target_fan_speed = self._apply_fan_control(hottest_cpu)
+        self._update_adaptive_interval(hottest_cpu)
+        return True
+
+    async def _poll_temperature_async(self):
+        if not await self._poll_sensor_class_async("temperature"):
+            return False
+        hottest_cpu = self._hottest_cpu()
+        self.target_fan_speed = await self._apply_fan_control_async(hottest_cpu)
+        self._update_adaptive_interval(hottest_cpu)
+        return True
+
+    def _poll_fru(self):
+        model_data = self.ipmi.get_server_model_info(self.cycle_deadline)
+        if not model_data:
+            return False
+        if self._store_model_info(model_data):
+            self.ipmi.load_sensor_map(model_data.get("model"))
+        return True
+
+    async def _poll_fru_async(self):
+        model_data = await self.aipmi.get_server_model_info(self.cycle_deadline)
+        if not model_data:
+            return False
+        if self._store_model_info(model_data):
+            self.ipmi.load_sensor_map(model_data.get("model"))
+        return True
+
+    def _poll_sensor_map(self):
+        return self.ipmi.sensor_map_rediscovery_due() and self.ipmi.discover_sensor_map()
+
+    async def _poll_sensor_map_async(self):
+        return self.ipmi.sensor_map_rediscovery_due() and await self.aipmi.discover_sensor_map()
+
+    def _build_scheduler(self, use_async=False):
+        check_interval = self.global_opts["check_interval_seconds"]
+        poll = self._poll_sensor_class_async if use_async else self._poll_sensor_class
+        scheduler = PollScheduler(self._log)
+        temp_interval = self.config.get('temp_poll_seconds', check_interval)
+        # Lower priorities run first. Once the cycle budget is spent, fan RPM and power/PSU reads skip a slot.
+        scheduler.add_task("temperature", temp_interval, self._poll_temperature_async if use_async else self._poll_temperature)
+        if self.config.get('adaptive_polling', False):
+            self.adaptive_interval = AdaptiveInterval(
+                temp_interval, self.config.get('min_poll_seconds', 5), self.config.get('max_poll_seconds', 300),
+                self.config.get('low_temp_threshold', 45), self.config.get('critical_temp_threshold', 65))
+        scheduler.add_task("fan", self.config.get('fan_poll_seconds', check_interval * 2), functools.partial(poll, "fan"), priority=1, skippable=True)
+        scheduler.add_task("power", self.config.get('power_poll_seconds', check_interval * 5), functools.partial(poll, "power"), priority=2, skippable=True)
+        scheduler.add_task("fru", self.config.get('fru_poll_seconds', 86400), self._poll_fru_async if use_async else self._poll_fru, priority=3)
+        # Builds the sensor map for targeted reads when there is none; until then the SDR is walked by type.
+        scheduler.add_task("sensor_map", SENSOR_MAP_CHECK_SECONDS, self._poll_sensor_map_async if use_async else self._poll_sensor_map, priority=4)
+        for name in ("fan", "power", "fru", "sensor_map"):
+            scheduler.delay(name, STARTUP_STAGGER_SECONDS)
+        if self.model_info_cached:
+            # Startup used the cached model info; refresh it once the first readings are out.
+            scheduler.delay("fru", CACHED_FRU_REFRESH_SECONDS)
+        return scheduler
+
+    def _fan_decision(self, hottest_cpu):
+        """
+        Works out what the fans should do. Returns (target_fan_speed, speed_to_apply), where
+        speed_to_apply is "auto" for Dell dynamic control, a percentage, or None to leave the fans alone.
+        """
+        target_fan_speed = "Dell Auto"
+        if self.config.get('fan_control_enabled', True):
+            fan_mode = self.config.get('fan_mode', 'simple')
             
-            if self.config.get('fan_control_enabled', True):
-                fan_mode = self.config.get('fan_mode', 'simple')
+            if hottest_cpu:
+                crit_thresh = self.config.get('critical_temp_threshold', 65)
                 
-                if hottest_cpu:
-                    crit_thresh = self.config.get('critical_temp_threshold', 65)
-                    
-                    if hottest_cpu >= crit_thresh:
-                        self.ipmi.apply_dell_fan_control_profile()
-                    elif fan_mode == 'simple':
-                        low_thresh = self.config.get('low_temp_threshold', 45)
-                        if hottest_cpu >= low_thresh: target_fan_speed = self.config.get('high_temp_fan_speed_percent', 50)
-                        else: target_fan_speed = self.config.get('base_fan_speed_percent', 20)
-                        self.ipmi.apply_user_fan_control_profile(target_fan_speed)
-                    elif fan_mode == 'target':
-                        # Get the base fan speed to use with the PID controller
-                        base_fan = self.config.get('base_fan_speed_percent', 20)
-                        speed = self.pid.update(hottest_cpu, base_fan) # Pass the base speed
-                        if speed is not None:
-                            target_fan_speed = speed
-                            self.ipmi.apply_user_fan_control_profile(target_fan_speed)
-                    elif fan_mode == 'curve':
-                        fan_curve = self.config.get('fan_curve', [])
-                        if len(fan_curve) >= 2:
-                            lower, upper = fan_curve[0], fan_curve[-1]
-                            for i in range(len(fan_curve) - 1):
-                                if fan_curve[i]['temp'] <= hottest_cpu < fan_curve[i+1]['temp']:
-                                    lower, upper = fan_curve[i], fan_curve[i+1]; break
-                            
-                            if hottest_cpu < lower['temp']: speed = lower['speed']
-                            elif hottest_cpu >= upper['temp']: speed = upper['speed']
-                            else:
-                                temp_range = upper['temp'] - lower['temp']
-                                speed_range = upper['speed'] - lower['speed']
-                                speed = lower['speed'] + ((hottest_cpu - lower['temp']) / temp_range * speed_range) if temp_range > 0 else lower['speed']
-                            
-                            target_fan_speed = int(speed)
-                            self.ipmi.apply_user_fan_control_profile(target_fan_speed)
-                else:
-                    self.ipmi.apply_dell_fan_control_profile()
-            else:
-                self._log("info", "Fan control is disabled for this server. Setting to Dell Auto.")
-                self.ipmi.apply_dell_fan_control_profile()
+                if hottest_cpu >= crit_thresh:
+                    return target_fan_speed, "auto"
+                elif fan_mode == 'simple':
+                    low_thresh = self.config.get('low_temp_threshold', 45)
+                    if hottest_cpu >= low_thresh: target_fan_speed = self.config.get('high_temp_fan_speed_percent', 50)
+                    else: target_fan_speed = self.config.get('base_fan_speed_percent', 20)
+                    return target_fan_speed, target_fan_speed
+                elif fan_mode == 'target':
+                    # Get the base fan speed to use with the PID controller
+                    base_fan = self.config.get('base_fan_speed_percent', 20)
+                    speed = self.pid.update(hottest_cpu, base_fan) # Pass the base speed
+                    if speed is not None:
+                        return speed, speed
+                elif fan_mode == 'curve':
+                    fan_curve = self.config.get('fan_curve', [])
+                    if len(fan_curve) >= 2:
+                        lower, upper = fan_curve[0], fan_curve[-1]
+                        for i in range(len(fan_curve) - 1):
+                            if fan_curve[i]['temp'] <= hottest_cpu < fan_curve[i+1]['temp']:
+                                lower, upper = fan_curve[i], fan_curve[i+1]; break
+                        
+                        if hottest_cpu < lower['temp']: speed = lower['speed']
+                        elif hottest_cpu >= upper['temp']: speed = upper['speed']
+                        else:
+                            temp_range = upper['temp'] - lower['temp']
+                            speed_range = upper['speed'] - lower['speed']
+                            speed = lower['speed'] + ((hottest_cpu - lower['temp']) / temp_range * speed_range) if temp_range > 0 else lower['speed']
+                        
+                        return int(speed), int(speed)
+                return target_fan_speed, None
+            return target_fan_speed, "auto"
+        self._log("info", "Fan control is disabled for this server. Setting to Dell Auto.")
+        return target_fan_speed, "auto"
 
-            status_data = {"hottest_cpu_temp": hottest_cpu, "inlet_temp": temps.get('inlet_temp'), "exhaust_temp": temps.get('exhaust_temp'), "power": power, "target_fan_speed": None if isinstance(target_fan_speed, str) else target_fan_speed, "cpus": temps.get('cpu_temps', []), "fans": fans, "psus": psu_statuses}
-            with status_lock:
-                ALL_SERVERS_STATUS[self.alias] = {"alias": self.alias, "ip": self.config['idrac_ip'], "last_updated": time.strftime("%Y-%m-%d %H:%M:%S %Z"), "hottest_cpu_temp_c": hottest_cpu, "inlet_temp_c": temps.get('inlet_temp'), "exhaust_temp_c": temps.get('exhaust_temp'), "power_consumption_watts": power, "target_fan_speed_percent": target_fan_speed, "cpu_temps_c": temps.get('cpu_temps', []), "actual_fan_rpms": fans, "psu_statuses": psu_statuses}
-            
-            self._publish_mqtt_data(status_data)
-            time.sleep(max(0.1, self.global_opts["check_interval_seconds"] - (time.time() - start_time)))
+    def _apply_fan_control(self, hottest_cpu):
+        target_fan_speed, speed = self._fan_decision(hottest_cpu)
+        if speed == "auto": self.ipmi.apply_dell_fan_control_profile()
+        elif speed is not None: self.ipmi.apply_user_fan_control_profile(speed)
+        return target_fan_speed
+
+    async def _apply_fan_control_async(self, hottest_cpu):
+        target_fan_speed, speed = self._fan_decision(hottest_cpu)
+        if speed == "auto": await self.aipmi.apply_dell_fan_control_profile()
+        elif speed is not None: await self.aipmi.apply_user_fan_control_profile(speed)
+        return target_fan_speed
+
+    def _hottest_cpu(self):
+        cpu_temps = self.readings["temps"]['cpu_temps']
+        return max(cpu_temps) if cpu_temps else None
+
+    def _mark_offline(self):
+        self.mqtt.publish(self.mqtt.availability_topic, "offline", retain=True)
+        # While the circuit breaker is open every command would be skipped anyway; sleep until its next probe.
+        retry_in = self.ipmi.breaker.seconds_until_retry()
+        if retry_in:
+            for name in self.scheduler.tasks:
+                self.scheduler.delay(name, retry_in)
+
+    def _update_adaptive_interval(self, hottest_cpu):
+        if self.adaptive_interval:
+            self.scheduler.set_interval("temperature", self.adaptive_interval.update(hottest_cpu))
+            self._log("debug", f"Adaptive interval: {self.adaptive_interval.interval:.0f}s (dT/dt {self.adaptive_interval.rate:.1f}°C/min)")
+
+    def _update_status(self):
+        target_fan_speed = self.target_fan_speed
+        temps, fans, power, psu_statuses = self.readings["temps"], self.readings["fans"], self.readings["power"], self.readings["psus"]
+        hottest_cpu = self._hottest_cpu()
+        status_data = {"hottest_cpu_temp": hottest_cpu, "inlet_temp": temps.get('inlet_temp'), "exhaust_temp": temps.get('exhaust_temp'), "power": power, "target_fan_speed": None if isinstance(target_fan_speed, str) else target_fan_speed}
+        poll_overruns = {name: stats["overruns"] for name, stats in self.scheduler.get_stats().items()}
+        with status_lock:
+            ALL_SERVERS_STATUS[self.alias] = {"alias": self.alias, "ip": self.config['idrac_ip'], "last_updated": time.strftime("%Y-%m-%d %H:%M:%S %Z"), "hottest_cpu_temp_c": hottest_cpu, "inlet_temp_c": temps.get('inlet_temp'), "exhaust_temp_c": temps.get('exhaust_temp'), "power_consumption_watts": power, "target_fan_speed_percent": target_fan_speed, "cpu_temps_c": temps.get('cpu_temps', []), "actual_fan_rpms": fans, "psu_statuses": psu_statuses, "poll_overruns": poll_overruns, "deadline_misses": self.deadline_misses, "ipmi_circuit": self.ipmi.breaker.get_stats(), "ipmi_queue": self.ipmi.command_queue.get_stats(), "last_cycle": self.last_cycle, "redfish_events": self.ipmi.event_stream.get_stats() if getattr(self.ipmi, "event_stream", None) else None}
+        
+        self._publish_mqtt_data(status_data)
 
+    def _start_cycle(self, deadline=None):
+        """
+        Sets the time budget every IPMI command of this cycle shares: `cycle_budget_seconds`, or the current
+        CPU temperature interval so the loop keeps its cadence. A pool task deadline can only shorten it.
+        """
+        started = time.monotonic()
+        budget = self.global_opts.get("cycle_budget_seconds") or self.scheduler.tasks["temperature"]["interval"]
+        self.cycle_deadline = started + budget if deadline is None else min(deadline, started + budget)
+        return started, budget
+
+    def _finish_cycle(self, started, budget, results):
+        self.cycle_deadline = None
+        if not results and not self.scheduler.last_skipped:
+            return
+        self.last_cycle = {"budget_seconds": round(budget, 1), "used_seconds": round(time.monotonic() - started, 2), "ran": list(results), "skipped": list(self.scheduler.last_skipped)}
+        self._log("debug", f"Cycle used {self.last_cycle['used_seconds']}s of {self.last_cycle['budget_seconds']}s; ran {self.last_cycle['ran']}, skipped {self.last_cycle['skipped']}.")
+
+        if "temperature" in results:
+            if not results["temperature"]:
+                self._mark_offline()
+                return
+            self.mqtt.publish(self.mqtt.availability_topic, "online", retain=True)
+        if results:
+            self._update_status()
+
+    def _tick(self, deadline=None):
+        """Runs the polling tasks that are due within this cycle's budget, then publishing. Returns seconds until the next task is due."""
+        with self.pushed_lock:
+            pushed, self.pushed_classes = self.pushed_classes, set()
+        self._run_pushed(pushed)
+        started, budget = self._start_cycle(deadline)
+        self._finish_cycle(started, budget, self.scheduler.run_due(self.cycle_deadline - MIN_COMMAND_SECONDS))
+        return self.scheduler.seconds_until_next()
+
+    def step(self, deadline=None):
+        """
+        One unit of work for the shared worker pool: initializes the worker if needed, otherwise runs a tick.
+        Returns how many seconds until this worker wants to run again.
+        """
+        if self.scheduler is None:
+            self._initialize()
+            # Each sensor class is polled at its own rate; fan control runs on every temperature tick.
+            self.scheduler = self._build_scheduler()
+        return self._tick(deadline)
+
+    def run(self):
+        self._initialize()
+        # Each sensor class is polled at its own rate; fan control runs on every temperature tick.
+        self.scheduler = self._build_scheduler()
+        while self.running and running:
+            self.wakeup.clear()
+            self.wakeup.wait(max(0.1, self._tick()))
+
+    async def run_async(self):
+        """Same control loop as run(), driven by the shared event loop instead of a dedicated thread."""
+        self.loop = asyncio.get_running_loop()
+        self.async_wakeup = asyncio.Event()
+        await self._initialize_async()
+        self.scheduler = self._build_scheduler(use_async=True)
+        while self.running and running:
+            self.async_wakeup.clear()
+            started, budget = self._start_cycle()
+            self._finish_cycle(started, budget, await self.scheduler.run_due_async(self.cycle_deadline - MIN_COMMAND_SECONDS))
+            try:
+                await asyncio.wait_for(self.async_wakeup.wait(), max(0.1, self.scheduler.seconds_until_next()))
+            except asyncio.TimeoutError:
+                pass
 
     def _publish_mqtt_data(self, status):
-        sensors = {
-            "shutdown_button": {"component": "button", "name": "Shutdown Server", "device_class": "restart", "icon": "mdi:server-off"},
-            "hottest_cpu_temp": {"component": "sensor", "device_class": "temperature", "unit": "°C"},
-            "inlet_temp": {"component": "sensor", "device_class": "temperature", "unit": "°C"},
-            "exhaust_temp": {"component": "sensor", "device_class": "temperature", "unit": "°C"},
-            "power": {"component": "sensor", "device_class": "power", "unit": "W", "state_class": "measurement", "icon": "mdi:flash"},
-            "target_fan_speed": {"component": "sensor", "unit": "%", "icon": "mdi:fan-chevron-up"},
-        }
-        for i, _ in enumerate(status.get('cpus', [])): sensors[f"cpu_{i}_temp"] = {"component": "sensor", "name": f"CPU {i} Temperature", "device_class": "temperature", "unit": "°C"}
-        for fan in status.get('fans', []): sensors[f"fan_{re.sub(r'[^a-zA-Z0-9_]+', '', fan['name']).lower()}_rpm"] = {"component": "sensor", "name": f"{fan['name']} RPM", "unit": "RPM", "icon": "mdi:fan"}
-        for psu in status.get('psus', []): sensors[f"psu_{re.sub(r'[^a-zA-Z0-9_]+', '', psu['name']).lower()}"] = {"component": "binary_sensor", "name": psu['name'], "device_class": "problem"}
-
-        for slug, desc in sensors.items():
-            if slug not in self.discovered_sensors:
-                cmd_topic = f"{self.mqtt.base_topic}/command/shutdown" if desc['component'] == 'button' else None
-                self.mqtt.publish_discovery(desc['component'], slug, desc.get('name', slug.replace("_", " ").title()), desc.get('device_class'), desc.get('unit'), desc.get('icon'), cmd_topic, None, desc.get('state_class'))
-                self.discovered_sensors.add(slug)
-            
-            if desc['component'] == 'sensor':
-                value = None
-                if slug.startswith('fan_'): value = next((f['rpm'] for f in status['fans'] if f"fan_{re.sub(r'[^a-zA-Z0-9_]+', '', f['name']).lower()}_rpm" == slug), None)
-                elif slug.startswith('cpu_'): value = status['cpus'][int(slug.split('_')[1])] if int(slug.split('_')[1]) < len(status['cpus']) else None
-                else: value = status.get(slug)
-                self.mqtt.publish_state('sensor', slug, value)
-            elif desc['component'] == 'binary_sensor' and slug.startswith('psu_'):
-                psu_name = desc['name']
-                psu_data = next((p for p in status['psus'] if p['name'] == psu_name), None)
-                state = "ON" if psu_data and not psu_data['ok'] else "OFF"
-                self.mqtt.publish_state('binary_sensor', slug, state)
+        # Per-CPU, fan and PSU values are already in the registry from _store_readings.
+        for slug in ("hottest_cpu_temp", "inlet_temp", "exhaust_temp", "power", "target_fan_speed"):
+            self.sensors.set(slug, status.get(slug))
+        self.sensors.publish()
 
     def cleanup(self):
         self._log("info", "Worker shutting down. Reverting to Dell auto fans.")
+        self.ipmi.reset_fan_state()
         self.ipmi.apply_dell_fan_control_profile()
-        if self.mqtt.is_connected: self.mqtt.disconnect()
+        self.ipmi.close()
+        self.mqtt.disconnect()
         
         if os.path.exists(PID_STATE_FILE):
             try:
@@ -212,16 +494,119 @@ class ServerWorker:
     def stop(self):
         self.running = False
 
+async def run_workers_async(workers):
+    """Drives every ServerWorker from one event loop. A worker that crashes is logged and does not stop the others."""
+    results = await asyncio.gather(*(worker.run_async() for worker in workers), return_exceptions=True)
+    for worker, result in zip(workers, results):
+        if isinstance(result, Exception):
+            print(f"[ERROR] [{worker.alias}] Worker stopped with an error: {result}", flush=True)
+
+def start_workers(servers_configs_list, global_options, mqtt_client_id="ha_idrac_controller"):
+    """
+    Creates a ServerWorker for every enabled server and starts them in the configured execution mode.
+    They all publish through a single MQTT connection with client ID `mqtt_client_id`.
+    """
+    # Hashes of the discovery configs published, per connection so shard processes never share a file.
+    cache_file = DISCOVERY_CACHE_FILE if mqtt_client_id == "ha_idrac_controller" else DISCOVERY_CACHE_FILE.replace(".json", f"_{mqtt_client_id}.json")
+    mqtt_connection = MqttConnection(mqtt_client_id, DiscoveryCache(cache_file, log_callback=lambda level, message: print(f"[{level.upper()}] [MAIN] {message}", flush=True)))
+    mqtt_connections.append(mqtt_connection)
+    engine = None
+    if global_options["execution_mode"] == "asyncio":
+        engine = AsyncIPMIEngine(global_options["ipmi_max_concurrency"], global_options["ipmi_per_host_concurrency"])
+        ipmi_engines.append(engine)
+        print(f"[MAIN] Using asyncio engine (max {engine.max_concurrency} IPMI commands, {engine.per_host_concurrency} per iDRAC).", flush=True)
+
+    worker_instances = []
+    for server_conf in servers_configs_list:
+        if server_conf.get("enabled", False):
+            worker = ServerWorker(server_conf, global_options, engine, mqtt_connection)
+            worker_instances.append(worker)
+            if engine or global_options["execution_mode"] == "pool": continue
+            thread = threading.Thread(target=worker.run, daemon=True)
+            threads.append(thread)
+            thread.start()
+
+    if engine and worker_instances:
+        thread = threading.Thread(target=asyncio.run, args=(run_workers_async(worker_instances),), daemon=True)
+        threads.append(thread)
+        thread.start()
+    elif global_options["execution_mode"] == "pool" and worker_instances:
+        pool = WorkerPool(worker_instances, global_options["worker_pool_size"], global_options["task_deadline_seconds"])
+        for worker in worker_instances:
+            worker.on_wakeup = pool.wake
+        thread = threading.Thread(target=pool.run, args=(lambda: running,), daemon=True)
+        threads.append(thread)
+        thread.start()
+    return worker_instances
+
+def run_shard(shard_index, servers_configs_list, global_options, status_conn):
+    """Entry point of a shard process: runs its share of the servers and sends their status to the parent every 2s."""
+    print(f"[SHARD {shard_index}] Starting with {len(servers_configs_list)} server(s) (pid {os.getpid()}).", flush=True)
+    # Each shard process has its own MQTT connection, so it needs a client ID of its own.
+    worker_instances = start_workers(servers_configs_list, global_options, f"ha_idrac_controller_shard{shard_index}")
+    try:
+        while running:
+            with status_lock:
+                snapshot = dict(ALL_SERVERS_STATUS)
+            status_conn.send(snapshot)
+            time.sleep(2)
+    except (BrokenPipeError, EOFError, KeyboardInterrupt):
+        pass
+    for worker in worker_instances: worker.stop()
+    for thread in threads: thread.join(timeout=1)
+    for connection in mqtt_connections: connection.disconnect()
+    for engine in ipmi_engines: engine.close()
+    print(f"[SHARD {shard_index}] Stopped.", flush=True)
+
+def start_shards(servers_configs_list, global_options):
+    """Splits the enabled servers round-robin across `process_shards` processes. Returns [(process, connection)]."""
+    enabled = [s for s in servers_configs_list if s.get("enabled", False)]
+    shard_count = min(global_options["process_shards"], len(enabled))
+    # spawn, not fork: the parent already runs the web server thread, and forking a threaded process is unsafe.
+    context = multiprocessing.get_context("spawn")
+    shards = []
+    for index in range(shard_count):
+        parent_conn, child_conn = context.Pipe(duplex=False)
+        process = context.Process(target=run_shard, args=(index, enabled[index::shard_count], global_options, child_conn), name=f"idrac-shard-{index}", daemon=True)
+        process.start()
+        child_conn.close()
+        shards.append((process, parent_conn))
+    print(f"[MAIN] Running {len(enabled)} server(s) across {shard_count} process(es).", flush=True)
+    return shards
+
+def collect_shard_status(shards):
+    """Merges the latest status sent by each shard into ALL_SERVERS_STATUS."""
+    for process, conn in shards:
+        try:
+            while conn.poll():
+                snapshot = conn.recv()
+                with status_lock:
+                    ALL_SERVERS_STATUS.update(snapshot)
+        except (EOFError, OSError):
+            pass
+        if not process.is_alive() and not getattr(process, "reported_dead", False):
+            process.reported_dead = True
+            print(f"[ERROR] [MAIN] Shard process {process.name} exited with code {process.exitcode}.", flush=True)
+
 # --- Main Execution ---
 if __name__ == "__main__":
     print("[MAIN] ===== HA iDRAC Multi-Server Controller Starting =====", flush=True)
 
     global_options = {
         "log_level": os.getenv("LOG_LEVEL", "info"), "check_interval_seconds": int(os.getenv("CHECK_INTERVAL_SECONDS", 60)),
+        "cycle_budget_seconds": int(os.getenv("CYCLE_BUDGET_SECONDS", 0)),
         "mqtt_host": os.getenv("MQTT_HOST", "core-mosquitto"), "mqtt_port": int(os.getenv("MQTT_PORT", 1883)),
         "mqtt_username": os.getenv("MQTT_USERNAME", ""), "mqtt_password": os.getenv("MQTT_PASSWORD", ""),
         "base_fan_speed_percent": int(os.getenv("BASE_FAN_SPEED_PERCENT", 20)), "low_temp_threshold": int(os.getenv("LOW_TEMP_THRESHOLD", 45)),
         "high_temp_fan_speed_percent": int(os.getenv("HIGH_TEMP_FAN_SPEED_PERCENT", 50)), "critical_temp_threshold": int(os.getenv("CRITICAL_TEMP_THRESHOLD", 65)),
+        "execution_mode": os.getenv("EXECUTION_MODE", "threads").lower(),
+        "worker_pool_size": int(os.getenv("WORKER_POOL_SIZE", 4)), "task_deadline_seconds": int(os.getenv("TASK_DEADLINE_SECONDS", 30)),
+        "ipmi_max_concurrency": int(os.getenv("IPMI_MAX_CONCURRENCY", 16)), "ipmi_per_host_concurrency": int(os.getenv("IPMI_PER_HOST_CONCURRENCY", 1)),
+        "process_shards": int(os.getenv("PROCESS_SHARDS", 1)),
+        "mqtt_max_age_seconds": int(os.getenv("MQTT_MAX_AGE_SECONDS", 300)), "mqtt_deadband_temperature": int(os.getenv("MQTT_DEADBAND_TEMPERATURE", 1)),
+        "mqtt_deadband_fan_rpm": int(os.getenv("MQTT_DEADBAND_FAN_RPM", 100)), "mqtt_deadband_power": int(os.getenv("MQTT_DEADBAND_POWER", 5)),
+        "mqtt_aggregate_state": os.getenv("MQTT_AGGREGATE_STATE", "false").lower() == "true",
+        "mqtt_compact_discovery": os.getenv("MQTT_COMPACT_DISCOVERY", "false").lower() == "true",
     }
 
     servers_configs_list = []
@@ -237,17 +622,15 @@ if __name__ == "__main__":
     web_thread = threading.Thread(target=web_server.run_web_server, args=(web_server_port, STATUS_FILE, status_lock), daemon=True)
     web_thread.start()
 
-    worker_instances = []
-    for server_conf in servers_configs_list:
-        if server_conf.get("enabled", False):
-            worker = ServerWorker(server_conf, global_options)
-            worker_instances.append(worker)
-            thread = threading.Thread(target=worker.run, daemon=True)
-            threads.append(thread)
-            thread.start()
+    worker_instances, shards = [], []
+    if global_options["process_shards"] > 1:
+        shards = start_shards(servers_configs_list, global_options)
+    else:
+        worker_instances = start_workers(servers_configs_list, global_options)
 
     try:
         while running:
+            collect_shard_status(shards)
             with status_lock:
                 with open(STATUS_FILE, 'w') as f: json.dump(list(ALL_SERVERS_STATUS.values()), f, indent=4)
             time.sleep(2)
@@ -257,4 +640,8 @@ if __name__ == "__main__":
     print("[MAIN] Waiting for all server threads to terminate...", flush=True)
     for worker in worker_instances: worker.stop()
     for thread in threads: thread.join(timeout=1)
+    for connection in mqtt_connections: connection.disconnect()
+    for engine in ipmi_engines: engine.close()
+    for process, _ in shards: process.terminate()
+    for process, _ in shards: process.join(timeout=5)
     print("[MAIN] ===== HA iDRAC Controller Stopped =====", flush=True)
\ No newline at end of file
@@ -2,9 +2,52 @@
 import paho.mqtt.client as mqtt
 import json
 import re
+import threading
 
-class MqttClient:
-    def __init__(self, client_id="ha_idrac_controller"):
+# Home Assistant's abbreviations of the discovery keys used here, for compact discovery payloads.
+ABBREVIATIONS = {
+    "availability": "avty", "availability_mode": "avty_mode", "availability_topic": "avty_t", "command_topic": "cmd_t",
+    "device": "dev", "device_class": "dev_cla", "entity_category": "ent_cat", "icon": "ic", "json_attributes_topic": "json_attr_t",
+    "payload_available": "pl_avail", "payload_not_available": "pl_not_avail", "payload_off": "pl_off", "payload_on": "pl_on",
+    "payload_press": "pl_prs", "state_class": "stat_cla", "state_topic": "stat_t", "unique_id": "uniq_id",
+    "unit_of_measurement": "unit_of_meas", "value_template": "val_tpl",
+}
+DEVICE_ABBREVIATIONS = {"identifiers": "ids", "manufacturer": "mf", "model": "mdl", "configuration_url": "cu"}
+
+def compact_discovery_payload(payload, base_topic, full_device=True):
+    """
+    Rewrites a discovery payload with Home Assistant's abbreviated keys and topics under `base_topic`
+    written as "~/...". Without full_device only the device identifiers are kept; Home Assistant attaches
+    the entity to the device another config described in full.
+    """
+    prefix = base_topic + "/"
+    compact = {}
+    def shorten(topic):
+        if not topic.startswith(prefix):
+            return topic
+        compact["~"] = base_topic
+        return "~/" + topic[len(prefix):]
+
+    for key, value in payload.items():
+        if key == "device":
+            if full_device:
+                value = {DEVICE_ABBREVIATIONS.get(k, k): v for k, v in value.items() if v is not None}
+            else:
+                value = {"ids": value["identifiers"]}
+        elif key == "availability":
+            value = [{"t": shorten(item["topic"])} for item in value]
+        elif key.endswith("_topic") and isinstance(value, str):
+            value = shorten(value)
+        compact[ABBREVIATIONS.get(key, key)] = value
+    return compact
+
+class MqttConnection:
+    """
+    One paho client (socket, network thread and keepalive) that any number of MqttClients publish through.
+    Its last will marks `status_topic` offline; devices list it next to their own availability topic, so
+    a crashed or disconnected add-on marks every device unavailable at once.
+    """
+    def __init__(self, client_id="ha_idrac_controller", discovery_cache=None):
         self.client_id = client_id
         self.client = mqtt.Client(client_id=self.client_id, protocol=mqtt.MQTTv311)
         self.broker_address = "core-mosquitto"
@@ -12,12 +55,17 @@ class MqttClient:
         self.username = ""
         self.password = ""
         self.is_connected = False
+        self.connections = 0  # successful connects so far, so callers can tell when the broker was reconnected
         self.log_level = "info"
-        
-        self.base_topic = "ha_idrac_controller"
-        self.availability_topic = f"{self.base_topic}/status"
-        self.device_info_dict = None
-        self.message_callback = None
+        self.status_topic = f"ha_idrac_controller/bridge/{client_id}/status"
+        self.announce_status = True  # publish "online" to status_topic on every connect
+        self.started = False
+        # Publishes made while the broker is unreachable; only the latest payload per topic is kept.
+        self.pending = {}
+        self.subscriptions = {}  # topic -> callback(topic, payload)
+        # With a DiscoveryCache, discovery configs the broker still has from a previous run are not re-sent.
+        self.discovery_cache = discovery_cache
+        self._state_lock = threading.Lock()
 
         self.client.on_connect = self.on_connect
         self.client.on_disconnect = self.on_disconnect
@@ -37,69 +85,209 @@ class MqttClient:
         if self.username:
             self.client.username_pw_set(self.username, self.password)
 
-    def set_device_info(self, server_alias, manufacturer, model, ip_address):
-        safe_alias = re.sub(r'[^a-zA-Z0-9_-]+', '_', server_alias)
-        self.base_topic = f"ha_idrac_controller/{safe_alias}"
-        self.availability_topic = f"{self.base_topic}/status"
-        self.device_info_dict = {
-            "identifiers": [f"idrac_controller_{safe_alias}"],
-            "name": f"iDRAC ({server_alias})",
-            "model": model or "PowerEdge Server",
-            "manufacturer": manufacturer or "DELL",
-            "configuration_url": f"http://{ip_address}" if ip_address else None
-        }
-        self._log("info", f"Device info for MQTT discovery set for '{server_alias}'")
-
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             self._log("info", f"Connected successfully to broker {self.broker_address}:{self.port}")
-            self.is_connected = True
+            if self.discovery_cache:
+                self.discovery_cache.connected()
+                for topic in self.discovery_cache.topics():
+                    self.subscriptions.setdefault(topic, self._on_retained_config)
+            if self.subscriptions:
+                self.client.subscribe([(topic, 0) for topic in self.subscriptions])
+            if self.announce_status:
+                self.client.publish(self.status_topic, "online", qos=1, retain=True)
+            with self._state_lock:
+                self.is_connected = True
+                self.connections += 1
+                pending, self.pending = self.pending, {}
+                if pending:
+                    self._log("info", f"Sending {len(pending)} message(s) buffered while the broker was unavailable.")
+                for topic, (payload, retain, qos) in pending.items():
+                    self.client.publish(topic, payload, qos=qos, retain=retain)
         else:
             self._log("error", f"Connection failed with code {rc}")
             self.is_connected = False
 
     def on_disconnect(self, client, userdata, rc):
         self._log("info", f"Disconnected from broker with result code {rc}.")
-        self.is_connected = False
+        with self._state_lock:
+            self.is_connected = False
 
     def _on_message(self, client, userdata, msg):
-        if self.message_callback:
-            self.message_callback(msg.topic, msg.payload.decode('utf-8'))
+        callback = self.subscriptions.get(msg.topic)
+        if callback:
+            callback(msg.topic, msg.payload.decode('utf-8'))
+
+    def _on_retained_config(self, topic, payload):
+        payload = self.discovery_cache.on_retained(topic, payload)
+        if payload is not None:
+            self.publish(topic, payload, retain=True)
+
+    def publish_config(self, topic, payload):
+        """Publishes a retained discovery config, unless the discovery cache says the broker already has it."""
+        if self.discovery_cache is None or self.discovery_cache.offer(topic, payload):
+            self.publish(topic, payload, retain=True)
+
+    def flush_discovery(self):
+        """
+        Sends the held-back configs the broker did not confirm in time, drops the subscriptions to the
+        retained configs once the confirm window is over, and saves the discovery cache.
+        """
+        if self.discovery_cache is None or not self.is_connected:
+            return
+        for topic, payload in self.discovery_cache.due():
+            self.publish(topic, payload, retain=True)
+        if not self.discovery_cache.listening():
+            config_topics = [topic for topic, callback in list(self.subscriptions.items()) if callback == self._on_retained_config]
+            if config_topics:
+                for topic in config_topics:
+                    self.subscriptions.pop(topic, None)
+                self.client.unsubscribe(config_topics)
+        self.discovery_cache.save()
 
     def connect(self):
-        if self.is_connected: return
+        """
+        Starts connecting without blocking; later calls do nothing. paho's network thread keeps retrying
+        until the broker accepts the connection (and reconnects after drops); until then publishes are buffered.
+        """
+        with self._state_lock:
+            if self.started: return
+            self.started = True
         self._log("info", f"Attempting to connect to broker {self.broker_address}...")
         try:
-            self.client.will_set(self.availability_topic, payload="offline", qos=1, retain=True)
-            self.client.connect(self.broker_address, self.port, 60)
+            self.client.will_set(self.status_topic, payload="offline", qos=1, retain=True)
+            self.client.connect_async(self.broker_address, self.port, 60)
             self.client.loop_start()
         except Exception as e:
             self._log("error", f"Could not connect to broker: {e}")
 
     def disconnect(self):
-        if not self.is_connected: return
-        self.publish(self.availability_topic, "offline", retain=True)
+        if self.is_connected:
+            self.publish(self.status_topic, "offline", retain=True)
+            self.client.disconnect()
+            self._log("info", "Gracefully disconnected.")
         self.client.loop_stop()
-        self.client.disconnect()
-        self._log("info", "Gracefully disconnected.")
         self.is_connected = False
+        self.started = False
 
-    def subscribe(self, topic):
+    def subscribe(self, topic, callback):
+        """Subscribes now if connected; subscriptions are (re)applied on every connect."""
         self._log("info", f"Subscribing to command topic: {topic}")
-        self.client.subscribe(topic)
+        self.subscriptions[topic] = callback
+        if self.is_connected:
+            self.client.subscribe(topic)
 
     def publish(self, topic, payload, retain=False, qos=0):
-        if not self.is_connected:
-            self._log("warning", f"Not connected. Cannot publish to {topic}.")
-            return
+        with self._state_lock:
+            if not self.is_connected:
+                self._log("debug", f"Not connected. Buffering message for {topic}.")
+                self.pending[topic] = (payload, retain, qos)
+                return
         try:
             self.client.publish(topic, payload, qos=qos, retain=retain)
         except Exception as e:
             self._log("error", f"Failed to publish to {topic}: {e}")
 
-    def publish_discovery(self, component, slug, name, device_class=None, unit=None, icon=None, cmd_topic=None, val_template=None, state_class=None):
+class MqttClient:
+    """
+    The MQTT side of one iDRAC: its topics, device info and discovery payloads. It publishes through
+    `connection`, an MqttConnection shared with the other servers, or through its own one if none is given.
+    """
+    def __init__(self, client_id="ha_idrac_controller", connection=None):
+        self.client_id = client_id
+        self.shared_connection = connection is not None
+        self.connection = connection or MqttConnection(client_id)
+        self.log_level = "info"
+
+        self.base_topic = "ha_idrac_controller"
+        self.availability_topic = f"{self.base_topic}/status"
+        # Aggregated mode: all sensor and binary sensor states go out as one JSON document on
+        # state_document_topic, and each entity picks its value out of it with a value_template.
+        self.aggregate_state = False
+        self.state_document_topic = f"{self.base_topic}/state"
+        # Compact mode: discovery payloads use abbreviated keys, and only one config per device
+        # (the one published with full_device=True) carries the whole device block.
+        self.compact_discovery = False
+        self.device_info_dict = None
+        self.message_callback = None
+
+    @property
+    def client(self):
+        return self.connection.client
+
+    @property
+    def is_connected(self):
+        return self.connection.is_connected
+
+    @property
+    def connections(self):
+        return self.connection.connections
+
+    def _log(self, level, message):
+        levels = {"trace": -1, "debug": 0, "info": 1, "warning": 2, "error": 3, "fatal": 4}
+        if levels.get(self.log_level, levels["info"]) <= levels.get(level.lower(), levels["info"]):
+            print(f"[{level.upper()}] MQTT ({self.client_id}): {message}", flush=True)
+
+    def configure_broker(self, host, port, username, password, log_level="info"):
+        self.log_level = log_level.lower()
+        self.connection.configure_broker(host, port, username, password, log_level)
+
+    def set_device_info(self, server_alias, manufacturer, model, ip_address):
+        safe_alias = re.sub(r'[^a-zA-Z0-9_-]+', '_', server_alias)
+        self.base_topic = f"ha_idrac_controller/{safe_alias}"
+        self.availability_topic = f"{self.base_topic}/status"
+        self.state_document_topic = f"{self.base_topic}/state"
+        self.device_info_dict = {
+            "identifiers": [f"idrac_controller_{safe_alias}"],
+            "name": f"iDRAC ({server_alias})",
+            "model": model or "PowerEdge Server",
+            "manufacturer": manufacturer or "DELL",
+            "configuration_url": f"http://{ip_address}" if ip_address else None
+        }
+        self._log("info", f"Device info for MQTT discovery set for '{server_alias}'")
+
+    def _on_message(self, topic, payload):
+        if self.message_callback:
+            self.message_callback(topic, payload)
+
+    def connect(self):
+        if not self.shared_connection:
+            # A connection of its own has its last will on this device's availability topic, which
+            # only goes online once the iDRAC answers.
+            self.connection.status_topic = self.availability_topic
+            self.connection.announce_status = False
+        self.connection.connect()
+
+    def disconnect(self):
+        if self.shared_connection:
+            self.publish(self.availability_topic, "offline", retain=True)
+        else:
+            self.connection.disconnect()
+
+    def subscribe(self, topic):
+        self.connection.subscribe(topic, self._on_message)
+
+    def publish(self, topic, payload, retain=False, qos=0):
+        self.connection.publish(topic, payload, retain, qos)
+
+    def flush_discovery(self):
+        self.connection.flush_discovery()
+
+    def state_topic(self, component, slug):
+        return f"{self.base_topic}/{component}/{slug}"
+
+    def state_payload(self, component, state, attributes=None):
+        if component != "sensor":
+            return state
+        payload = {"state": state}
+        if attributes:
+            payload.update(attributes)
+        return json.dumps(payload)
+
+    def discovery_config(self, component, slug, name, device_class=None, unit=None, icon=None, cmd_topic=None, val_template=None, state_class=None, full_device=True):
+        """Returns (config topic, JSON payload) announcing an entity, or None before set_device_info."""
         if not self.device_info_dict:
-            return
+            return None
 
         unique_id = f"{self.device_info_dict['identifiers'][0]}_{slug}"
         config_topic = f"homeassistant/{component}/{unique_id}/config"
@@ -108,10 +296,21 @@ class MqttClient:
             "name": name,
             "unique_id": unique_id,
             "device": self.device_info_dict,
-            "availability_topic": self.availability_topic,
         }
+        if self.shared_connection:
+            # Unavailable when either the add-on's connection or this iDRAC is offline.
+            payload["availability"] = [{"topic": self.connection.status_topic}, {"topic": self.availability_topic}]
+            payload["availability_mode"] = "all"
+        else:
+            payload["availability_topic"] = self.availability_topic
         
-        if component == 'sensor':
+        if self.aggregate_state and component in ('sensor', 'binary_sensor'):
+            payload["state_topic"] = self.state_document_topic
+            payload["value_template"] = val_template or f"{{{{ value_json.{slug} }}}}"
+            if component == 'binary_sensor':
+                payload["payload_on"] = "ON"
+                payload["payload_off"] = "OFF"
+        elif component == 'sensor':
             payload["state_topic"] = f"{self.base_topic}/sensor/{slug}"
             payload["json_attributes_topic"] = f"{self.base_topic}/sensor/{slug}"
             payload["value_template"] = "{{ value_json.state }}"
@@ -128,17 +327,19 @@ class MqttClient:
         if icon: payload["icon"] = icon
         if state_class: payload["state_class"] = state_class
 
-        self.publish(config_topic, json.dumps(payload), retain=True)
+        if self.compact_discovery:
+            payload = compact_discovery_payload(payload, self.base_topic, full_device)
+            return config_topic, json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+        return config_topic, json.dumps(payload)
+
+    def publish_discovery(self, component, slug, name, device_class=None, unit=None, icon=None, cmd_topic=None, val_template=None, state_class=None, full_device=True):
+        config = self.discovery_config(component, slug, name, device_class, unit, icon, cmd_topic, val_template, state_class, full_device)
+        if config:
+            self.connection.publish_config(*config)
 
     def publish_state(self, component, slug, state, attributes=None):
-        if not self.is_connected:
-            return
-            
-        topic = f"{self.base_topic}/{component}/{slug}"
-        if component == "sensor":
-            payload = {"state": state}
-            if attributes:
-                payload.update(attributes)
-            self.publish(topic, json.dumps(payload))
-        else: # For binary_sensor
-            self.publish(topic, state)
\ No newline at end of file
+        self.publish(self.state_topic(component, slug), self.state_payload(component, state, attributes))
+
+    def publish_state_document(self, states):
+        """Publishes {slug: state} for every sensor of the server as one message (aggregated mode)."""
+        self.publish(self.state_document_topic, json.dumps(states))
\ No newline at end of file
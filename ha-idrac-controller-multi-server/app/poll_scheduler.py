@@ -0,0 +1,142 @@
+# HA-iDRAC/ha-idrac-controller-multi-server/app/poll_scheduler.py
+import math
+import time
+
+class PollScheduler:
+    """
+    Runs named polling tasks, each at its own interval, from a single worker thread.
+    Due tasks run in priority order (lower first), most overdue first within a priority. A task
+    that misses one or more of its slots is coalesced into a single run and the missed slots are
+    counted as overruns.
+    """
+    def __init__(self, log_callback=None):
+        self.tasks = {}
+        self.last_skipped = []
+        self.running = None  # name of the task whose callback is executing
+        self._log_callback = log_callback
+
+    def _log(self, level, message):
+        if self._log_callback:
+            self._log_callback(level, message)
+
+    def add_task(self, name, interval, callback, run_now=True, priority=0, skippable=False):
+        """
+        `skippable` tasks give up their slot when a run_due deadline has passed; the others are
+        deferred to the next run_due call.
+        """
+        now = time.monotonic()
+        self.tasks[name] = {
+            "interval": max(1, interval), "callback": callback,
+            "next_due": now if run_now else now + max(1, interval),
+            "priority": priority, "skippable": skippable,
+            "runs": 0, "overruns": 0, "skips": 0, "last_duration": None,
+        }
+
+    def set_interval(self, name, interval):
+        """
+        Changes a task's interval; the next run comes `interval` after the slot of the last one.
+        Safe to call from the task's own callback.
+        """
+        task = self.tasks[name]
+        interval = max(1, interval)
+        if name != self.running:
+            # _finish_task has already scheduled the next run with the old interval; move it.
+            task["next_due"] = max(task["next_due"] + interval - task["interval"], time.monotonic())
+        task["interval"] = interval
+
+    def delay(self, name, seconds):
+        """Pushes a task's next run to `seconds` from now without counting it as an overrun."""
+        self.tasks[name]["next_due"] = time.monotonic() + seconds
+
+    def is_due(self, name):
+        task = self.tasks.get(name)
+        return task is not None and task["next_due"] <= time.monotonic()
+
+    def mark_run(self, name):
+        """Counts a due task as run without calling it, e.g. when another task's read already covered it."""
+        if self.is_due(name):
+            self._finish_task(name, time.monotonic())
+
+    def _due_tasks(self):
+        now = time.monotonic()
+        return [name for _, _, name in sorted((t["priority"], t["next_due"], name) for name, t in self.tasks.items() if t["next_due"] <= now)]
+
+    def _finish_task(self, name, started):
+        task = self.tasks[name]
+        finished = time.monotonic()
+        task["runs"] += 1
+        task["last_duration"] = round(finished - started, 3)
+
+        task["next_due"] += task["interval"]
+        if task["next_due"] <= finished:
+            # Coalesce: skip the slots we already missed instead of running back-to-back to catch up.
+            missed = math.floor((finished - task["next_due"]) / task["interval"]) + 1
+            task["next_due"] += missed * task["interval"]
+            task["overruns"] += missed
+            self._log("debug", f"Polling task '{name}' overran; skipped {missed} slot(s).")
+
+    def _past_deadline(self, name, deadline):
+        """True once `deadline` has passed; a skippable task then gives up its slot, any other is deferred."""
+        if deadline is None or time.monotonic() < deadline:
+            return False
+        task = self.tasks[name]
+        if task["skippable"]:
+            self._log("debug", f"Cycle budget spent; skipping polling task '{name}' until its next slot.")
+            task["next_due"] += (math.floor((time.monotonic() - task["next_due"]) / task["interval"]) + 1) * task["interval"]
+            task["skips"] += 1
+            self.last_skipped.append(name)
+        else:
+            self._log("warning", f"Cycle budget spent; deferring polling task '{name}'.")
+        return True
+
+    def run_due(self, deadline=None):
+        """
+        Runs every task whose slot has come up. Returns {name: callback result} for the tasks that ran.
+        Once `deadline` (time.monotonic()) has passed, skippable tasks lose this slot (listed in
+        last_skipped) and the remaining due tasks are left for the next call.
+        """
+        results = {}
+        self.last_skipped = []
+        for name in self._due_tasks():
+            # An earlier task may have covered this one with mark_run().
+            if not self.is_due(name) or self._past_deadline(name, deadline):
+                continue
+            started = time.monotonic()
+            self.running = name
+            try:
+                results[name] = self.tasks[name]["callback"]()
+            except Exception as e:
+                self._log("error", f"Polling task '{name}' raised: {e}")
+                results[name] = None
+            finally:
+                self.running = None
+            self._finish_task(name, started)
+        return results
+
+    async def run_due_async(self, deadline=None):
+        """Same as run_due, for tasks whose callbacks are coroutine functions."""
+        results = {}
+        self.last_skipped = []
+        for name in self._due_tasks():
+            if not self.is_due(name) or self._past_deadline(name, deadline):
+                continue
+            started = time.monotonic()
+            self.running = name
+            try:
+                results[name] = await self.tasks[name]["callback"]()
+            except Exception as e:
+                self._log("error", f"Polling task '{name}' raised: {e}")
+                results[name] = None
+            finally:
+                self.running = None
+            self._finish_task(name, started)
+        return results
+
+    def seconds_until_next(self):
+        if not self.tasks:
+            return None
+        return max(0, min(t["next_due"] for t in self.tasks.values()) - time.monotonic())
+
+    def get_stats(self):
+        return {name: {"interval": t["interval"], "runs": t["runs"], "overruns": t["overruns"], "skips": t["skips"], "last_duration": t["last_duration"]}
+                for name, t in self.tasks.items()}
@@ -0,0 +1,129 @@
+# HA-iDRAC/ha-idrac-controller-multi-server/app/redfish_events.py
+import json
+import threading
+import time
+
+# iDRAC 9 (firmware 4.40+) streams telemetry metric reports as server-sent events on this URI.
+SSE_PATH = "/redfish/v1/SSE?$filter=EventFormatType%20eq%20MetricReport"
+# Metric IDs the thermal telemetry reports use, and the sensor class each one feeds.
+METRIC_CLASSES = {"TemperatureReading": "temperature", "RPMReading": "fan"}
+
+class RedfishEventStream:
+    """
+    Listens to an iDRAC's Redfish SSE stream of telemetry metric reports on a background thread and keeps
+    the latest temperature and fan readings in the shape of the Thermal resource, so they can be parsed
+    like a polled one. A sensor class counts as live while it was reported in the last `stall_seconds`;
+    after that callers should poll again. The stream reconnects on its own, backing off up to a minute.
+    `on_report` is called from the stream thread with the sensor classes each report updated.
+    """
+    def __init__(self, connect, headers, on_report=None, stall_seconds=30, log_callback=None):
+        self.connect = connect
+        self.headers = dict(headers, Accept="text/event-stream")
+        self.on_report = on_report
+        self.stall_seconds = stall_seconds
+        self.temperatures = {}
+        self.fans = {}
+        self.last_update = {}
+        self.reports = 0
+        self.reconnects = 0
+        self.failures = 0  # failed connects or dropped streams since the last successful subscription
+        self._connection = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._log_callback = log_callback
+
+    def _log(self, level, message):
+        if self._log_callback:
+            self._log_callback(level, message)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name="redfish-events")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        connection = self._connection
+        if connection:
+            connection.close()  # unblocks the read in _listen
+
+    def is_live(self, sensor_class):
+        last = self.last_update.get(sensor_class)
+        return last is not None and time.monotonic() - last < self.stall_seconds
+
+    def thermal_snapshot(self):
+        """The pushed readings as a Redfish Thermal resource."""
+        with self._lock:
+            return {"Temperatures": list(self.temperatures.values()), "Fans": list(self.fans.values())}
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                self.failures += 1
+                # Only the first failure after a healthy stream is a warning; retries while the iDRAC stays unreachable are not.
+                self._log("warning" if self.failures == 1 else "debug", f"Redfish event stream interrupted: {e}")
+            self.reconnects += 1
+            self._stop.wait(min(60, 2 ** self.failures))
+
+    def _listen(self):
+        # A stream that stays silent for stall_seconds times out, and the reconnect goes through _run.
+        self._connection = connection = self.connect(self.stall_seconds)
+        try:
+            connection.request("GET", SSE_PATH, headers=self.headers)
+            response = connection.getresponse()
+            if response.status != 200:
+                raise ConnectionError(f"HTTP {response.status} {response.reason}")
+            self._log("info", "Subscribed to Redfish telemetry events.")
+            self.failures = 0  # the backoff starts over once a subscription has succeeded
+            data = []
+            while not self._stop.is_set():
+                line = response.readline()
+                if not line:
+                    raise ConnectionError("stream closed by the iDRAC")
+                line = line.decode("utf-8", errors="replace").rstrip("\r\n")
+                if line.startswith("data:"):
+                    data.append(line[5:].strip())
+                elif not line and data:
+                    self._handle_event("\n".join(data))
+                    data = []
+        finally:
+            self._connection = None
+            connection.close()
+
+    def _handle_event(self, data):
+        try:
+            report = json.loads(data)
+        except ValueError:
+            self._log("debug", "Ignoring a Redfish event that is not JSON.")
+            return
+        updated = set()
+        now = time.monotonic()
+        with self._lock:
+            for metric in report.get("MetricValues") or []:
+                sensor_class = METRIC_CLASSES.get(metric.get("MetricId"))
+                dell = (metric.get("Oem") or {}).get("Dell") or {}
+                name = dell.get("Label") or dell.get("ContextID")
+                if not sensor_class or not name or metric.get("MetricValue") in (None, ""):
+                    continue
+                try:
+                    value = float(metric["MetricValue"])
+                except (TypeError, ValueError):
+                    continue
+                if sensor_class == "temperature":
+                    self.temperatures[name] = {"Name": name, "ReadingCelsius": value, "Status": {"State": "Enabled"}}
+                else:
+                    self.fans[name] = {"Name": name, "Reading": value, "ReadingUnits": "RPM", "Status": {"State": "Enabled"}}
+                updated.add(sensor_class)
+            for sensor_class in updated:
+                self.last_update[sensor_class] = now
+        if updated:
+            self.reports += 1
+            if self.on_report:
+                self.on_report(updated)
+
+    def get_stats(self):
+        return {"live": sorted(c for c in METRIC_CLASSES.values() if self.is_live(c)), "reports": self.reports, "reconnects": self.reconnects}
@@ -0,0 +1,213 @@
+# HA-iDRAC/ha-idrac-controller-multi-server/app/redfish_manager.py
+import base64
+import http.client
+import json
+import queue
+import re
+import ssl
+from concurrent.futures import ThreadPoolExecutor
+from .ipmi_manager import IPMIManager
+from .circuit_breaker import CLOSED, HALF_OPEN
+from .redfish_events import RedfishEventStream
+
+CHASSIS_PATH = "/redfish/v1/Chassis/System.Embedded.1"
+SYSTEM_PATH = "/redfish/v1/Systems/System.Embedded.1"
+# The Redfish resources each sensor class is read from.
+SENSOR_RESOURCES = {
+    "temperature": ("Thermal",),
+    "fan": ("Thermal",),
+    "power": ("Power",),
+    None: ("Thermal", "Power"),
+}
+
+class RedfishError(Exception):
+    """The iDRAC answered a Redfish request with an HTTP error status."""
+    pass
+
+
+class RedfishManager(IPMIManager):
+    """
+    Reads sensors from an iDRAC 8/9 over Redfish instead of walking the SDR with IPMI.
+
+    Temperatures and fan RPMs come from the chassis Thermal resource, power consumption and PSU health
+    from Power. Requests reuse a small pool of keep-alive HTTPS connections, and a full snapshot fetches
+    both resources at once. The parse_* methods return the same structures as IPMIManager's, so the worker
+    does not care where a reading came from. Fan writes, Get Device ID and the shutdown command have no
+    Redfish equivalent on these iDRACs and still go over the configured IPMI transport.
+    """
+    def __init__(self, ip, user, password, redfish_port=443, redfish_tls=True, pool_size=2, **ipmi_options):
+        ipmi_options["fast_path"] = False  # the Redfish reads already fetch only what they need
+        super().__init__(ip, user, password, **ipmi_options)
+        self.redfish_port = redfish_port
+        self.redfish_tls = redfish_tls
+        token = base64.b64encode(f"{user}:{password}".encode()).decode()
+        self.headers = {"Authorization": f"Basic {token}", "Accept": "application/json", "Connection": "keep-alive"}
+        # iDRACs ship with a self-signed certificate.
+        self.ssl_context = ssl._create_unverified_context() if redfish_tls else None
+        self.pool_size = max(1, pool_size)
+        self.connections = queue.LifoQueue()
+        self.executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix=f"redfish-{ip}")
+        self.event_stream = None
+        self._log("info", f"Redfish sensor reads enabled ({'https' if redfish_tls else 'http'} port {redfish_port})")
+
+    def _connect(self, timeout):
+        if self.redfish_tls:
+            return http.client.HTTPSConnection(self.ip, self.redfish_port, timeout=timeout, context=self.ssl_context)
+        return http.client.HTTPConnection(self.ip, self.redfish_port, timeout=timeout)
+
+    def _request(self, method, path, timeout):
+        """Sends one request on a pooled connection and returns the decoded JSON body (or {} for an empty one)."""
+        for attempt in range(2):
+            try:
+                connection = self.connections.get_nowait()
+                reused = True
+            except queue.Empty:
+                connection, reused = self._connect(timeout), False
+            connection.timeout = timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(timeout)
+            try:
+                connection.request(method, path, headers=self.headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if reused and attempt == 0:
+                    continue  # the iDRAC closed an idle keep-alive connection; retry on a fresh one
+                raise
+            if response.will_close:
+                connection.close()
+            elif self.connections.qsize() < self.pool_size:
+                self.connections.put(connection)
+            else:
+                connection.close()
+            if response.status >= 400:
+                raise RedfishError(f"HTTP {response.status} {response.reason} for {method} {path}")
+            return json.loads(data) if data else {}
+
+    def _redfish_get(self, path, timeout=15, deadline=None):
+        """GETs a Redfish resource through the circuit breaker and the cycle budget. Returns None on failure."""
+        timeout = self._command_timeout([path], timeout, deadline)
+        if timeout is None:
+            return None
+        state = self.breaker.before_call()
+        if state not in (CLOSED, HALF_OPEN):  # a half-open breaker lets this request through as the probe
+            self._log("debug", f"Circuit breaker open; skipping: GET {path}")
+            return None
+        self._log("debug", f"Redfish GET {path}")
+        try:
+            resource = self._request("GET", path, timeout)
+        except RedfishError as e:
+            self.breaker.record_success()  # the iDRAC is up, it just refused the request
+            self._log("error", f"Redfish GET {path} failed: {e}")
+            return None
+        except (http.client.HTTPException, OSError, ValueError) as e:
+            self.breaker.record_failure()
+            self._log("error", f"Redfish GET {path} failed: {e}")
+            return None
+        self.breaker.record_success()
+        return resource
+
+    def start_event_stream(self, on_report=None, stall_seconds=30):
+        """
+        Subscribes to the iDRAC's telemetry event stream. While it keeps delivering temperature or fan
+        readings, those classes are served from the pushed readings instead of polling Thermal.
+        """
+        self.event_stream = RedfishEventStream(self._connect, self.headers, on_report, stall_seconds, log_callback=self._log)
+        self.event_stream.start()
+
+    def retrieve_sdr_snapshot(self, sensor_class=None, deadline=None):
+        """
+        Returns {"Thermal": ..., "Power": ...} with the resources `sensor_class` needs, fetched concurrently.
+        Returns None if any of them could not be read.
+        """
+        if self.event_stream and sensor_class in ("temperature", "fan") and self.event_stream.is_live(sensor_class):
+            return {"Thermal": self.event_stream.thermal_snapshot()}
+        names = SENSOR_RESOURCES.get(sensor_class, SENSOR_RESOURCES[None])
+        futures = {name: self.executor.submit(self._redfish_get, f"{CHASSIS_PATH}/{name}", 15, deadline) for name in names}
+        snapshot = {name: future.result() for name, future in futures.items()}
+        if any(resource is None for resource in snapshot.values()):
+            return None
+        return snapshot
+
+    def retrieve_temperatures_raw(self, deadline=None):
+        return self.retrieve_sdr_snapshot("temperature", deadline)
+
+    def retrieve_fan_rpms_raw(self, deadline=None):
+        return self.retrieve_sdr_snapshot("fan", deadline)
+
+    def get_server_model_info(self, deadline=None):
+        self._log("info", "Retrieving server model information...")
+        system = self._redfish_get(SYSTEM_PATH, 20, deadline)
+        if not system:
+            self._log("warning", "Could not retrieve the Redfish system resource.")
+            return None
+        model_info = {"manufacturer": system.get("Manufacturer") or "Unknown", "model": system.get("Model") or "Unknown"}
+        if "dell" in model_info["manufacturer"].lower():
+            model_info["manufacturer"] = "DELL"
+        self._log("info", f"Server Info: Manufacturer='{model_info['manufacturer']}', Model='{model_info['model']}'")
+        return self._cache_model_info(model_info)
+
+    def _healthy(self, member):
+        status = member.get("Status") or {}
+        return status.get("State", "Enabled") == "Enabled" and status.get("Health", "OK") in ("OK", None)
+
+    def parse_temperatures(self, snapshot, cpu_pattern_str, inlet_pattern_str, exhaust_pattern_str):
+        # Same rules as the SDR parser: inlet, then exhaust, then CPU; the first inlet/exhaust sensor wins.
+        temps = {"cpu_temps": [], "inlet_temp": None, "exhaust_temp": None}
+        thermal = (snapshot or {}).get("Thermal") or {}
+        for sensor in thermal.get("Temperatures", []):
+            name, reading = sensor.get("Name", ""), sensor.get("ReadingCelsius")
+            if reading is None or (sensor.get("Status") or {}).get("State", "Enabled") != "Enabled":
+                continue
+            temp_value = int(float(reading))
+            if re.search(inlet_pattern_str, name, re.IGNORECASE):
+                if temps["inlet_temp"] is None: temps["inlet_temp"] = temp_value
+            elif re.search(exhaust_pattern_str, name, re.IGNORECASE):
+                if temps["exhaust_temp"] is None: temps["exhaust_temp"] = temp_value
+            elif re.search(cpu_pattern_str, name, re.IGNORECASE): temps["cpu_temps"].append(temp_value)
+        return temps
+
+    def parse_fan_rpms(self, snapshot):
+        fans = []
+        thermal = (snapshot or {}).get("Thermal") or {}
+        for fan in thermal.get("Fans", []):
+            reading = fan.get("Reading")
+            if reading is None or fan.get("ReadingUnits", "RPM") != "RPM" or (fan.get("Status") or {}).get("State", "Enabled") != "Enabled":
+                continue
+            # iDRAC 8 names fans in FanName; Redfish 2016+ uses Name.
+            fans.append({"name": (fan.get("Name") or fan.get("FanName") or "Fan").strip(), "rpm": int(float(reading))})
+        return fans
+
+    def parse_power_consumption(self, snapshot):
+        power = (snapshot or {}).get("Power") or {}
+        for control in power.get("PowerControl", []):
+            if control.get("PowerConsumedWatts") is not None:
+                return int(float(control["PowerConsumedWatts"]))
+        return None
+
+    def get_power_status(self, snapshot):
+        power = (snapshot or {}).get("Power")
+        if not power:
+            self._log("warning", "Redfish Power resource is empty for power status parsing.")
+            return []
+        final_status = []
+        for index, psu in enumerate(power.get("PowerSupplies", []), start=1):
+            voltage = psu.get("LineInputVoltage")
+            # Named PSU1, PSU2, ... like the SDR parser so the MQTT entities stay the same.
+            is_ok = self._healthy(psu) and (voltage is None or voltage > 100)
+            final_status.append({"name": f"PSU{index}", "ok": is_ok})
+            self._log("debug", f"PSU Status for PSU{index}: Status={psu.get('Status')}, Voltage={voltage} -> Final OK={is_ok}")
+        return final_status
+
+    def close(self):
+        """Closes the event stream and the pooled Redfish connections as well as the IPMI session."""
+        super().close()
+        if self.event_stream:
+            self.event_stream.stop()
+        self.executor.shutdown(wait=False)
+        while True:
+            try:
+                self.connections.get_nowait().close()
+            except queue.Empty:
+                break
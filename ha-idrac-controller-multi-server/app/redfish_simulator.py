@@ -0,0 +1,178 @@
+# HA-iDRAC/ha-idrac-controller-multi-server/app/redfish_simulator.py
+"""
+Local stand-in for an iDRAC 9's Redfish service, used to exercise the Redfish sensor
+source without real hardware. It serves an R740-like Thermal and Power resource and the
+system resource over HTTP/1.1 keep-alive with basic authentication, and streams
+ThermalSensor/FanSensor telemetry metric reports on the SSE URI every --report-interval
+seconds.
+
+    python3 -m app.redfish_simulator --port 8443 --user root --password calvin
+
+Then set "sensor_source": "redfish", "redfish_port": 8443 and "redfish_tls": false on a
+server in servers_config.json (pass --certfile/--keyfile to serve HTTPS instead), plus
+"redfish_push": true to use the event stream.
+"""
+import argparse
+import base64
+import json
+import random
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHASSIS = "/redfish/v1/Chassis/System.Embedded.1"
+SYSTEM = "/redfish/v1/Systems/System.Embedded.1"
+
+def _status(health="OK", state="Enabled"):
+    return {"Health": health, "State": state}
+
+class SimulatedRedfish:
+    def __init__(self, user="root", password="calvin", model="PowerEdge R740", fans=6, psus=2, report_interval=1.0):
+        self.credentials = "Basic " + base64.b64encode(f"{user}:{password}".encode()).decode()
+        self.model = model
+        self.temperatures = {"System Board Inlet Temp": 22, "System Board Exhaust Temp": 31, "CPU1 Temp": 44, "CPU2 Temp": 41}
+        self.fan_rpms = [3600] * fans
+        self.psu_health = ["OK"] * psus
+        self.power_watts = 196
+        self.requests = 0
+        self.connections = 0
+        self.report_interval = report_interval
+        self.events_paused = threading.Event()  # set it to make the stream go quiet (stall) without closing it
+        self.stopped = threading.Event()
+        self.reports_sent = 0
+
+    def thermal(self):
+        return {
+            "@odata.id": f"{CHASSIS}/Thermal",
+            "Temperatures": [
+                {"Name": name, "ReadingCelsius": value + random.choice((-1, 0, 0, 1)), "Status": _status()}
+                for name, value in self.temperatures.items()
+            ],
+            "Fans": [
+                {"Name": f"System Board Fan{i + 1}", "Reading": rpm, "ReadingUnits": "RPM", "Status": _status()}
+                for i, rpm in enumerate(self.fan_rpms)
+            ],
+        }
+
+    def power(self):
+        return {
+            "@odata.id": f"{CHASSIS}/Power",
+            "PowerControl": [{"Name": "System Power Control", "PowerConsumedWatts": self.power_watts}],
+            "PowerSupplies": [
+                {"Name": f"PS{i + 1} Status", "LineInputVoltage": 230 if health == "OK" else 0, "Status": _status(health)}
+                for i, health in enumerate(self.psu_health)
+            ],
+        }
+
+    def metric_reports(self):
+        """The ThermalSensor and FanSensor reports an iDRAC 9 pushes, with the readings as strings like the real ones."""
+        thermal = self.thermal()
+        def value(metric_id, name, reading):
+            return {"MetricId": metric_id, "MetricValue": str(reading), "Timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "Oem": {"Dell": {"ContextID": name, "Label": name, "Source": "Thermal"}}}
+        yield {"@odata.type": "#MetricReport.v1_4_2.MetricReport", "Id": "ThermalSensor",
+               "MetricValues": [value("TemperatureReading", t["Name"], t["ReadingCelsius"]) for t in thermal["Temperatures"]]}
+        yield {"@odata.type": "#MetricReport.v1_4_2.MetricReport", "Id": "FanSensor",
+               "MetricValues": [value("RPMReading", f["Name"], f["Reading"]) for f in thermal["Fans"]]}
+
+    def resources(self):
+        return {
+            f"{CHASSIS}/Thermal": self.thermal,
+            f"{CHASSIS}/Power": self.power,
+            SYSTEM: lambda: {"@odata.id": SYSTEM, "Manufacturer": "Dell Inc.", "Model": self.model, "PowerState": "On"},
+        }
+
+    def handler(self):
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def setup(self):
+                super().setup()
+                simulator.connections += 1
+
+            def do_GET(self):
+                simulator.requests += 1
+                if self.headers.get("Authorization") != simulator.credentials:
+                    return self._reply(401, {"error": "Unauthorized"})
+                if self.path.startswith("/redfish/v1/SSE"):
+                    return self._stream_events()
+                resource = simulator.resources().get(self.path.rstrip("/"))
+                if resource is None:
+                    return self._reply(404, {"error": f"{self.path} not found"})
+                self._reply(200, resource())
+
+            def _stream_events(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    while not simulator.stopped.is_set():
+                        if not simulator.events_paused.is_set():
+                            for report in simulator.metric_reports():
+                                self.wfile.write(f"id: {simulator.reports_sent}\ndata: {json.dumps(report)}\n\n".encode())
+                                simulator.reports_sent += 1
+                            self.wfile.flush()
+                        simulator.stopped.wait(simulator.report_interval)
+                except OSError:
+                    pass  # the client went away
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve(self, host="127.0.0.1", port=8443, certfile=None, keyfile=None, ready_event=None):
+        server = ThreadingHTTPServer((host, port), self.handler())
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            server.socket = context.wrap_socket(server.socket, server_side=True)
+        self.server = server
+        self.address = server.server_address
+        print(f"[INFO] Redfish simulator listening on {self.address[0]}:{self.address[1]} ({'https' if certfile else 'http'})", flush=True)
+        if ready_event:
+            ready_event.set()
+        try:
+            server.serve_forever(poll_interval=0.5)
+        finally:
+            server.server_close()
+
+    def start(self, host="127.0.0.1", port=0):
+        """Serves plain HTTP from a background thread and returns the bound port."""
+        ready = threading.Event()
+        threading.Thread(target=self.serve, args=(host, port), kwargs={"ready_event": ready}, daemon=True).start()
+        ready.wait()
+        return self.address[1]
+
+    def stop(self):
+        self.stopped.set()
+        self.server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulated iDRAC Redfish service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="calvin")
+    parser.add_argument("--model", default="PowerEdge R740")
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    parser.add_argument("--report-interval", type=float, default=1.0)
+    args = parser.parse_args()
+    try:
+        SimulatedRedfish(args.user, args.password, model=args.model, report_interval=args.report_interval).serve(args.host, args.port, args.certfile, args.keyfile)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,158 @@
+# HA-iDRAC/ha-idrac-controller-multi-server/app/sdr_parser.py
+import functools
+import re
+from collections import namedtuple
+
+# One `ipmitool sdr` row. `value` and `unit` are None for discrete sensors and sensors with no reading.
+SdrRow = namedtuple("SdrRow", "name sensor_id status entity value unit text")
+
+TEMPERATURE_UNITS = ("degrees C", "C")
+_READING = re.compile(r"([-+]?\d*\.?\d+)\s*(.*)")
+_PSU_ENTITY = re.compile(r"10\.(\d)$")
+_PSU_VOLTAGE = re.compile(r"Voltage (\d)")
+_PSU_FAIL = re.compile(r"PS(\d) PG Fail")
+
+def split_row(line):
+    """Splits an `sdr elist`/`sdr type` line into an SdrRow, or returns None for anything else."""
+    columns = line.split("|")
+    if len(columns) < 5:
+        return None
+    text = "|".join(columns[4:]).strip()
+    reading = _READING.match(text)
+    value, unit = (float(reading.group(1)), reading.group(2).strip()) if reading else (None, None)
+    return SdrRow(columns[0].strip(), columns[1].strip(), columns[2].strip(), columns[3].strip(), value, unit, text)
+
+class SdrParser:
+    """
+    Turns SDR output into a snapshot of temperatures, fans, power consumption and PSU health in one pass.
+
+    The name patterns are compiled once, and the three temperature patterns are folded into a single
+    regex whose branches are tried in order (inlet, exhaust, then CPU), so every temperature row is
+    classified with one match. Rows are split on '|' rather than matched as a whole. Parsers are shared:
+    get them with get_parser() so each pattern set is compiled only once per process.
+
+    Temperature and fan rows count whatever their status column says (ok, cr, nr, ...), so an
+    over-temperature CPU still drives the fans. When several sensors match the inlet or exhaust pattern,
+    the first one in the output is used.
+    """
+    def __init__(self, cpu_pattern=r"Temp", inlet_pattern=r"Inlet Temp", exhaust_pattern=r"Exhaust Temp", power_pattern=r"^Pwr Consumption"):
+        # A branch matches at position 0 when its pattern occurs anywhere in the name; lastgroup names it.
+        branches = [f"(?=.*?(?:{pattern}))(?P<{role}>)" for role, pattern in
+                    (("inlet", inlet_pattern), ("exhaust", exhaust_pattern), ("cpu", cpu_pattern)) if pattern]
+        self.temperature_classifier = re.compile("|".join(branches), re.IGNORECASE) if branches else None
+        self.power_classifier = re.compile(power_pattern, re.IGNORECASE)
+        self._last = (None, None)
+
+    def parse(self, sdr_data):
+        """
+        Returns {"temps", "fans", "power", "psus", "psu_readings", "rows"}: temps/fans/power/psus in the
+        structures the parse_* functions return, the PSU presence/voltage/fault readings by PSU name, and every
+        row with its status and entity columns. The last result is reused when called again on the
+        same string, so parsing power and PSU status from one snapshot costs a single pass.
+        """
+        last_data, last_snapshot = self._last
+        if last_snapshot is not None and sdr_data == last_data:
+            return last_snapshot
+        snapshot = self.parse_lines((sdr_data or "").splitlines())
+        self.remember(sdr_data, snapshot)
+        return snapshot
+
+    def parse_lines(self, lines, until=None):
+        """Parses rows as they arrive from any iterable of lines; stops consuming it once until(row) is true."""
+        builder = SnapshotBuilder(self)
+        for line in lines:
+            row = builder.add(line)
+            if row is not None and until is not None and until(row):
+                break
+        return builder.finish()
+
+    def remember(self, sdr_data, snapshot):
+        """Makes parse(sdr_data) return `snapshot`, e.g. for output that was parsed while it streamed in."""
+        self._last = (sdr_data, snapshot)
+
+class SnapshotBuilder:
+    """Accumulates one SDR snapshot a line at a time, for output that is parsed while it is still being read."""
+    def __init__(self, parser):
+        self.parser = parser
+        self.classify = parser.temperature_classifier.match if parser.temperature_classifier else None
+        self.temps = {"cpu_temps": [], "inlet_temp": None, "exhaust_temp": None}
+        self.fans, self.power, self.psu_readings, self.rows = [], None, {}, []
+
+    def add(self, line):
+        """Classifies one line. Returns its SdrRow, or None if it is not an SDR row."""
+        row = split_row(line)
+        if row is None:
+            return None
+        self.rows.append(row)
+        unit = row.unit
+        if unit in TEMPERATURE_UNITS:
+            role = self.classify(row.name) if self.classify else None
+            if role is not None:
+                role = role.lastgroup
+                if role == "cpu":
+                    self.temps["cpu_temps"].append(int(row.value))
+                elif self.temps[f"{role}_temp"] is None:  # the first inlet/exhaust sensor wins
+                    self.temps[f"{role}_temp"] = int(row.value)
+        elif unit == "RPM":
+            self.fans.append({"name": row.name, "rpm": int(row.value)})
+        elif unit == "Watts":
+            if self.power is None and self.parser.power_classifier.search(row.name):
+                self.power = int(row.value)
+        else:
+            _collect_psu(row, self.psu_readings)
+        return row
+
+    def finish(self):
+        psus = []
+        for name, data in sorted(self.psu_readings.items()):
+            is_ok = data.get("present", False) and data.get("voltage", 0) > 100 and not data.get("fault", True)
+            psus.append({"name": name, "ok": is_ok})
+        return {"temps": self.temps, "fans": self.fans, "power": self.power, "psus": psus, "psu_readings": self.psu_readings, "rows": self.rows}
+
+def _collect_psu(row, psu_readings):
+    if row.name.endswith("Status"):
+        entity = _PSU_ENTITY.match(row.entity)
+        if entity and row.status == "ok" and "Presence detected" in row.text:
+            psu_readings.setdefault(f"PSU{entity.group(1)}", {})["present"] = True
+    elif row.unit == "Volts":
+        voltage = _PSU_VOLTAGE.search(row.name)
+        if voltage and row.status == "ok":
+            psu_readings.setdefault(f"PSU{voltage.group(1)}", {})["voltage"] = row.value
+    else:
+        fail = _PSU_FAIL.search(row.name)
+        if fail:
+            psu_readings.setdefault(f"PSU{fail.group(1)}", {})["fault"] = row.status not in ("ok", "nr")
+
+def row_class(row):
+    """Returns the sensor class ("temperature", "fan" or "power") a row is read for, or None."""
+    if row.unit in TEMPERATURE_UNITS:
+        return "temperature"
+    if row.unit == "RPM":
+        return "fan"
+    if row.unit == "Watts" or _PSU_VOLTAGE.search(row.name) or _PSU_FAIL.search(row.name):
+        return "power"
+    if row.name.endswith("Status") and _PSU_ENTITY.match(row.entity):
+        return "power"
+    return None
+
+class SensorWatch:
+    """
+    Stop condition for a streamed SDR read: true once every sensor of `sensor_class` in `expected`
+    ((name, sensor id) pairs from an earlier complete read) has been seen. Never true with nothing expected.
+    """
+    def __init__(self, sensor_class, expected=None):
+        self.sensor_class = sensor_class
+        self.expected = expected or set()
+        self.seen = set()
+        self.complete = False
+
+    def __call__(self, row):
+        if row_class(row) == self.sensor_class:
+            self.seen.add((row.name, row.sensor_id))
+            self.complete = bool(self.expected) and self.seen >= self.expected
+        return self.complete
+
+@functools.lru_cache(maxsize=64)
+def get_parser(cpu_pattern=r"Temp", inlet_pattern=r"Inlet Temp", exhaust_pattern=r"Exhaust Temp"):
+    """Returns the shared SdrParser for these name patterns. Raises re.error for an invalid pattern."""
+    return SdrParser(cpu_pattern, inlet_pattern, exhaust_pattern)
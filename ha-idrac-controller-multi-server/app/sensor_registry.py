@@ -0,0 +1,171 @@
+# HA-iDRAC/ha-idrac-controller-multi-server/app/sensor_registry.py
+import re
+import time
+
+_SLUG_CHARS = re.compile(r'[^a-zA-Z0-9_]+')
+
+# The entities every server has, in the order they are announced: (slug, component, name, device_class, unit, icon, state_class).
+FIXED_SENSORS = (
+    ("shutdown_button", "button", "Shutdown Server", "restart", None, "mdi:server-off", None),
+    ("hottest_cpu_temp", "sensor", None, "temperature", "°C", None, None),
+    ("inlet_temp", "sensor", None, "temperature", "°C", None, None),
+    ("exhaust_temp", "sensor", None, "temperature", "°C", None, None),
+    ("power", "sensor", None, "power", "W", "mdi:flash", "measurement"),
+    ("target_fan_speed", "sensor", None, None, "%", "mdi:fan-chevron-up", None),
+)
+
+class SensorRecord:
+    """One Home Assistant entity: its slug, MQTT topics and discovery payload, built once, and its latest value."""
+    __slots__ = ("slug", "component", "name", "device_class", "unit", "icon", "state_class", "command_topic",
+                 "state_topic", "config_topic", "discovery", "value", "announced", "deadband", "sent_value", "sent_at")
+
+    def __init__(self, slug, component, name=None, device_class=None, unit=None, icon=None, state_class=None):
+        self.slug = slug
+        self.component = component
+        self.name = name or slug.replace("_", " ").title()
+        self.device_class = device_class
+        self.unit = unit
+        self.icon = icon
+        self.state_class = state_class
+        self.command_topic = None
+        self.state_topic = None
+        self.config_topic = None
+        self.discovery = None
+        self.value = None
+        self.announced = False
+        self.deadband = 0
+        self.sent_value = None
+        self.sent_at = None  # time.monotonic() of the last state publish
+
+class SensorRegistry:
+    """
+    The MQTT entities of one server. A record is created the first time its sensor shows up in a reading
+    and reused after that, so slugs, topics and discovery payloads are worked out once (and again only
+    after reset_discovery()) rather than every cycle. The worker stores parsed readings straight into the
+    records (set_cpu_temps, set_fans, set_psus) and publish() sends the entities of the latest readings
+    in one pass.
+
+    States are only re-sent when they changed: a numeric value must move by at least the deadband of its
+    sensor class ("temperature", "fan" or "power" in `deadbands`), anything else on any change. Every
+    state is sent again once it is `max_age_seconds` old, and after the MQTT client reconnects. With a
+    max age of 0 every state is sent on every publish().
+    """
+    def __init__(self, mqtt, deadbands=None, max_age_seconds=0):
+        self.mqtt = mqtt
+        self.deadbands = deadbands or {}
+        self.max_age_seconds = max_age_seconds
+        self.connections = None  # the MQTT client's connection count when states were last published
+        self.records = {}  # slug -> SensorRecord
+        self.fixed = [self._add(*sensor) for sensor in FIXED_SENSORS]
+        self.fixed_by_slug = {record.slug: record for record in self.fixed}
+        self.cpus = []  # by CPU index
+        self.fans = {}  # by fan name as the iDRAC reports it
+        self.psus = {}  # by PSU name
+        # Records of the sensors in the latest reading of each kind, in reading order.
+        self.current_cpus, self.current_fans, self.current_psus = [], [], []
+
+    def _add(self, slug, component, name=None, device_class=None, unit=None, icon=None, state_class=None):
+        record = self.records.get(slug)
+        if record is None:
+            record = self.records[slug] = SensorRecord(slug, component, name, device_class, unit, icon, state_class)
+            record.deadband = self.deadbands.get("fan" if unit == "RPM" else device_class) or 0
+        return record
+
+    def _announce(self, record):
+        # Built when the entity is announced, so the topics and payload follow the MQTT client's device info.
+        if record.component == "button":
+            record.command_topic = f"{self.mqtt.base_topic}/command/shutdown"
+        record.state_topic = self.mqtt.state_topic(record.component, record.slug)
+        # In compact mode only the shutdown button, which every server has, carries the full device block.
+        config = self.mqtt.discovery_config(record.component, record.slug, record.name, record.device_class, record.unit, record.icon, record.command_topic, None, record.state_class, full_device=record is self.fixed[0])
+        record.config_topic, record.discovery = config or (None, None)
+        if record.discovery is not None:
+            self.mqtt.connection.publish_config(record.config_topic, record.discovery)
+        record.announced = True
+
+    def reset_discovery(self):
+        """Re-announces every entity on the next publish(), e.g. after the device model changed."""
+        for record in self.records.values():
+            record.announced = False
+            record.sent_at = None
+
+    def set(self, slug, value):
+        self.fixed_by_slug[slug].value = value
+
+    def set_cpu_temps(self, cpu_temps):
+        for index in range(len(self.cpus), len(cpu_temps)):
+            self.cpus.append(self._add(f"cpu_{index}_temp", "sensor", f"CPU {index} Temperature", "temperature", "°C"))
+        for record, value in zip(self.cpus, cpu_temps):
+            record.value = value
+        self.current_cpus = self.cpus[:len(cpu_temps)]
+
+    def set_fans(self, fans):
+        current = {}
+        for fan in fans:
+            record = self.fans.get(fan["name"])
+            if record is None:
+                slug = f"fan_{_SLUG_CHARS.sub('', fan['name']).lower()}_rpm"
+                record = self.fans[fan["name"]] = self._add(slug, "sensor", f"{fan['name']} RPM", None, "RPM", "mdi:fan")
+            if record.slug not in current:  # names that reduce to the same slug report the first fan
+                record.value = fan["rpm"]
+                current[record.slug] = record
+        self.current_fans = list(current.values())
+
+    def set_psus(self, psus):
+        current = {}
+        for psu in psus:
+            record = self.psus.get(psu["name"])
+            if record is None:
+                slug = f"psu_{_SLUG_CHARS.sub('', psu['name']).lower()}"
+                record = self.psus[psu["name"]] = self._add(slug, "binary_sensor", psu["name"], "problem")
+            # The entity is a "problem" sensor: ON when the PSU is not healthy.
+            if record.slug not in current:
+                record.value = "ON" if not psu["ok"] else "OFF"
+                current[record.slug] = record
+        self.current_psus = list(current.values())
+
+    def _due(self, record, now):
+        if record.sent_at is None or self.max_age_seconds <= 0 or now - record.sent_at >= self.max_age_seconds:
+            return True
+        if record.value == record.sent_value:
+            return False
+        if record.deadband and isinstance(record.value, (int, float)) and isinstance(record.sent_value, (int, float)):
+            return abs(record.value - record.sent_value) >= record.deadband
+        return True
+
+    def publish(self):
+        """
+        Announces entities not announced yet and publishes the state of every current one that is due.
+        In the MQTT client's aggregated mode, all current states go out as one document whenever any of
+        them is due. Returns the number of states published.
+        """
+        now = time.monotonic()
+        self.mqtt.flush_discovery()
+        if self.connections != self.mqtt.connections:
+            self.connections = self.mqtt.connections
+            for record in self.records.values():
+                record.sent_at = None  # the broker may have lost them; send everything again
+        aggregate = self.mqtt.aggregate_state
+        due, states = [], []
+        for records in (self.fixed, self.current_cpus, self.current_fans, self.current_psus):
+            for record in records:
+                if not record.announced:
+                    self._announce(record)
+                if record.component not in ("sensor", "binary_sensor"):
+                    continue
+                states.append(record)
+                if not self._due(record, now):
+                    continue
+                due.append(record)
+                if aggregate:
+                    continue
+                if record.component == "sensor":
+                    self.mqtt.publish(record.state_topic, self.mqtt.state_payload(record.component, record.value))
+                else:
+                    self.mqtt.publish(record.state_topic, record.value)
+        if aggregate and due:
+            self.mqtt.publish_state_document({record.slug: record.value for record in states})
+            due = states
+        for record in due:
+            record.sent_value, record.sent_at = record.value, now
+        return len(due)
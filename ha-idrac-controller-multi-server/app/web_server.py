@@ -73,6 +73,7 @@ def add_server():
         "enabled": True,
         "fan_control_enabled": request.form.get('fan_control_enabled', 'true') == 'true',
         "fan_mode": "simple", # Default to simple mode
+        "ipmi_transport": "ipmitool",
         "base_fan_speed_percent": int(request.form.get('base_fan_speed_percent')),
         "low_temp_threshold": int(request.form.get('low_temp_threshold')),
         "high_temp_fan_speed_percent": int(request.form.get('high_temp_fan_speed_percent')),
@@ -92,7 +93,20 @@ def edit_server_form(alias):
         server_to_edit.setdefault('pid_config', {}) # This is the fix
         server_to_edit.setdefault('target_temp', 55) # Keep this for backward compatibility
         server_to_edit.setdefault('fan_control_enabled', True)
-        return render_template('edit_server.html', server=server_to_edit)
+        server_to_edit.setdefault('ipmi_transport', 'ipmitool')
+        server_to_edit.setdefault('ipmi_port', 623)
+        server_to_edit.setdefault('ipmi_cipher_suite', 3)
+        server_to_edit.setdefault('sensor_source', 'ipmi')
+        server_to_edit.setdefault('redfish_port', 443)
+        server_to_edit.setdefault('redfish_tls', True)
+        server_to_edit.setdefault('redfish_push', False)
+        server_to_edit.setdefault('fan_refresh_seconds', 300)
+        server_to_edit.setdefault('fru_poll_seconds', 86400)
+        server_to_edit.setdefault('adaptive_polling', False)
+        server_to_edit.setdefault('min_poll_seconds', 5)
+        server_to_edit.setdefault('max_poll_seconds', 300)
+        # The temperature, fan and power tiers follow the global check interval unless set; the form only shows that as a placeholder.
+        return render_template('edit_server.html', server=server_to_edit, check_interval=global_config.get('check_interval_seconds', 60))
     flash(f"Server '{alias}' not found.", "error")
     return redirect('servers')
 
@@ -112,9 +126,25 @@ def update_server(alias):
         server_to_update['idrac_password'] = new_password
     server_to_update['enabled'] = request.form.get('enabled') == 'true'
     server_to_update['fan_control_enabled'] = request.form.get('fan_control_enabled', 'true') == 'true'
+    server_to_update['ipmi_transport'] = request.form.get('ipmi_transport', 'ipmitool')
+    server_to_update['ipmi_port'] = int(request.form.get('ipmi_port', 623))
+    server_to_update['ipmi_cipher_suite'] = int(request.form.get('ipmi_cipher_suite', 3))
+    server_to_update['sensor_source'] = request.form.get('sensor_source', 'ipmi')
+    server_to_update['redfish_port'] = int(request.form.get('redfish_port', 443))
+    server_to_update['redfish_tls'] = request.form.get('redfish_tls', 'true') == 'true'
+    server_to_update['redfish_push'] = request.form.get('redfish_push') == 'true'
+
+    # Polling rates per sensor class
+    server_to_update['adaptive_polling'] = request.form.get('adaptive_polling') == 'true'
+    for key in ('temp_poll_seconds', 'fan_poll_seconds', 'power_poll_seconds', 'fru_poll_seconds', 'min_poll_seconds', 'max_poll_seconds'):
+        if request.form.get(key):
+            server_to_update[key] = max(1, int(request.form.get(key)))
+        elif key in ('temp_poll_seconds', 'fan_poll_seconds', 'power_poll_seconds'):
+            server_to_update.pop(key, None)  # an empty field goes back to following the check interval
     
     # Update fan control mode
     server_to_update['fan_mode'] = request.form.get('fan_mode')
+    server_to_update['fan_refresh_seconds'] = int(request.form.get('fan_refresh_seconds', 300))
     
     # Simple Mode settings
     server_to_update['base_fan_speed_percent'] = int(request.form.get('base_fan_speed_percent'))
@@ -0,0 +1,104 @@
+# HA-iDRAC/ha-idrac-controller-multi-server/app/worker_pool.py
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+class WorkerPool:
+    """
+    Runs every ServerWorker on a fixed number of threads instead of one thread per server.
+
+    A single dispatcher keeps each server in a due-time heap. When a server comes due it joins a FIFO
+    ready queue, and the queue is drained onto the pool as threads free up. A server only ever has one
+    step queued or running, so servers are served in the order they became due and a slow iDRAC can hold
+    at most one pool thread. Each step gets a deadline: the worker stops starting new polling tasks once
+    it has passed, and steps that run past it are counted as deadline misses. wake() brings a server's
+    next step forward, e.g. when pushed readings made one of its polling tasks due.
+    """
+    def __init__(self, workers, pool_size=4, task_deadline=30, retry_delay=60):
+        self.workers = list(workers)
+        self.pool_size = max(1, pool_size)
+        self.task_deadline = task_deadline
+        self.retry_delay = retry_delay
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._woken = set()  # workers whose next step should run as soon as possible
+        self._wake_signal = Future()  # resolved by wake() to cut the dispatcher's wait short
+
+    def wake(self, worker):
+        """Runs `worker`'s next step as soon as a thread is free instead of at its due time. Safe from any thread."""
+        with self._lock:
+            self._woken.add(worker)
+            if not self._wake_signal.done():
+                self._wake_signal.set_result(None)
+
+    def _take_woken(self):
+        with self._lock:
+            woken, self._woken = self._woken, set()
+            if self._wake_signal.done():
+                self._wake_signal = Future()
+            return woken, self._wake_signal
+
+    def _log(self, level, message):
+        print(f"[{level.upper()}] [POOL] {message}", flush=True)
+
+    def run(self, is_running):
+        """Dispatches worker steps until is_running() returns False."""
+        self._log("info", f"Running {len(self.workers)} server(s) on {self.pool_size} thread(s), {self.task_deadline}s task deadline.")
+        waiting = [(time.monotonic(), next(self._sequence), worker) for worker in self.workers]
+        heapq.heapify(waiting)
+        ready = deque()
+        in_flight = {}  # future -> (worker, deadline, deadline already reported)
+        woken_in_flight = set()  # woken while a step was queued or running; due again as soon as it is done
+
+        executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="server")
+        try:
+            while is_running():
+                woken, wake_signal = self._take_woken()
+                now = time.monotonic()
+                if woken:
+                    waiting_workers = {entry[2] for entry in waiting}
+                    woken_in_flight.update(worker for worker in woken if worker not in waiting_workers)
+                    waiting = [(now if worker in woken else due, sequence, worker) for due, sequence, worker in waiting]
+                    heapq.heapify(waiting)
+                while waiting and waiting[0][0] <= now:
+                    _, _, worker = heapq.heappop(waiting)
+                    if worker.running:
+                        ready.append(worker)
+
+                while ready and len(in_flight) < self.pool_size:
+                    worker = ready.popleft()
+                    deadline = now + self.task_deadline
+                    in_flight[executor.submit(worker.step, deadline)] = [worker, deadline, False]
+
+                timeout = 1.0
+                if waiting:
+                    timeout = min(timeout, max(0, waiting[0][0] - now))
+                done, _ = wait(list(in_flight) + [wake_signal], timeout=timeout, return_when=FIRST_COMPLETED)
+
+                now = time.monotonic()
+                for future in done:
+                    if future is wake_signal:
+                        continue
+                    worker, _, _ = in_flight.pop(future)
+                    try:
+                        delay = future.result()
+                    except Exception as e:
+                        self._log("error", f"Worker '{worker.alias}' failed: {e}. Retrying in {self.retry_delay}s.")
+                        delay = self.retry_delay
+                    if worker in woken_in_flight:
+                        woken_in_flight.discard(worker)
+                        delay = 0
+                    heapq.heappush(waiting, (now + max(0.1, delay), next(self._sequence), worker))
+
+                for entry in in_flight.values():
+                    worker, deadline, reported = entry
+                    if not reported and now > deadline:
+                        entry[2] = True
+                        worker.deadline_misses += 1
+                        self._log("warning", f"Worker '{worker.alias}' exceeded its {self.task_deadline}s task deadline.")
+        finally:
+            # Don't block shutdown on a step that is stuck waiting for an unresponsive iDRAC.
+            executor.shutdown(wait=False, cancel_futures=True)
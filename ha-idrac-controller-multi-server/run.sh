@@ -17,6 +17,19 @@ MQTT_HOST_DEFAULT="core-mosquitto"
 MQTT_PORT_DEFAULT=1883
 MQTT_USERNAME_DEFAULT=""
 MQTT_PASSWORD_DEFAULT=""
+EXECUTION_MODE_DEFAULT="threads"
+WORKER_POOL_SIZE_DEFAULT=4
+TASK_DEADLINE_SECONDS_DEFAULT=30
+CYCLE_BUDGET_SECONDS_DEFAULT=0
+PROCESS_SHARDS_DEFAULT=1
+IPMI_MAX_CONCURRENCY_DEFAULT=16
+IPMI_PER_HOST_CONCURRENCY_DEFAULT=1
+MQTT_MAX_AGE_SECONDS_DEFAULT=300
+MQTT_DEADBAND_TEMPERATURE_DEFAULT=1
+MQTT_DEADBAND_FAN_RPM_DEFAULT=100
+MQTT_DEADBAND_POWER_DEFAULT=5
+MQTT_AGGREGATE_STATE_DEFAULT="false"
+MQTT_COMPACT_DISCOVERY_DEFAULT="false"
 
 # Read configuration from /data/options.json if it exists
 if [ -f /data/options.json ]; then
@@ -26,6 +39,7 @@ if [ -f /data/options.json ]; then
     #export IDRAC_USERNAME=$(jq -r '.idrac_username // "'"$IDRAC_USERNAME_DEFAULT"'"' /data/options.json)
     #export IDRAC_PASSWORD=$(jq -r '.idrac_password // empty' /data/options.json)
     export CHECK_INTERVAL_SECONDS=$(jq -r '.check_interval_seconds // "'"$CHECK_INTERVAL_SECONDS_DEFAULT"'"' /data/options.json)
+    export CYCLE_BUDGET_SECONDS=$(jq -r '.cycle_budget_seconds // "'"$CYCLE_BUDGET_SECONDS_DEFAULT"'"' /data/options.json)
     export LOG_LEVEL=$(jq -r '.log_level // "'"$LOG_LEVEL_DEFAULT"'"' /data/options.json)
 
     export TEMPERATURE_UNIT=$(jq -r '.temperature_unit // "'"$TEMPERATURE_UNIT_DEFAULT"'"' /data/options.json)
@@ -38,12 +52,26 @@ if [ -f /data/options.json ]; then
     export MQTT_PORT=$(jq -r '.mqtt_port // '$MQTT_PORT_DEFAULT /data/options.json)
     export MQTT_USERNAME=$(jq -r '.mqtt_username // empty' /data/options.json)
     export MQTT_PASSWORD=$(jq -r '.mqtt_password // empty' /data/options.json)
+    export MQTT_MAX_AGE_SECONDS=$(jq -r '.mqtt_max_age_seconds // "'"$MQTT_MAX_AGE_SECONDS_DEFAULT"'"' /data/options.json)
+    export MQTT_DEADBAND_TEMPERATURE=$(jq -r '.mqtt_deadband_temperature // "'"$MQTT_DEADBAND_TEMPERATURE_DEFAULT"'"' /data/options.json)
+    export MQTT_DEADBAND_FAN_RPM=$(jq -r '.mqtt_deadband_fan_rpm // "'"$MQTT_DEADBAND_FAN_RPM_DEFAULT"'"' /data/options.json)
+    export MQTT_DEADBAND_POWER=$(jq -r '.mqtt_deadband_power // "'"$MQTT_DEADBAND_POWER_DEFAULT"'"' /data/options.json)
+    export MQTT_AGGREGATE_STATE=$(jq -r '.mqtt_aggregate_state // "'"$MQTT_AGGREGATE_STATE_DEFAULT"'"' /data/options.json)
+    export MQTT_COMPACT_DISCOVERY=$(jq -r '.mqtt_compact_discovery // "'"$MQTT_COMPACT_DISCOVERY_DEFAULT"'"' /data/options.json)
+
+    export EXECUTION_MODE=$(jq -r '.execution_mode // "'"$EXECUTION_MODE_DEFAULT"'"' /data/options.json)
+    export WORKER_POOL_SIZE=$(jq -r '.worker_pool_size // "'"$WORKER_POOL_SIZE_DEFAULT"'"' /data/options.json)
+    export TASK_DEADLINE_SECONDS=$(jq -r '.task_deadline_seconds // "'"$TASK_DEADLINE_SECONDS_DEFAULT"'"' /data/options.json)
+    export PROCESS_SHARDS=$(jq -r '.process_shards // "'"$PROCESS_SHARDS_DEFAULT"'"' /data/options.json)
+    export IPMI_MAX_CONCURRENCY=$(jq -r '.ipmi_max_concurrency // "'"$IPMI_MAX_CONCURRENCY_DEFAULT"'"' /data/options.json)
+    export IPMI_PER_HOST_CONCURRENCY=$(jq -r '.ipmi_per_host_concurrency // "'"$IPMI_PER_HOST_CONCURRENCY_DEFAULT"'"' /data/options.json)
 else
     echo "[RUN.SH] WARNING: /data/options.json not found. Using internal defaults."
     export IDRAC_IP="$IDRAC_IP_DEFAULT"
     export IDRAC_USERNAME="$IDRAC_USERNAME_DEFAULT"
     export IDRAC_PASSWORD="$IDRAC_PASSWORD_DEFAULT"
     export CHECK_INTERVAL_SECONDS="$CHECK_INTERVAL_SECONDS_DEFAULT"
+    export CYCLE_BUDGET_SECONDS="$CYCLE_BUDGET_SECONDS_DEFAULT"
     export LOG_LEVEL="$LOG_LEVEL_DEFAULT"
     export TEMPERATURE_UNIT="$TEMPERATURE_UNIT_DEFAULT"
     export BASE_FAN_SPEED_PERCENT="$BASE_FAN_SPEED_PERCENT_DEFAULT"
@@ -54,6 +82,18 @@ else
     export MQTT_PORT="$MQTT_PORT_DEFAULT"
     export MQTT_USERNAME="$MQTT_USERNAME_DEFAULT"
     export MQTT_PASSWORD="$MQTT_PASSWORD_DEFAULT"
+    export MQTT_MAX_AGE_SECONDS="$MQTT_MAX_AGE_SECONDS_DEFAULT"
+    export MQTT_DEADBAND_TEMPERATURE="$MQTT_DEADBAND_TEMPERATURE_DEFAULT"
+    export MQTT_DEADBAND_FAN_RPM="$MQTT_DEADBAND_FAN_RPM_DEFAULT"
+    export MQTT_DEADBAND_POWER="$MQTT_DEADBAND_POWER_DEFAULT"
+    export MQTT_AGGREGATE_STATE="$MQTT_AGGREGATE_STATE_DEFAULT"
+    export MQTT_COMPACT_DISCOVERY="$MQTT_COMPACT_DISCOVERY_DEFAULT"
+    export EXECUTION_MODE="$EXECUTION_MODE_DEFAULT"
+    export WORKER_POOL_SIZE="$WORKER_POOL_SIZE_DEFAULT"
+    export TASK_DEADLINE_SECONDS="$TASK_DEADLINE_SECONDS_DEFAULT"
+    export PROCESS_SHARDS="$PROCESS_SHARDS_DEFAULT"
+    export IPMI_MAX_CONCURRENCY="$IPMI_MAX_CONCURRENCY_DEFAULT"
+    export IPMI_PER_HOST_CONCURRENCY="$IPMI_PER_HOST_CONCURRENCY_DEFAULT"
 fi
 
 echo "[RUN.SH] Effective Configuration:"
@@ -65,6 +105,7 @@ echo "[RUN.SH]   LOW_TEMP_THRESH: ${LOW_TEMP_THRESHOLD}°${TEMPERATURE_UNIT}"
 echo "[RUN.SH]   HIGH_TEMP_FAN_SPEED: ${HIGH_TEMP_FAN_SPEED_PERCENT}%"
 echo "[RUN.SH]   CRITICAL_TEMP_THRESH: ${CRITICAL_TEMP_THRESHOLD}°${TEMPERATURE_UNIT}"
 echo "[RUN.SH]   MQTT_HOST: ${MQTT_HOST}:${MQTT_PORT}"
+echo "[RUN.SH]   EXECUTION_MODE: ${EXECUTION_MODE}"
 # Avoid logging username/password directly unless debugging and you know it's safe
 # echo "[RUN.SH] MQTT_USERNAME: ${MQTT_USERNAME}"
 
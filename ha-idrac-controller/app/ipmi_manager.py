@@ -3,6 +3,9 @@ import subprocess
 import time
 import re 
 import os
+import json
+import threading
+from .sdr_parser import get_parser
 
 # --- Globals ---
 _IDRAC_IP = ""
@@ -10,6 +13,8 @@ _IDRAC_USER = ""
 _IDRAC_PASSWORD = ""
 _IPMI_BASE_ARGS = []
 _LOG_LEVEL = "info" 
+MODEL_CACHE_FILE = "/data/model_cache.json"
+_model_cache_lock = threading.Lock()
 
 # --- Configuration ---
 def configure_ipmi(ip, user, password, conn_type="lanplus", log_level="info"):
@@ -124,6 +129,42 @@ def get_server_model_info(): # (Keep this function as is from previous version)
     _log("warning", "Could not retrieve server model information from FRU data.")
     return None
 
+def get_device_fingerprint():
+    """Get Device ID (firmware revision, manufacturer/product IDs): one short command to check cached FRU data still applies."""
+    output = _run_ipmi_command(["0x06", "0x01"], timeout=5)
+    return " ".join(output.split()) if output else None
+
+def _load_model_cache():
+    if not os.path.exists(MODEL_CACHE_FILE):
+        return {}
+    try:
+        with open(MODEL_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError):
+        _log("warning", "Could not decode model cache file. Re-reading FRU.")
+        return {}
+
+def load_cached_model_info(fingerprint):
+    """Returns the model info cached for this iDRAC, or None if there is none or its Device ID changed."""
+    with _model_cache_lock:
+        cached = _load_model_cache().get(_IDRAC_IP)
+    if not cached or not cached.get("model_info"):
+        return None
+    if fingerprint is not None and cached.get("fingerprint") != fingerprint:
+        _log("info", "Device ID changed since the model info was cached. Re-reading FRU.")
+        return None
+    return cached["model_info"]
+
+def save_model_cache(model_info, fingerprint):
+    with _model_cache_lock:
+        all_models = _load_model_cache()
+        all_models[_IDRAC_IP] = {"fingerprint": fingerprint, "model_info": model_info}
+        try:
+            with open(MODEL_CACHE_FILE, 'w') as f:
+                json.dump(all_models, f, indent=4)
+        except IOError as e:
+            _log("warning", f"Could not save model cache: {e}")
+
 def retrieve_temperatures_raw(): # (Keep this function as is)
     _log("debug", "Retrieving raw temperature SDR data...")
     sdr_output = _run_ipmi_command(["sdr", "type", "temperature"], is_raw_command=False)
@@ -131,46 +172,17 @@ def retrieve_temperatures_raw(): # (Keep this function as is)
     else: _log("warning", "Failed to retrieve SDR temperature data.")
     return sdr_output
 
-def parse_temperatures(sdr_data, cpu_generic_pattern_str, inlet_pattern_str, exhaust_pattern_str): # (Keep this function as is from previous version)
+def parse_temperatures(sdr_data, cpu_generic_pattern_str, inlet_pattern_str, exhaust_pattern_str):
     temps = { "cpu_temps": [], "inlet_temp": None, "exhaust_temp": None }
     if not sdr_data: _log("warning", "SDR data empty for temp parsing."); return temps
-    _log("debug", f"Compiling temp regex: CPU='{cpu_generic_pattern_str}', Inlet='{inlet_pattern_str}', Exhaust='{exhaust_pattern_str}'")
     try:
-        cpu_generic_pattern = re.compile(cpu_generic_pattern_str, re.IGNORECASE) if cpu_generic_pattern_str else None
-        inlet_pattern = re.compile(inlet_pattern_str, re.IGNORECASE) if inlet_pattern_str else None
-        exhaust_pattern = re.compile(exhaust_pattern_str, re.IGNORECASE) if exhaust_pattern_str else None
-    except re.error as e: _log("error", f"Invalid regex for temp parsing: {e}"); return temps 
-    temp_line_regex = re.compile(r"^(.*?)\s*\|\s*[\da-fA-F]+h\s*\|\s*(?:ok|ns|nr|cr|u|\[Unknown\])\s*.*?\|\s*([-+]?\d*\.?\d+)\s*(?:degrees C|C)", re.IGNORECASE)
-    _log("debug", "Parsing SDR lines for temperatures...")
-    lines = sdr_data.splitlines()
-    inlet_found, exhaust_found = False, False
-    for i, line in enumerate(lines):
-        line_content = line.strip()
-        _log("trace", f"Processing Temp Line {i+1}: '{line_content}'")
-        match_temp = temp_line_regex.match(line_content)
-        if match_temp:
-            sensor_name = match_temp.group(1).strip()
-            temp_val_str = match_temp.group(2)
-            _log("trace", f"  Line matched main temp regex. Sensor: '{sensor_name}', ValueStr: '{temp_val_str}'")
-            try: temp_value = int(float(temp_val_str))
-            except (ValueError, IndexError) as e: _log("warning", f"  Could not parse numeric temp ('{temp_val_str}') from: {line_content}. Error: {e}"); continue
-            if not inlet_found and inlet_pattern and inlet_pattern.search(sensor_name):
-                temps["inlet_temp"] = temp_value; inlet_found = True
-                _log("debug", f"  MATCHED INLET: '{sensor_name}' as {temp_value}°C"); continue 
-            if not exhaust_found and exhaust_pattern and exhaust_pattern.search(sensor_name):
-                temps["exhaust_temp"] = temp_value; exhaust_found = True
-                _log("debug", f"  MATCHED EXHAUST: '{sensor_name}' as {temp_value}°C"); continue
-            if cpu_generic_pattern and cpu_generic_pattern.search(sensor_name):
-                is_already_cat = (inlet_found and inlet_pattern and inlet_pattern.search(sensor_name)) or \
-                                 (exhaust_found and exhaust_pattern and exhaust_pattern.search(sensor_name))
-                if not is_already_cat:
-                    temps["cpu_temps"].append(temp_value)
-                    _log("debug", f"  MATCHED GENERIC CPU: '{sensor_name}' as {temp_value}°C, added to list.")
-                else: _log("trace", f"  Generic CPU pattern matched '{sensor_name}', but already categorized.")
-        else: _log("trace", f"  Line did not match temp_line_regex: {line_content}")
+        parser = get_parser(cpu_generic_pattern_str, inlet_pattern_str, exhaust_pattern_str)
+    except re.error as e: _log("error", f"Invalid regex for temp parsing: {e}"); return temps
+    temps = parser.parse(sdr_data)["temps"]
+    _log("debug", f"Parsed temperatures: {temps}")
     if not temps["cpu_temps"]: _log("warning", f"No CPU temperature sensors found using pattern: {cpu_generic_pattern_str}")
-    if not inlet_found and inlet_pattern_str : _log("info", f"Inlet temperature sensor not found using pattern: {inlet_pattern_str}")
-    if not exhaust_found and exhaust_pattern_str: _log("info", f"Exhaust temperature sensor not found using pattern: {exhaust_pattern_str}")
+    if temps["inlet_temp"] is None and inlet_pattern_str: _log("info", f"Inlet temperature sensor not found using pattern: {inlet_pattern_str}")
+    if temps["exhaust_temp"] is None and exhaust_pattern_str: _log("info", f"Exhaust temperature sensor not found using pattern: {exhaust_pattern_str}")
     return temps
 
 def retrieve_fan_rpms_raw():
@@ -189,36 +201,11 @@ def parse_fan_rpms(sdr_data):
         return fans
 
     # Example line: Fan1A Tach       | 30h | ok  |  7.1 | 2040 RPM
-    # Some fans might be "Fan Modi OCP" or similar, not just Tach.
-    # We need a regex that captures the name and the RPM value.
-    # This regex tries to capture a fan name (group 1) that might contain "Fan" or "Tach",
-    # and the RPM value (group 3).
-    fan_line_regex = re.compile(
-        r"^(.*?Fan.*?|.*?Tach.*?)\s*\|\s*[\da-fA-F]+h\s*\|\s*(?:ok|ns|nr|cr|u|\[Unknown\])\s*.*?\|\s*([\d\.]+)\s*RPM",
-        re.IGNORECASE
-    )
-    _log("debug", "Parsing SDR lines for fan RPMs...")
-    lines = sdr_data.splitlines()
-
-    for i, line in enumerate(lines):
-        line_content = line.strip()
-        _log("trace", f"Processing Fan Line {i+1}: '{line_content}'")
-        match_fan = fan_line_regex.match(line_content)
-        if match_fan:
-            fan_name = match_fan.group(1).strip()
-            rpm_str = match_fan.group(2) # Changed from group 3 due to regex simplification
-            _log("trace", f"  Line matched fan_line_regex. Fan: '{fan_name}', RPM_Str: '{rpm_str}'")
-            try:
-                rpm_value = int(float(rpm_str))
-                fans.append({"name": fan_name, "rpm": rpm_value})
-                _log("debug", f"  MATCHED FAN: '{fan_name}' as {rpm_value} RPM")
-            except (ValueError, IndexError) as e:
-                _log("warning", f"  Could not parse numeric RPM value ('{rpm_str}') from: {line_content}. Error: {e}")
-        else:
-            _log("trace", f"  Line did not match fan_line_regex (looking for 'RPM'): {line_content}")
-            
+    fans = get_parser().parse(sdr_data)["fans"]
+    _log("debug", f"Parsed fan RPMs: {fans}")
     if not fans: _log("info", "No fan RPMs found or parsed.")
     return fans
+
 def retrieve_power_sdr_raw():
     _log("debug", "Retrieving raw power/current SDR data...")
     sdr_output = _run_ipmi_command(["sdr", "type", "current"], is_raw_command=False, timeout=10)
@@ -233,42 +220,14 @@ def parse_power_consumption(sdr_data):
     Parses 'ipmitool sdr type current' output for Power Consumption in Watts.
     Returns the power consumption as an integer, or None if not found.
     """
-    power_watts = None
     if not sdr_data:
         _log("warning", "SDR data is empty for power consumption parsing.")
         return None
 
     # Example line: Pwr Consumption  | 77h | ok  |  7.1 | 196 Watts
-    # Regex to find the line starting with "Pwr Consumption" (case insensitive for "Pwr")
-    # and capture the numeric value before "Watts".
-    # Group 1: The sensor name part (e.g., "Pwr Consumption")
-    # Group 2: The numeric value (e.g., "196")
-    power_line_regex = re.compile(
-        r"^(Pwr Consumption.*?)\s*\|\s*[\da-fA-F]+h\s*\|\s*(?:ok|ns|nr|cr|u|\[Unknown\])\s*.*?\|\s*([\d\.]+)\s*Watts",
-        re.IGNORECASE
-    )
-    
-    _log("debug", "Parsing SDR lines for power consumption...")
-    lines = sdr_data.splitlines()
-
-    for i, line in enumerate(lines):
-        line_content = line.strip()
-        _log("trace", f"Processing Power Line {i+1}: '{line_content}'")
-        match_power = power_line_regex.match(line_content)
-        if match_power:
-            sensor_name = match_power.group(1).strip()
-            power_val_str = match_power.group(2)
-            _log("trace", f"  Line matched power_line_regex. Sensor: '{sensor_name}', ValueStr: '{power_val_str}'")
-            try:
-                power_watts = int(float(power_val_str))
-                _log("debug", f"  MATCHED POWER: '{sensor_name}' as {power_watts} Watts")
-                break # Found what we need, no need to parse other "Current" sensors for this function
-            except (ValueError, IndexError) as e:
-                _log("warning", f"  Could not parse numeric power value ('{power_val_str}') from: {line_content}. Error: {e}")
-        else:
-            _log("trace", f"  Line did not match power_line_regex: {line_content}")
-            
+    power_watts = get_parser().parse(sdr_data)["power"]
     if power_watts is None:
         _log("warning", "Power Consumption sensor (Watts) not found in SDR data.")
-    
-    return power_watts
\ No newline at end of file
+    else:
+        _log("debug", f"Parsed power consumption: {power_watts} Watts")
+    return power_watts
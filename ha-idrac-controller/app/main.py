@@ -10,6 +10,7 @@ import json
 from . import ipmi_manager
 from . import web_server
 from . import mqtt_client
+from .adaptive_interval import AdaptiveInterval
 
 # --- Global Variables ---
 running = True
@@ -117,6 +118,18 @@ def save_current_status_to_file(status_dict):
         print(f"[ERROR] Could not save status to {STATUS_FILE}: {e}", flush=True)
 
 # --- Main Application Logic ---
+def refresh_model_info(fingerprint, log_level):
+    """Reads the FRU, updates server_info and the model cache. Returns False if the model could not be determined."""
+    model_data = ipmi_manager.get_server_model_info()
+    if not model_data or model_data.get("model") == "Unknown":
+        return False
+    model_data["is_gen14_plus"] = determine_server_generation(model_data["model"])
+    if model_data["model"] != server_info.get("model"):
+        print(f"[{log_level.upper()}] Server: {model_data['manufacturer']} {model_data['model']} (Gen14+: {model_data['is_gen14_plus']})", flush=True)
+    server_info.update(model_data)
+    ipmi_manager.save_model_cache(model_data, fingerprint)
+    return True
+
 def load_and_configure(mqtt_handler): # Pass mqtt_handler to set device_info
     global addon_options, app_config, server_info
     print("[MAIN] Loading configuration and initializing...", flush=True)
@@ -125,6 +138,9 @@ def load_and_configure(mqtt_handler): # Pass mqtt_handler to set device_info
         "idrac_ip": os.getenv("IDRAC_IP"), "idrac_username": os.getenv("IDRAC_USERNAME"),
         "idrac_password": os.getenv("IDRAC_PASSWORD"),
         "check_interval_seconds": int(os.getenv("CHECK_INTERVAL_SECONDS", "60")),
+        "adaptive_polling": os.getenv("ADAPTIVE_POLLING", "false").lower() == "true",
+        "min_check_interval_seconds": int(os.getenv("MIN_CHECK_INTERVAL_SECONDS", "10")),
+        "max_check_interval_seconds": int(os.getenv("MAX_CHECK_INTERVAL_SECONDS", "300")),
         "log_level": os.getenv("LOG_LEVEL", "info").lower(),
         "fan_control_enabled": os.getenv("FAN_CONTROL_ENABLED", "true").lower() == "true",
         "fan_control_mode": os.getenv("FAN_CONTROL_MODE", "simple").lower(),
@@ -136,7 +152,12 @@ def load_and_configure(mqtt_handler): # Pass mqtt_handler to set device_info
         "mqtt_host": os.getenv("MQTT_HOST", "core-mosquitto"),
         "mqtt_port": int(os.getenv("MQTT_PORT", "1883")),
         "mqtt_username": os.getenv("MQTT_USERNAME", ""),
-        "mqtt_password": os.getenv("MQTT_PASSWORD", "")
+        "mqtt_password": os.getenv("MQTT_PASSWORD", ""),
+        "mqtt_max_age_seconds": int(os.getenv("MQTT_MAX_AGE_SECONDS", "300")),
+        "mqtt_deadband_temperature": int(os.getenv("MQTT_DEADBAND_TEMPERATURE", "1")),
+        "mqtt_deadband_fan_rpm": int(os.getenv("MQTT_DEADBAND_FAN_RPM", "100")),
+        "mqtt_deadband_power": int(os.getenv("MQTT_DEADBAND_POWER", "5")),
+        "mqtt_compact_discovery": os.getenv("MQTT_COMPACT_DISCOVERY", "false").lower() == "true"
     }
     
     # Load fan curve if provided
@@ -153,12 +174,14 @@ def load_and_configure(mqtt_handler): # Pass mqtt_handler to set device_info
         addon_options["idrac_password"], log_level=log_level
     )
 
-    model_data = ipmi_manager.get_server_model_info()
-    if model_data and model_data.get("model") != "Unknown":
+    # Reuse the last FRU read while the iDRAC's Device ID is unchanged and refresh it in the background.
+    fingerprint = ipmi_manager.get_device_fingerprint()
+    model_data = ipmi_manager.load_cached_model_info(fingerprint)
+    if model_data:
         server_info.update(model_data)
-        server_info["is_gen14_plus"] = determine_server_generation(server_info["model"])
-        print(f"[{log_level.upper()}] Server: {server_info['manufacturer']} {server_info['model']} (Gen14+: {server_info['is_gen14_plus']})", flush=True)
-    else:
+        print(f"[{log_level.upper()}] Server (cached): {server_info['manufacturer']} {server_info['model']} (Gen14+: {server_info['is_gen14_plus']})", flush=True)
+        threading.Thread(target=refresh_model_info, args=(fingerprint, log_level), daemon=True).start()
+    elif not refresh_model_info(fingerprint, log_level):
         print(f"[WARNING] Could not determine server model.", flush=True)
     
     if mqtt_handler: # Configure MQTT client with device info
@@ -167,6 +190,8 @@ def load_and_configure(mqtt_handler): # Pass mqtt_handler to set device_info
             addon_options["mqtt_username"], addon_options["mqtt_password"],
             log_level
         )
+        mqtt_handler.state_max_age_seconds = addon_options["mqtt_max_age_seconds"]
+        mqtt_handler.compact_discovery = addon_options["mqtt_compact_discovery"]
         mqtt_handler.set_device_info(
             server_info.get("manufacturer"), 
             server_info.get("model"), 
@@ -217,11 +242,21 @@ def main_control_loop(mqtt_handler):
     
     print(f"[{log_level.upper()}] Entering main control loop. Interval: {addon_options['check_interval_seconds']}s", flush=True)
 
+    adaptive_interval = None
+    if addon_options["adaptive_polling"]:
+        adaptive_interval = AdaptiveInterval(
+            addon_options["check_interval_seconds"], addon_options["min_check_interval_seconds"],
+            addon_options["max_check_interval_seconds"], addon_options["low_temp_threshold_c"],
+            addon_options["critical_temp_threshold_c"]
+        )
+        print(f"[{log_level.upper()}] Adaptive polling enabled: {adaptive_interval.min_interval}s - {adaptive_interval.max_interval}s", flush=True)
+
     while running:
         start_time = time.time()
         # Initialize sleep_duration at the start of the loop to a default
         # This ensures it's always defined before the end-of-loop sleep logic.
         sleep_duration = float(addon_options["check_interval_seconds"])
+        cycle_interval = addon_options["check_interval_seconds"]
 
 
         try: # Add a try block for the main work of the cycle
@@ -305,6 +340,10 @@ def main_control_loop(mqtt_handler):
             else:
                 print(f"[WARNING] No CPU temperatures available for fan control.", flush=True)
 
+            if adaptive_interval:
+                cycle_interval = adaptive_interval.update(hottest_cpu_temp_c)
+                print(f"[{log_level.upper()}] Adaptive interval: {cycle_interval:.0f}s (dT/dt {adaptive_interval.rate:.1f}°C/min)", flush=True)
+
             # --- Fan Control Logic ---
             target_fan_speed_display = "N/A" 
             if addon_options["fan_control_enabled"]:
@@ -398,18 +437,20 @@ def main_control_loop(mqtt_handler):
 
             # --- MQTT State Publishing ---
             if mqtt_handler and mqtt_handler.is_connected:
-                # (Keep existing MQTT state publishing logic for temps, target fan speed, hottest cpu, power, fan rpms)
+                mqtt_handler.flush_discovery()
+                # States only go out when they moved by their deadband or are older than mqtt_max_age_seconds.
+                temp_deadband = addon_options["mqtt_deadband_temperature"]
                 # CPU Temps
                 for i, cpu_temp_val in enumerate(cpu_temps_list_c):
-                    mqtt_handler.publish_sensor_state(sensor_type_slug=f"cpu_{i}_temp", value_dict={"temperature": cpu_temp_val})
+                    mqtt_handler.publish_sensor_state(sensor_type_slug=f"cpu_{i}_temp", value_dict={"temperature": cpu_temp_val}, deadband=temp_deadband)
                 # Inlet/Exhaust
                 if parsed_temperatures_c.get("inlet_temp") is not None:
-                     mqtt_handler.publish_sensor_state(sensor_type_slug="inlet_temp", value_dict={"temperature": parsed_temperatures_c["inlet_temp"]})
+                     mqtt_handler.publish_sensor_state(sensor_type_slug="inlet_temp", value_dict={"temperature": parsed_temperatures_c["inlet_temp"]}, deadband=temp_deadband)
                 if parsed_temperatures_c.get("exhaust_temp") is not None:
-                     mqtt_handler.publish_sensor_state(sensor_type_slug="exhaust_temp", value_dict={"temperature": parsed_temperatures_c["exhaust_temp"]})
+                     mqtt_handler.publish_sensor_state(sensor_type_slug="exhaust_temp", value_dict={"temperature": parsed_temperatures_c["exhaust_temp"]}, deadband=temp_deadband)
                 # Hottest CPU
                 if hottest_cpu_temp_c is not None:
-                    mqtt_handler.publish_sensor_state(sensor_type_slug="hottest_cpu_temp", value_dict={"temperature": hottest_cpu_temp_c})
+                    mqtt_handler.publish_sensor_state(sensor_type_slug="hottest_cpu_temp", value_dict={"temperature": hottest_cpu_temp_c}, deadband=temp_deadband)
                 # Target Fan Speed
                 if target_fan_speed_display not in ["N/A", "Dell Auto", "Dell Auto (Safety)"]:
                     try: # Ensure it's an int before publishing if template expects number
@@ -420,13 +461,13 @@ def main_control_loop(mqtt_handler):
                      mqtt_handler.publish_sensor_state(sensor_type_slug="target_fan_speed", value_dict={"speed": None}) 
                 # Power Consumption
                 if power_consumption_watts is not None:
-                    mqtt_handler.publish_sensor_state(sensor_type_slug="power_consumption", value_dict={"power": power_consumption_watts})
+                    mqtt_handler.publish_sensor_state(sensor_type_slug="power_consumption", value_dict={"power": power_consumption_watts}, deadband=addon_options["mqtt_deadband_power"])
                 # Actual Fan RPMs
                 for i, fan_info in enumerate(parsed_fan_rpms):
                     fan_name = fan_info["name"]
                     safe_fan_name_slug = re.sub(r'[^a-zA-Z0-9_]+', '_', fan_name).lower().strip('_')
                     if not safe_fan_name_slug: safe_fan_name_slug = f"fan_{i}"
-                    mqtt_handler.publish_sensor_state(sensor_type_slug=f"fan_{safe_fan_name_slug}_rpm", value_dict={"rpm": fan_info["rpm"]})
+                    mqtt_handler.publish_sensor_state(sensor_type_slug=f"fan_{safe_fan_name_slug}_rpm", value_dict={"rpm": fan_info["rpm"]}, deadband=addon_options["mqtt_deadband_fan_rpm"])
 
             print(f"[{log_level.upper()}] --- Cycle {loop_count + 1} End ---", flush=True)
         
@@ -441,7 +482,7 @@ def main_control_loop(mqtt_handler):
         # --- Sleep Logic ---
         # This calculation should now always happen, even if there was an error in the 'try' block above.
         time_taken = time.time() - start_time
-        sleep_duration = max(0.1, addon_options["check_interval_seconds"] - time_taken)
+        sleep_duration = max(0.1, cycle_interval - time_taken)
         
         print(f"[{log_level.upper()}] Cycle {loop_count + 1} took {time_taken:.2f}s. Sleeping for {sleep_duration:.2f}s.", flush=True)
         loop_count += 1
@@ -4,6 +4,44 @@ import os
 import time
 import json
 import re # For sanitizing fan names
+from .discovery_cache import DiscoveryCache
+
+# Home Assistant's abbreviations of the discovery keys used here, for compact discovery payloads.
+ABBREVIATIONS = {
+    "availability": "avty", "availability_mode": "avty_mode", "availability_topic": "avty_t", "command_topic": "cmd_t",
+    "device": "dev", "device_class": "dev_cla", "entity_category": "ent_cat", "icon": "ic", "json_attributes_topic": "json_attr_t",
+    "payload_available": "pl_avail", "payload_not_available": "pl_not_avail", "payload_off": "pl_off", "payload_on": "pl_on",
+    "payload_press": "pl_prs", "state_class": "stat_cla", "state_topic": "stat_t", "unique_id": "uniq_id",
+    "unit_of_measurement": "unit_of_meas", "value_template": "val_tpl",
+}
+DEVICE_ABBREVIATIONS = {"identifiers": "ids", "manufacturer": "mf", "model": "mdl", "configuration_url": "cu"}
+
+def compact_discovery_payload(payload, base_topic, full_device=True):
+    """
+    Rewrites a discovery payload with Home Assistant's abbreviated keys and topics under `base_topic`
+    written as "~/...". Without full_device only the device identifiers are kept; Home Assistant attaches
+    the entity to the device another config described in full.
+    """
+    prefix = base_topic + "/"
+    compact = {}
+    def shorten(topic):
+        if not topic.startswith(prefix):
+            return topic
+        compact["~"] = base_topic
+        return "~/" + topic[len(prefix):]
+
+    for key, value in payload.items():
+        if key == "device":
+            if full_device:
+                value = {DEVICE_ABBREVIATIONS.get(k, k): v for k, v in value.items() if v is not None}
+            else:
+                value = {"ids": value["identifiers"]}
+        elif key == "availability":
+            value = [{"t": shorten(item["topic"])} for item in value]
+        elif key.endswith("_topic") and isinstance(value, str):
+            value = shorten(value)
+        compact[ABBREVIATIONS.get(key, key)] = value
+    return compact
 
 class MqttClient:
     def __init__(self, client_id="ha_idrac_controller"):
@@ -16,9 +54,21 @@ class MqttClient:
         self.is_connected = False
         self.device_info_dict = None # This will be set by main.py after server_info is fetched
         self.log_level = "info" # Default, can be updated from main.py
+        # Change-based state publishing: state topic -> (last value_dict sent, time.monotonic() it was sent).
+        # States are re-sent when a value moves by the deadband passed to publish_sensor_state, and at
+        # least every state_max_age_seconds (0 = every call).
+        self.state_max_age_seconds = 0
+        self.last_sent_states = {}
+        # Hashes of the discovery configs published, so a restart does not re-send the ones the broker still has.
+        self.discovery_cache = DiscoveryCache(log_callback=self._log)
+        self.subscribed_configs = []  # retained config topics subscribed to during the confirm window
+        # Compact mode: discovery payloads use abbreviated keys, and only the connectivity sensor's
+        # config carries the whole device block.
+        self.compact_discovery = False
 
         self.client.on_connect = self.on_connect
         self.client.on_disconnect = self.on_disconnect
+        self.client.on_message = self._on_message
 
     def _log(self, level, message):
         levels = {"trace": -1, "debug": 0, "info": 1, "warning": 2, "error": 3, "fatal": 4}
@@ -49,6 +99,13 @@ class MqttClient:
         if rc == 0:
             self._log("info", f"Connected successfully to broker {self.broker_address}:{self.port}")
             self.is_connected = True
+            self.last_sent_states.clear() # states published before a reconnect may have been lost
+            # The broker answers with the retained configs it still has; until it does (or the confirm
+            # window ends) the configs published before are held back, and re-sent if it lost them.
+            self.discovery_cache.connected()
+            self.subscribed_configs = self.discovery_cache.topics()
+            if self.subscribed_configs:
+                self.client.subscribe([(topic, 0) for topic in self.subscribed_configs])
             
             # Publish general add-on availability status sensor
             if self.device_info_dict:
@@ -62,7 +119,7 @@ class MqttClient:
                     "payload_off": "offline",
                     "device": self.device_info_dict
                 }
-                self.publish(status_config_topic, json.dumps(status_config_payload), retain=True)
+                self.publish_config(status_config_topic, self._discovery_json(status_config_payload, "ha_idrac_controller", full_device=True))
             self.publish("ha_idrac_controller/status", "online", retain=True)
 
             # Static sensor discoveries (non-CPU, non-FanRPM which are dynamic)
@@ -71,6 +128,30 @@ class MqttClient:
             self._log("error", f"Connection failed with code {rc}")
             self.is_connected = False
 
+    def _on_message(self, client, userdata, msg):
+        payload = self.discovery_cache.on_retained(msg.topic, msg.payload.decode('utf-8'))
+        if payload is not None:
+            self.publish(msg.topic, payload, retain=True)
+
+    def publish_config(self, topic, payload):
+        """Publishes a retained discovery config, unless the discovery cache says the broker already has it."""
+        if self.discovery_cache.offer(topic, payload):
+            self.publish(topic, payload, retain=True)
+
+    def flush_discovery(self):
+        """
+        Sends the held-back configs the broker did not confirm in time, drops the subscriptions to the
+        retained configs once the confirm window is over, and saves the discovery cache.
+        """
+        if not self.is_connected:
+            return
+        for topic, payload in self.discovery_cache.due():
+            self.publish(topic, payload, retain=True)
+        if self.subscribed_configs and not self.discovery_cache.listening():
+            self.client.unsubscribe(self.subscribed_configs)
+            self.subscribed_configs = []
+        self.discovery_cache.save()
+
     def on_disconnect(self, client, userdata, rc):
         self._log("info", f"Disconnected from broker with result code {rc}.")
         self.is_connected = False
@@ -150,11 +231,16 @@ class MqttClient:
         if entity_category: payload["entity_category"] = entity_category
         if state_class: payload["state_class"] = state_class # <<< ADD THIS LINE TO INCLUDE IT IN PAYLOAD
 
-        self.publish(config_topic, json.dumps(payload), retain=True)
+        self.publish_config(config_topic, self._discovery_json(payload, state_topic_base, full_device=False))
         self._log("debug", f"Published discovery for '{sensor_name}' (unique_id: {base_unique_id}) on topic {config_topic}")
 
 
 
+    def _discovery_json(self, payload, base_topic, full_device):
+        if self.compact_discovery:
+            return json.dumps(compact_discovery_payload(payload, base_topic, full_device), separators=(",", ":"), ensure_ascii=False)
+        return json.dumps(payload)
+
     def publish_static_sensor_discoveries(self):
         """Publishes discovery for sensors that are always present or have fixed names."""
         if not self.is_connected or not self.device_info_dict:
@@ -196,11 +282,33 @@ class MqttClient:
         )
 
 
-    def publish_sensor_state(self, sensor_type_slug, value_dict, unique_id_suffix=None):
+    def _state_changed(self, last_value_dict, value_dict, deadband):
+        if last_value_dict.keys() != value_dict.keys():
+            return True
+        for key, value in value_dict.items():
+            last_value = last_value_dict[key]
+            if value == last_value:
+                continue
+            if deadband and isinstance(value, (int, float)) and isinstance(last_value, (int, float)):
+                if abs(value - last_value) >= deadband:
+                    return True
+            else:
+                return True
+        return False
+
+    def publish_sensor_state(self, sensor_type_slug, value_dict, unique_id_suffix=None, deadband=0):
+        """Publishes value_dict unless it is within `deadband` of the last one sent and that is not older than state_max_age_seconds."""
         if not self.device_info_dict:
             self._log("warning", "Device info not set. Cannot publish sensor state.")
             return
 
         state_topic_base = f"ha_idrac_controller/sensor/{self.device_info_dict['identifiers'][0]}"
         state_topic = f"{state_topic_base}/{sensor_type_slug}{(unique_id_suffix if unique_id_suffix else '')}/state"
-        self.publish(state_topic, json.dumps(value_dict))
\ No newline at end of file
+        now = time.monotonic()
+        last_sent = self.last_sent_states.get(state_topic)
+        if last_sent and self.state_max_age_seconds > 0 and now - last_sent[1] < self.state_max_age_seconds \
+                and not self._state_changed(last_sent[0], value_dict, deadband):
+            return
+        self.publish(state_topic, json.dumps(value_dict))
+        if self.is_connected:
+            self.last_sent_states[state_topic] = (dict(value_dict), now)
\ No newline at end of file
@@ -6,6 +6,9 @@ IDRAC_IP_DEFAULT=""
 IDRAC_USERNAME_DEFAULT="root"
 IDRAC_PASSWORD_DEFAULT=""
 CHECK_INTERVAL_SECONDS_DEFAULT=60
+ADAPTIVE_POLLING_DEFAULT="false"
+MIN_CHECK_INTERVAL_SECONDS_DEFAULT=10
+MAX_CHECK_INTERVAL_SECONDS_DEFAULT=300
 LOG_LEVEL_DEFAULT="info"
 TEMPERATURE_UNIT_DEFAULT="C"
 BASE_FAN_SPEED_PERCENT_DEFAULT=20
@@ -16,6 +19,11 @@ MQTT_HOST_DEFAULT="core-mosquitto"
 MQTT_PORT_DEFAULT=1883
 MQTT_USERNAME_DEFAULT=""
 MQTT_PASSWORD_DEFAULT=""
+MQTT_MAX_AGE_SECONDS_DEFAULT=300
+MQTT_DEADBAND_TEMPERATURE_DEFAULT=1
+MQTT_DEADBAND_FAN_RPM_DEFAULT=100
+MQTT_DEADBAND_POWER_DEFAULT=5
+MQTT_COMPACT_DISCOVERY_DEFAULT="false"
 
 # Read configuration from /data/options.json if it exists
 if [ -f /data/options.json ]; then
@@ -24,6 +32,9 @@ if [ -f /data/options.json ]; then
     export IDRAC_USERNAME=$(jq -r '.idrac_username // "'"$IDRAC_USERNAME_DEFAULT"'"' /data/options.json)
     export IDRAC_PASSWORD=$(jq -r '.idrac_password // empty' /data/options.json)
     export CHECK_INTERVAL_SECONDS=$(jq -r '.check_interval_seconds // "'"$CHECK_INTERVAL_SECONDS_DEFAULT"'"' /data/options.json)
+    export ADAPTIVE_POLLING=$(jq -r '.adaptive_polling // "'"$ADAPTIVE_POLLING_DEFAULT"'"' /data/options.json)
+    export MIN_CHECK_INTERVAL_SECONDS=$(jq -r '.min_check_interval_seconds // "'"$MIN_CHECK_INTERVAL_SECONDS_DEFAULT"'"' /data/options.json)
+    export MAX_CHECK_INTERVAL_SECONDS=$(jq -r '.max_check_interval_seconds // "'"$MAX_CHECK_INTERVAL_SECONDS_DEFAULT"'"' /data/options.json)
     export LOG_LEVEL=$(jq -r '.log_level // "'"$LOG_LEVEL_DEFAULT"'"' /data/options.json)
 
     export TEMPERATURE_UNIT=$(jq -r '.temperature_unit // "'"$TEMPERATURE_UNIT_DEFAULT"'"' /data/options.json)
@@ -36,12 +47,20 @@ if [ -f /data/options.json ]; then
     export MQTT_PORT=$(jq -r '.mqtt_port // '$MQTT_PORT_DEFAULT /data/options.json)
     export MQTT_USERNAME=$(jq -r '.mqtt_username // empty' /data/options.json)
     export MQTT_PASSWORD=$(jq -r '.mqtt_password // empty' /data/options.json)
+    export MQTT_MAX_AGE_SECONDS=$(jq -r '.mqtt_max_age_seconds // "'"$MQTT_MAX_AGE_SECONDS_DEFAULT"'"' /data/options.json)
+    export MQTT_DEADBAND_TEMPERATURE=$(jq -r '.mqtt_deadband_temperature // "'"$MQTT_DEADBAND_TEMPERATURE_DEFAULT"'"' /data/options.json)
+    export MQTT_DEADBAND_FAN_RPM=$(jq -r '.mqtt_deadband_fan_rpm // "'"$MQTT_DEADBAND_FAN_RPM_DEFAULT"'"' /data/options.json)
+    export MQTT_DEADBAND_POWER=$(jq -r '.mqtt_deadband_power // "'"$MQTT_DEADBAND_POWER_DEFAULT"'"' /data/options.json)
+    export MQTT_COMPACT_DISCOVERY=$(jq -r '.mqtt_compact_discovery // "'"$MQTT_COMPACT_DISCOVERY_DEFAULT"'"' /data/options.json)
 else
     echo "[RUN.SH] WARNING: /data/options.json not found. Using internal defaults."
     export IDRAC_IP="$IDRAC_IP_DEFAULT"
     export IDRAC_USERNAME="$IDRAC_USERNAME_DEFAULT"
     export IDRAC_PASSWORD="$IDRAC_PASSWORD_DEFAULT"
     export CHECK_INTERVAL_SECONDS="$CHECK_INTERVAL_SECONDS_DEFAULT"
+    export ADAPTIVE_POLLING="$ADAPTIVE_POLLING_DEFAULT"
+    export MIN_CHECK_INTERVAL_SECONDS="$MIN_CHECK_INTERVAL_SECONDS_DEFAULT"
+    export MAX_CHECK_INTERVAL_SECONDS="$MAX_CHECK_INTERVAL_SECONDS_DEFAULT"
     export LOG_LEVEL="$LOG_LEVEL_DEFAULT"
     export TEMPERATURE_UNIT="$TEMPERATURE_UNIT_DEFAULT"
     export BASE_FAN_SPEED_PERCENT="$BASE_FAN_SPEED_PERCENT_DEFAULT"
@@ -52,6 +71,11 @@ else
     export MQTT_PORT="$MQTT_PORT_DEFAULT"
     export MQTT_USERNAME="$MQTT_USERNAME_DEFAULT"
     export MQTT_PASSWORD="$MQTT_PASSWORD_DEFAULT"
+    export MQTT_MAX_AGE_SECONDS="$MQTT_MAX_AGE_SECONDS_DEFAULT"
+    export MQTT_DEADBAND_TEMPERATURE="$MQTT_DEADBAND_TEMPERATURE_DEFAULT"
+    export MQTT_DEADBAND_FAN_RPM="$MQTT_DEADBAND_FAN_RPM_DEFAULT"
+    export MQTT_DEADBAND_POWER="$MQTT_DEADBAND_POWER_DEFAULT"
+    export MQTT_COMPACT_DISCOVERY="$MQTT_COMPACT_DISCOVERY_DEFAULT"
 fi
 
 echo "[RUN.SH] Effective Configuration:"